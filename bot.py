@@ -2,7 +2,7 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2025-11-02 23:26:30
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-02 20:00:06
+LastEditTime: 2026-03-09 16:20:14
 Description: 入口文件
 """
 
@@ -10,8 +10,9 @@ import nonebot
 from nonebot.adapters.onebot.v11 import Adapter as OneBotV11Adapter
 from nonebot.adapters.onebot.v11 import Bot
 
-from src.repositories import blacklist_repo, group_repo, member_repo, user_repo
+from src.lib.db.batch import flush_scheduler
 from src.scripts.install import init_fonts
+from src.services.cache import dump_cache_snapshots, warm_up_caches
 from src.services.db import init_db
 from src.services.sync import (
     sync_groups_from_api,
@@ -28,14 +29,18 @@ driver.register_adapter(OneBotV11Adapter)
 @driver.on_startup
 async def _on_startup() -> None:
     await init_db()
+    flush_scheduler.recover_all()
+
+
+@driver.on_shutdown
+async def _on_shutdown() -> None:
+    await flush_scheduler.flush_all()
+    await dump_cache_snapshots()
 
 
 @driver.on_bot_connect
 async def _on_bot_connect(bot: Bot) -> None:
-    await user_repo.warm_up()
-    await group_repo.warm_up()
-    await member_repo.warm_up()
-    await blacklist_repo.warm_up()
+    await warm_up_caches()
 
     await sync_users_from_api(bot)
     await sync_groups_from_api(bot)
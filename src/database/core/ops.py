@@ -2,16 +2,16 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-01 16:18:02
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-03 19:40:29
+LastEditTime: 2026-03-08 16:22:51
 Description: core db 操作类逻辑
 """
 
 from __future__ import annotations
 
-from collections.abc import Sequence
+from collections.abc import AsyncIterator, Sequence
 from typing import Unpack, cast
 
-from sqlalchemy import CursorResult, delete, func, select, text, update
+from sqlalchemy import CursorResult, Row, delete, func, select, text, update
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import aliased, selectinload
 
@@ -35,6 +35,9 @@ from .types import (
     UserUpdateKwargs,
 )
 
+WARM_UP_CHUNK_SIZE = 5000
+"""缓存预热时每次从游标取出的行数"""
+
 
 class UserOps(BaseOps[User]):
     async def _upsert_user(
@@ -121,6 +124,19 @@ class UserOps(BaseOps[User]):
         result = await connection.execute(text(sql), users_data)
         return cast(CursorResult, result).rowcount
 
+    async def stream_cache_rows(
+        self,
+        since: int | None = None,
+        chunk_size: int = WARM_UP_CHUNK_SIZE,
+    ) -> AsyncIterator[Sequence[Row[tuple[str, str, Permission]]]]:
+        """分块流式读取 `updated_at >= since` 的 (user_id, user_name, permission)"""
+        stmt = select(User.user_id, User.user_name, User.permission)
+        if since is not None:
+            stmt = stmt.where(User.updated_at >= since)
+        result = await self.session.stream(stmt.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            yield rows
+
     async def get_by_user_id(self, user_id: str) -> User | None:
         stmt = select(User).where(User.user_id == user_id)
         result = await self.session.execute(stmt)
@@ -235,6 +251,19 @@ class GroupOps(BaseOps[Group]):
         result = await connection.execute(text(sql), group_statuses)
         return cast(CursorResult, result).rowcount
 
+    async def stream_cache_rows(
+        self,
+        since: int | None = None,
+        chunk_size: int = WARM_UP_CHUNK_SIZE,
+    ) -> AsyncIterator[Sequence[Row[tuple[str, str, GroupStatus]]]]:
+        """分块流式读取 `updated_at >= since` 的 (group_id, group_name, status)"""
+        stmt = select(Group.group_id, Group.group_name, Group.status)
+        if since is not None:
+            stmt = stmt.where(Group.updated_at >= since)
+        result = await self.session.stream(stmt.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            yield rows
+
     async def get_by_group_id(self, group_id: str) -> Group | None:
         stmt = select(Group).where(Group.group_id == group_id)
         result = await self.session.execute(stmt)
@@ -357,6 +386,34 @@ class MemberOps(BaseOps[Member]):
         result = await self.session.execute(stmt)
         return result.scalars().one_or_none()
 
+    async def stream_cache_rows(
+        self,
+        since: int | None = None,
+        limit: int | None = None,
+        chunk_size: int = WARM_UP_CHUNK_SIZE,
+    ) -> AsyncIterator[Sequence[Row[tuple[str, str, str, Permission]]]]:
+        """分块流式读取 (user_id, group_id, group_card, permission)
+
+        只取 `updated_at >= since` 中最近更新的 limit 行，按更新时间正序返回，
+        依次写入 LRU 缓存后最近活跃的成员位于队尾。参数为 None 时不限制。
+        """
+        recent = select(
+            Member.user_id,
+            Member.group_id,
+            Member.group_card,
+            Member.permission,
+            Member.updated_at,
+        )
+        if since is not None:
+            recent = recent.where(Member.updated_at >= since)
+        sub = recent.order_by(Member.updated_at.desc()).limit(limit).subquery()
+        stmt = select(sub.c.user_id, sub.c.group_id, sub.c.group_card, sub.c.permission)
+        result = await self.session.stream(
+            stmt.order_by(sub.c.updated_at).execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions():
+            yield rows
+
     async def get_by_gid(self, group_id: str) -> Sequence[Member]:
         stmt = select(Member).where(Member.group_id == group_id)
         result = await self.session.execute(stmt)
@@ -649,6 +706,20 @@ class BlacklistOps(BaseOps[Blacklist]):
         result = await self.session.execute(select(Blacklist))
         return result.scalars().all()
 
+    async def stream_cache_rows(
+        self,
+        chunk_size: int = WARM_UP_CHUNK_SIZE,
+    ) -> AsyncIterator[Sequence[Row[tuple[str, str, int]]]]:
+        """分块流式读取 (target_user_id, group_id, ban_expiry)"""
+        stmt = select(
+            Blacklist.target_user_id,
+            Blacklist.group_id,
+            Blacklist.ban_expiry,
+        )
+        result = await self.session.stream(stmt.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            yield rows
+
     async def get_by_uid(self, target_user_id: str) -> Sequence[Blacklist]:
         stmt = select(Blacklist).where(Blacklist.target_user_id == target_user_id)
         result = await self.session.execute(stmt)
@@ -7,10 +7,12 @@ Description: db 实例
 """
 
 from src.lib.db.connectors import ShardedDB, StaticDB
+from src.lib.db.profiles import CORE_PROFILE, HOT_SHARD_PROFILE
 
 core_db = StaticDB(
     namespace="core_db",
     filename="core.db",
+    profile=CORE_PROFILE,
 )
 
 log_db = ShardedDB(
@@ -18,6 +20,8 @@ log_db = ShardedDB(
     prefix="log",
     fmt="%Y%m",
     active_window_months=2,
+    profile=HOT_SHARD_PROFILE,
+    catalog_columns=("user_id", "group_id", "target_id", "operator_id", "context_id"),
 )
 
 snapshot_db = ShardedDB(
@@ -25,4 +29,5 @@ snapshot_db = ShardedDB(
     prefix="snapshot",
     fmt="%Y%m",
     active_window_months=2,
+    profile=HOT_SHARD_PROFILE,
 )
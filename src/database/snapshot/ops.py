@@ -6,9 +6,10 @@ LastEditTime: 2026-02-19 22:33:56
 Description: snapshot db 操作类
 """
 
+from collections.abc import Sequence
 from typing import cast
 
-from sqlalchemy import CursorResult
+from sqlalchemy import CursorResult, select
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from src.lib.db.ops import BaseOps
@@ -39,6 +40,23 @@ class UserSnapshotOps(BaseOps[UserSnapshot]):
         )
         await self.session.execute(stmt)
 
+    async def get_user_snapshots(
+        self,
+        user_id: str,
+        start_ts: int,
+        end_ts: int,
+    ) -> Sequence[tuple[str | None, int]]:
+        stmt = (
+            select(UserSnapshot.content, UserSnapshot.created_at)
+            .where(
+                UserSnapshot.user_id == user_id,
+                UserSnapshot.created_at.between(start_ts, end_ts),
+            )
+            .order_by(UserSnapshot.created_at)
+        )
+        result = await self.session.execute(stmt)
+        return cast(Sequence[tuple[str | None, int]], result.tuples().all())
+
 
 class GroupSnapshotOps(BaseOps[GroupSnapshot]):
     async def bulk_create_group_snapshots(
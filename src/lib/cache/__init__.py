@@ -2,10 +2,11 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-01-26 00:35:26
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-02-19 22:35:39
+LastEditTime: 2026-03-06 15:12:40
 Description: 全局缓存类
 """
 
+from .base import CacheStats
 from .impl import (
     BlacklistCache,
     BlacklistCacheItem,
@@ -17,13 +18,24 @@ from .impl import (
     UserCacheItem,
 )
 
+USER_CACHE_MAX_SIZE = 100_000
+"""用户缓存条目上限，超级用户常驻且不计入上限"""
+GROUP_CACHE_MAX_SIZE = 10_000
+"""群组缓存条目上限，已授权群组常驻且不计入上限"""
+MEMBER_CACHE_MAX_SIZE = 200_000
+"""群成员缓存条目上限"""
+
 blacklist_cache = BlacklistCache()
-group_cache = GroupCache()
-member_cache = MemberCache()
-user_cache = UserCache()
+group_cache = GroupCache(max_size=GROUP_CACHE_MAX_SIZE)
+member_cache = MemberCache(max_size=MEMBER_CACHE_MAX_SIZE)
+user_cache = UserCache(max_size=USER_CACHE_MAX_SIZE)
 
 __all__ = [
+    "GROUP_CACHE_MAX_SIZE",
+    "MEMBER_CACHE_MAX_SIZE",
+    "USER_CACHE_MAX_SIZE",
     "BlacklistCacheItem",
+    "CacheStats",
     "GroupCacheItem",
     "MemberCacheItem",
     "UserCacheItem",
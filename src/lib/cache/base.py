@@ -2,48 +2,201 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-01-25 21:43:39
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-02-19 22:36:07
+LastEditTime: 2026-03-09 16:40:12
 Description: 缓存基类
 """
 
 from abc import ABC
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass
+import time
+from typing import ClassVar, cast
 
+_MISSING = object()
 
-class BaseCache[T](ABC):
-    def __init__(self) -> None:
-        self._storage: dict[str, T] = {}
 
-    def _to_key(self, key: str | int) -> str:
+@dataclass(slots=True)
+class CacheStats:
+    size: int = 0
+    pinned: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class BaseCache[T](ABC):
+    """键值缓存基类，可选容量上限（LRU）与存活时长（TTL）
+
+    Args:
+        max_size: 未固定条目数上限，超出时淘汰最久未访问的条目；None 表示不限。
+        ttl: 未固定条目写入后的存活秒数，过期条目在访问时惰性删除；None 表示不过期。
+
+    注意事项:
+        1. 被 `pin` 的键单独存放，不计入上限、不参与淘汰也不会过期，条目删除后标记仍保留。
+        2. 缓存有上限时，未命中不代表数据不存在，调用方需回源确认。
+    """  # noqa: E501
+
+    SNAPSHOT_FORMAT: ClassVar[int] = 1
+    """`dump_item` 编码版本，编码变化时递增以作废旧快照"""
+
+    def __init__(self, max_size: int | None = None, ttl: float | None = None) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._storage: OrderedDict[str | int, T] = OrderedDict()
+        self._expires: dict[str | int, float] = {}
+        self._pinned: set[str | int] = set()
+        self._pinned_storage: dict[str | int, T] = {}
+        self._stats = CacheStats()
+
+    def _to_key(self, key: str | int) -> str | int:
         return str(key)
 
-    def get_storage(self) -> dict[str, T]:
-        return self._storage
+    def _release(self, value: T) -> None:
+        """条目移出缓存时的回调，子类可借此回收外部存储"""
+
+    def dump_item(self, value: T) -> bytes:
+        """编码单个条目写入快照，不支持快照的缓存无需实现"""
+        raise NotImplementedError(f"{type(self).__name__} 不支持快照")
+
+    def load_item(self, key: str | int, data: bytes) -> T:
+        raise NotImplementedError(f"{type(self).__name__} 不支持快照")
+
+    def snapshot_items(self) -> Iterator[tuple[str | int, bytes]]:
+        """按 LRU 顺序产出快照记录，默认每个条目一条"""
+        for key, value in self.get_storage().items():
+            yield key, self.dump_item(value)
+
+    def load_snapshot_item(self, key: str | int, data: bytes) -> None:
+        self.set(key, self.load_item(key, data))
+
+    def _is_expired(self, real_key: str | int, now: float) -> bool:
+        expires = self._expires.get(real_key)
+        return expires is not None and now >= expires
+
+    def _drop(self, real_key: str | int) -> None:
+        self._expires.pop(real_key, None)
+        if real_key in self._storage:
+            self._release(self._storage.pop(real_key))
+        elif real_key in self._pinned_storage:
+            self._release(self._pinned_storage.pop(real_key))
+
+    def _evict(self) -> None:
+        if self.max_size is None:
+            return
+        while len(self._storage) > self.max_size:
+            real_key, value = self._storage.popitem(last=False)
+            self._expires.pop(real_key, None)
+            self._release(value)
+            self._stats.evictions += 1
+
+    def get_storage(self) -> dict[str | int, T]:
+        return {**self._storage, **self._pinned_storage}
 
     def get(self, key: str | int) -> T | None:
         real_key = self._to_key(key)
-        return self._storage.get(real_key)
+        value = self._storage.get(real_key, _MISSING)
+        if value is _MISSING:
+            if real_key in self._pinned_storage:
+                self._stats.hits += 1
+                return self._pinned_storage[real_key]
+            self._stats.misses += 1
+            return None
+        if self.ttl is not None and self._is_expired(real_key, time.monotonic()):
+            self._drop(real_key)
+            self._stats.evictions += 1
+            self._stats.misses += 1
+            return None
+        if self.max_size is not None:
+            self._storage.move_to_end(real_key)
+        self._stats.hits += 1
+        return cast(T, value)
+
+    def _lookup(self, real_key: str | int) -> T | None:
+        """与 `get` 相同的过期与 LRU 处理，但不计入命中统计，供子类组合查询"""
+        value = self._storage.get(real_key, _MISSING)
+        if value is _MISSING:
+            return self._pinned_storage.get(real_key)
+        if self.ttl is not None and self._is_expired(real_key, time.monotonic()):
+            self._drop(real_key)
+            self._stats.evictions += 1
+            return None
+        if self.max_size is not None:
+            self._storage.move_to_end(real_key)
+        return cast(T, value)
 
     def set(self, key: str | int, value: T) -> None:
         real_key = self._to_key(key)
+        if real_key in self._pinned:
+            self._pinned_storage[real_key] = value
+            return
         self._storage[real_key] = value
+        self._storage.move_to_end(real_key)
+        if self.ttl is not None:
+            self._expires[real_key] = time.monotonic() + self.ttl
+        self._evict()
 
     def set_batch(self, items: dict[str | int, T]) -> None:
-        normalized_data = {self._to_key(key): value for key, value in items.items()}
-        self._storage.update(normalized_data)
+        for key, value in items.items():
+            self.set(key, value)
 
     def delete(self, key: str | int) -> None:
+        self._drop(self._to_key(key))
+
+    def exists(self, key: str | int) -> bool:
+        real_key = self._to_key(key)
+        if real_key in self._pinned_storage:
+            return True
+        if real_key not in self._storage:
+            return False
+        return self.ttl is None or not self._is_expired(real_key, time.monotonic())
+
+    def pin(self, key: str | int) -> None:
+        """固定键，对应条目不再被淘汰或过期"""
         real_key = self._to_key(key)
+        self._pinned.add(real_key)
         if real_key in self._storage:
-            del self._storage[real_key]
+            self._pinned_storage[real_key] = self._storage.pop(real_key)
+            self._expires.pop(real_key, None)
 
-    def exists(self, key: str | int) -> bool:
-        return self._to_key(key) in self._storage
+    def unpin(self, key: str | int) -> None:
+        real_key = self._to_key(key)
+        self._pinned.discard(real_key)
+        if real_key in self._pinned_storage:
+            self._storage[real_key] = self._pinned_storage.pop(real_key)
+            if self.ttl is not None:
+                self._expires[real_key] = time.monotonic() + self.ttl
+            self._evict()
+
+    def is_pinned(self, key: str | int) -> bool:
+        return self._to_key(key) in self._pinned
+
+    def evict_expired(self, now: float | None = None) -> int:
+        """删除全部过期条目，返回删除数量"""
+        now = time.monotonic() if now is None else now
+        expired = [key for key in self._expires if self._is_expired(key, now)]
+        for real_key in expired:
+            self._drop(real_key)
+        self._stats.evictions += len(expired)
+        return len(expired)
 
     def clear(self) -> None:
         self._storage.clear()
+        self._expires.clear()
+        self._pinned_storage.clear()
 
     def count(self) -> int:
-        return len(self._storage)
+        return len(self._storage) + len(self._pinned_storage)
+
+    def stats(self) -> CacheStats:
+        self._stats.size = self.count()
+        self._stats.pinned = len(self._pinned_storage)
+        return self._stats
 
     def __contains__(self, key: str | int) -> bool:
         return self.exists(key)
@@ -52,8 +205,10 @@ class BaseCache[T](ABC):
         self.set(key, value)
 
     def __getitem__(self, key: str | int) -> T:
-        real_key = self._to_key(key)
-        return self._storage[real_key]
+        item = self.get(key)
+        if item is None:
+            raise KeyError(key)
+        return item
 
     def __delitem__(self, key: str | int) -> None:
         self.delete(key)
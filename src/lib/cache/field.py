@@ -2,13 +2,14 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-13 15:31:40
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-02 17:20:40
+LastEditTime: 2026-03-09 16:40:12
 Description: 缓存 item 定义
 """
 
 from __future__ import annotations
 
 from dataclasses import dataclass, field, replace
+import hashlib
 from typing import TYPE_CHECKING, Self
 
 from src.database.core.consts import GroupStatus, Permission
@@ -18,6 +19,15 @@ if TYPE_CHECKING:
     pass
 
 
+def fingerprint(text: str) -> int:
+    """名称的 64 位有符号指纹
+
+    内置 `hash()` 随进程的哈希种子变化，无法写入快照，这里改用 blake2b。
+    """
+    digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
 @dataclass(slots=True, frozen=True)
 class UserCacheItem:
     user_id: str
@@ -87,17 +97,48 @@ class BlacklistCacheItem:
         return replace(self, expiry=new_expiry)
 
 
-@dataclass(slots=True, frozen=True)
-class MemberCacheItem:
-    card_hash: int
-    permission: Permission
+MEMBER_PERMISSION_BITS = 4
+"""`MemberCacheItem` 中权限占用的低位宽度"""
+_PERMISSION_MASK = (1 << MEMBER_PERMISSION_BITS) - 1
+_PERMISSIONS = tuple(Permission(v) for v in range(1 << MEMBER_PERMISSION_BITS))
+
+
+class MemberCacheItem(int):
+    """群成员缓存条目，本身即 `(名片哈希 << 4) | 权限` 打包成的整数
+
+    MemberCache 直接存放该对象，读取时无需再构造，每个成员只占一个整数的内存。
+    字段按需从位段解出；打包值可能为 0，真值判断恒为 True，与其他条目类型一致。
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def pack(cls, card_hash: int, permission: Permission | int) -> Self:
+        return cls((card_hash << MEMBER_PERMISSION_BITS) | int(permission))
+
+    @property
+    def card_hash(self) -> int:
+        return self >> MEMBER_PERMISSION_BITS
+
+    @property
+    def permission(self) -> Permission:
+        return _PERMISSIONS[self & _PERMISSION_MASK]
 
     def with_card_hash(self, new_hash: int) -> Self:
         if self.card_hash == new_hash:
             return self
-        return replace(self, card_hash=new_hash)
+        return self.pack(new_hash, self.permission)
 
     def with_permission(self, new_permission: Permission) -> Self:
         if self.permission == new_permission:
             return self
-        return replace(self, permission=new_permission)
+        return self.pack(self.card_hash, new_permission)
+
+    def __bool__(self) -> bool:
+        return True
+
+    def __repr__(self) -> str:
+        return (
+            f"MemberCacheItem(card_hash={self.card_hash}, "
+            f"permission={self.permission!r})"
+        )
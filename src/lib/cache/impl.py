@@ -2,18 +2,22 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-12 18:53:21
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-03 12:18:44
+LastEditTime: 2026-03-10 10:12:31
 Description: 缓存声明
 """
 
 from __future__ import annotations
 
+from collections.abc import Iterator
+import struct
+
 from src.database.core.consts import GroupStatus, Permission
 from src.lib.cache.field import (
     BlacklistCacheItem,
     GroupCacheItem,
     MemberCacheItem,
     UserCacheItem,
+    fingerprint,
 )
 from src.lib.consts import GLOBAL_GROUP_FLAG
 from src.lib.types import UNSET, Unset, is_set, resolve_unset
@@ -21,8 +25,34 @@ from src.lib.utils.common import get_current_time
 
 from .base import BaseCache
 
+_USER_ITEM = struct.Struct("<qB?")
+_GROUP_ITEM = struct.Struct("<qB")
+_MEMBER_ITEM = struct.Struct("<qB")
+_GROUP_STATUSES = tuple(GroupStatus)
+_PLUGIN_SEP = "\0"
+
 
 class UserCache(BaseCache[UserCacheItem]):
+    def set(self, key: str | int, value: UserCacheItem) -> None:
+        """超级用户常驻缓存"""
+        if value.permission.has(Permission.SUPERUSER):
+            self.pin(key)
+        else:
+            self.unpin(key)
+        super().set(key, value)
+
+    def dump_item(self, value: UserCacheItem) -> bytes:
+        return _USER_ITEM.pack(value.name_hash, value.permission, value.is_self_ignore)
+
+    def load_item(self, key: str | int, data: bytes) -> UserCacheItem:
+        name_hash, permission, is_self_ignore = _USER_ITEM.unpack(data)
+        return UserCacheItem(
+            user_id=str(key),
+            name_hash=name_hash,
+            permission=Permission(permission),
+            is_self_ignore=is_self_ignore,
+        )
+
     def upsert_user(
         self,
         user_id: str,
@@ -37,7 +67,7 @@ class UserCache(BaseCache[UserCacheItem]):
         - permission: 用户权限，默认为 NORMAL
         """
         user = self.get(user_id)
-        name_hash = hash(user_name)
+        name_hash = fingerprint(resolve_unset(user_name, ""))
         if not user:
             user = UserCacheItem(
                 user_id=user_id,
@@ -47,7 +77,7 @@ class UserCache(BaseCache[UserCacheItem]):
             self.set(user_id, user)
             return
 
-        if is_set(user_name) and user.name_hash != hash(user_name):
+        if is_set(user_name) and user.name_hash != name_hash:
             user = user.with_name_hash(name_hash)
         if is_set(permission):
             user = user.with_permission(permission)
@@ -66,10 +96,40 @@ class UserCache(BaseCache[UserCacheItem]):
 
     def needs_update_name(self, user_id: str, user_name: str) -> bool:
         user = self.get(user_id)
-        return bool(user and user.name_hash != hash(user_name))
+        return bool(user and user.name_hash != fingerprint(user_name))
 
 
 class GroupCache(BaseCache[GroupCacheItem]):
+    """群组缓存
+
+    `is_all_shut` 是运行时的全员禁言状态，不写入快照，载入时一律视为未禁言。
+    """
+
+    SNAPSHOT_FORMAT = 2
+
+    def set(self, key: str | int, value: GroupCacheItem) -> None:
+        """已授权群组常驻缓存"""
+        if value.status == GroupStatus.AUTHORIZED:
+            self.pin(key)
+        else:
+            self.unpin(key)
+        super().set(key, value)
+
+    def dump_item(self, value: GroupCacheItem) -> bytes:
+        head = _GROUP_ITEM.pack(value.name_hash, _GROUP_STATUSES.index(value.status))
+        return head + _PLUGIN_SEP.join(sorted(value.disabled_plugins)).encode()
+
+    def load_item(self, key: str | int, data: bytes) -> GroupCacheItem:
+        name_hash, status = _GROUP_ITEM.unpack_from(data)
+        plugins = data[_GROUP_ITEM.size :].decode()
+        return GroupCacheItem(
+            group_id=str(key),
+            name_hash=name_hash,
+            status=_GROUP_STATUSES[status],
+            is_all_shut=False,
+            disabled_plugins=frozenset(plugins.split(_PLUGIN_SEP) if plugins else ()),
+        )
+
     def upsert_group(
         self,
         group_id: str,
@@ -78,7 +138,7 @@ class GroupCache(BaseCache[GroupCacheItem]):
         is_all_shut: bool | Unset = UNSET,
     ) -> None:
         group = self.get(group_id)
-        name_hash = hash(group_name)
+        name_hash = fingerprint(resolve_unset(group_name, ""))
 
         if not group:
             group = GroupCacheItem(
@@ -90,7 +150,7 @@ class GroupCache(BaseCache[GroupCacheItem]):
             self.set(group_id, group)
             return
 
-        if is_set(group_name) and group.name_hash != hash(group_name):
+        if is_set(group_name) and group.name_hash != name_hash:
             group = group.with_name_hash(name_hash)
         if is_set(is_all_shut):
             group = group.with_all_shut(is_all_shut)
@@ -113,7 +173,7 @@ class GroupCache(BaseCache[GroupCacheItem]):
         group = self.get(group_id)
         if not group:
             return
-        n_group = group.with_name_hash(hash(group_name))
+        n_group = group.with_name_hash(fingerprint(group_name))
         if n_group is not group:
             self.set(group_id, n_group)
 
@@ -126,9 +186,75 @@ class GroupCache(BaseCache[GroupCacheItem]):
             self.set(group_id, n_group)
 
 
-class MemberCache(BaseCache[MemberCacheItem]):
-    def _gen_key(self, user_id: str, group_id: str) -> str:
-        return f"MEMBER:{group_id}:{user_id}"
+_MEMBER_KEY_SEP = "\0"
+
+
+class MemberCache(BaseCache[dict[str, MemberCacheItem]]):
+    """群成员缓存
+
+    按群嵌套存放 `{group_id: {user_id: MemberCacheItem}}`，条目本身就是打包整数，
+    每个成员只占内层字典的一个槽位与一个整数，读取直接返回存放的对象。
+
+    LRU、TTL 与固定均以群为单位，`max_size` 仍按成员数计算，超出时整群淘汰最久
+    未访问的群。
+    """
+
+    SNAPSHOT_FORMAT = 2
+
+    def __init__(self, max_size: int | None = None, ttl: float | None = None) -> None:
+        super().__init__(max_size, ttl)
+        self._size = 0
+
+    def _to_key(self, key: str | int) -> str | int:
+        return key
+
+    def _release(self, value: dict[str, MemberCacheItem]) -> None:
+        self._size -= len(value)
+
+    def _evict(self) -> None:
+        if self.max_size is None:
+            return
+        # 至少保留最近访问的群，避免刚写入的成员随整群一起被淘汰
+        while self._size > self.max_size and len(self._storage) > 1:
+            real_key, members = self._storage.popitem(last=False)
+            self._expires.pop(real_key, None)
+            self._release(members)
+            self._stats.evictions += len(members)
+
+    def snapshot_items(self) -> Iterator[tuple[str | int, bytes]]:
+        for group_id, members in self.get_storage().items():
+            for user_id, item in members.items():
+                yield (
+                    f"{group_id}{_MEMBER_KEY_SEP}{user_id}",
+                    _MEMBER_ITEM.pack(item.card_hash, item.permission),
+                )
+
+    def load_snapshot_item(self, key: str | int, data: bytes) -> None:
+        group_id, user_id = str(key).split(_MEMBER_KEY_SEP)
+        self._store(group_id, user_id, MemberCacheItem.pack(*_MEMBER_ITEM.unpack(data)))
+
+    def _store(self, group_id: str, user_id: str, item: MemberCacheItem) -> None:
+        members = self._lookup(group_id)
+        if members is None:
+            members = {}
+            self.set(group_id, members)
+        elif self.ttl is not None:
+            self.set(group_id, members)
+        if user_id not in members:
+            self._size += 1
+        members[user_id] = item
+        if self.max_size is not None and self._size > self.max_size:
+            self._evict()
+
+    def put_member(
+        self,
+        user_id: str,
+        group_id: str,
+        card_hash: int,
+        permission: Permission,
+    ) -> None:
+        """直接写入名片哈希与权限，供批量预热使用"""
+        self._store(group_id, user_id, MemberCacheItem.pack(card_hash, permission))
 
     def upsert_member(
         self,
@@ -137,30 +263,50 @@ class MemberCache(BaseCache[MemberCacheItem]):
         permission: Permission | Unset = UNSET,
         group_card: str | Unset = UNSET,
     ) -> None:
-        key = self._gen_key(user_id, group_id)
-        member = self.get(key)
-        new_hash = hash(group_card or "")
-
-        if not member:
-            self.set(
-                key,
-                MemberCacheItem(
-                    card_hash=new_hash,
-                    permission=resolve_unset(permission, Permission.NORMAL),
-                ),
+        members = self._lookup(group_id)
+        member = members.get(user_id) if members is not None else None
+        if member is None:
+            member = MemberCacheItem.pack(
+                fingerprint(resolve_unset(group_card, "")),
+                resolve_unset(permission, Permission.NORMAL),
             )
-            return
-        if is_set(group_card) and member.card_hash != hash(group_card):
-            member = member.with_card_hash(new_hash)
-        if is_set(permission):
-            member = member.with_permission(permission)
-        self.set(key, member)
+        else:
+            if is_set(group_card):
+                member = member.with_card_hash(fingerprint(group_card))
+            if is_set(permission):
+                member = member.with_permission(permission)
+        self._store(group_id, user_id, member)
 
     def get_member(self, user_id: str, group_id: str) -> MemberCacheItem | None:
-        return self.get(self._gen_key(user_id, group_id))
+        # 逐条消息都会查询，LRU 刷新内联处理，TTL 才走完整的 `_lookup`
+        members = self._storage.get(group_id)
+        if members is None:
+            members = self._pinned_storage.get(group_id)
+        elif self.ttl is not None:
+            members = self._lookup(group_id)
+        elif self.max_size is not None:
+            self._storage.move_to_end(group_id)
+        member = members.get(user_id) if members is not None else None
+        if member is None:
+            self._stats.misses += 1
+        else:
+            self._stats.hits += 1
+        return member
 
     def delete_member(self, user_id: str, group_id: str) -> None:
-        self.delete(self._gen_key(user_id, group_id))
+        members = self._storage.get(group_id) or self._pinned_storage.get(group_id)
+        if not members or members.pop(user_id, None) is None:
+            return
+        self._size -= 1
+        if not members:
+            self._drop(group_id)
+
+    def count(self) -> int:
+        return self._size
+
+    def clear(self) -> None:
+        super().clear()
+        self._size = 0
 
 
 class BlacklistCache(BaseCache[BlacklistCacheItem]):
@@ -204,3 +350,36 @@ class BlacklistCache(BaseCache[BlacklistCacheItem]):
         if self._check_and_clean(self._gen_key(user_id, group_id)):
             return True
         return False
+
+
+NEGATIVE_CACHE_TTL = 30
+"""查询未命中记录的存活秒数"""
+NEGATIVE_CACHE_MAX_SIZE = 10_000
+"""查询未命中记录的条目上限"""
+
+
+class NegativeCache(BaseCache[bool]):
+    """数据库查询未命中的记录
+
+    陌生用户、未授权群组的每条事件都会回源查询，命中该缓存时直接视为不存在。
+    对应实体写入时需调用 `forget` 失效，漏掉的失效最多延迟 ttl 秒。
+    """
+
+    def __init__(
+        self,
+        max_size: int | None = NEGATIVE_CACHE_MAX_SIZE,
+        ttl: float | None = NEGATIVE_CACHE_TTL,
+    ) -> None:
+        super().__init__(max_size, ttl)
+
+    def _gen_key(self, *parts: str) -> str:
+        return ":".join(parts)
+
+    def mark(self, *parts: str) -> None:
+        self.set(self._gen_key(*parts), True)
+
+    def is_missing(self, *parts: str) -> bool:
+        return self.get(self._gen_key(*parts)) is not None
+
+    def forget(self, *parts: str) -> None:
+        self.delete(self._gen_key(*parts))
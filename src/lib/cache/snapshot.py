@@ -0,0 +1,132 @@
+"""
+Author: SakuraiCora<1479559098@qq.com>
+Date: 2026-03-08 10:05:37
+LastEditors: SakuraiCora<1479559098@qq.com>
+LastEditTime: 2026-03-09 16:40:12
+Description: 缓存二进制快照
+
+文件布局（小端）:
+
+- 文件头: magic(4s) 文件版本(H) 条目格式版本(H) 水位(q) 条目数(I)
+- 条目: 键类型(B) 键长度(H) 值长度(H) 键 值
+
+水位为写快照时的时间戳，启动时只需回源 `updated_at >= 水位` 的行。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+import struct
+import tempfile
+from typing import Any
+
+from src.logger import logger
+
+from .base import BaseCache
+
+SNAPSHOT_MAGIC = b"SKCS"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct("<4sHHqI")
+_RECORD = struct.Struct("<BHH")
+_KEY_STR = 0
+_KEY_INT = 1
+
+
+class SnapshotError(Exception):
+    """快照文件损坏或与当前版本不兼容"""
+
+
+def encode_snapshot(cache: BaseCache[Any], watermark: int) -> bytes:
+    """按 LRU 顺序序列化缓存，重新载入后最近访问的条目仍在队尾"""
+    buf = bytearray(_HEADER.size)
+    count = 0
+    for key, data in cache.snapshot_items():
+        # 整数键统一按十进制文本存放，不受位宽限制
+        tag = _KEY_INT if isinstance(key, int) else _KEY_STR
+        raw_key = str(key).encode()
+        buf += _RECORD.pack(tag, len(raw_key), len(data))
+        buf += raw_key
+        buf += data
+        count += 1
+    _HEADER.pack_into(
+        buf,
+        0,
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        cache.SNAPSHOT_FORMAT,
+        watermark,
+        count,
+    )
+    return bytes(buf)
+
+
+def decode_snapshot(cache: BaseCache[Any], payload: bytes) -> int:
+    """把快照条目写入缓存，返回水位"""
+    if len(payload) < _HEADER.size:
+        raise SnapshotError("文件头不完整")
+    magic, version, item_format, watermark, count = _HEADER.unpack_from(payload)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"不支持的快照版本: {magic!r} v{version}")
+    if item_format != cache.SNAPSHOT_FORMAT:
+        raise SnapshotError(f"条目格式版本不一致: {item_format}")
+
+    view = memoryview(payload)
+    offset = _HEADER.size
+    for _ in range(count):
+        tag, key_len, data_len = _RECORD.unpack_from(payload, offset)
+        offset += _RECORD.size
+        raw_key = bytes(view[offset : offset + key_len]).decode()
+        offset += key_len
+        data = bytes(view[offset : offset + data_len])
+        offset += data_len
+        if offset > len(payload):
+            raise SnapshotError("条目被截断")
+        key = int(raw_key) if tag == _KEY_INT else raw_key
+        cache.load_snapshot_item(key, data)
+    if offset != len(payload):
+        raise SnapshotError("文件尾部存在多余数据")
+    return watermark
+
+
+def _write_atomic(path: Path, payload: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f.name, path)
+
+
+def _read(path: Path) -> bytes | None:
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+async def write_snapshot(cache: BaseCache[Any], path: Path, watermark: int) -> int:
+    """序列化在事件循环内完成以免与写入交错，落盘放到线程中，返回字节数"""
+    payload = encode_snapshot(cache, watermark)
+    await asyncio.to_thread(_write_atomic, path, payload)
+    return len(payload)
+
+
+async def read_snapshot(cache: BaseCache[Any], path: Path) -> int | None:
+    """用快照替换缓存内容并返回水位
+
+    文件缺失或损坏时缓存保持为空并返回 None，调用方应全量预热。
+    """
+    payload = await asyncio.to_thread(_read, path)
+    if payload is None:
+        return None
+    cache.clear()
+    try:
+        return decode_snapshot(cache, payload)
+    except (SnapshotError, struct.error, UnicodeDecodeError, ValueError) as e:
+        logger.warning(f"缓存快照不可用，改为全量预热 [{path.name}]: {e}")
+        cache.clear()
+        return None
@@ -2,7 +2,7 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-01 16:10:12
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-02 15:43:09
+LastEditTime: 2026-03-08 10:05:37
 Description: 公有常量
 """
 
@@ -22,7 +22,14 @@ MAPLE_FONT_PATH = Path("./data/font/MapleMono-NF-CN-Regular.ttf")
 MAPLE_FONT_NAME = "Maple Mono NF CN"
 
 
+LOCAL_TIMEZONE = "Asia/Shanghai"
+
+
 GLOBAL_DB_ROOT = Path("./data/db")
+GLOBAL_SPILL_ROOT = Path("./data/spill")
+GLOBAL_JOURNAL_ROOT = Path("./data/journal")
+GLOBAL_SCRATCH_ROOT = Path("./data/scratch")
+GLOBAL_CACHE_ROOT = Path("./data/cache")
 
 
 class TriggerType(LocalizedMixin, StrEnum):
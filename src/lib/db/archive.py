@@ -0,0 +1,362 @@
+"""
+Author: SakuraiCora<1479559098@qq.com>
+Date: 2026-03-05 16:42:18
+LastEditors: SakuraiCora<1479559098@qq.com>
+LastEditTime: 2026-03-05 16:42:18
+Description: 冷库归档：压缩编解码器与紧凑只读库
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from enum import StrEnum
+import lzma
+import os
+from pathlib import Path
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+from types import MappingProxyType
+from typing import IO, ClassVar
+
+from src.lib.enums import LocalizedMixin
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+"""流式压缩 / 解压的分块大小（字节）"""
+ARCHIVE_CPU_BUDGET = max(1, (os.cpu_count() or 2) // 2)
+"""同时压缩的分片数上限，默认占用一半 CPU"""
+SEVEN_ZIP_TIMEOUT = 45.0
+"""旧版 7z 归档命令的超时（秒）"""
+COMPACT_SUFFIX = ".cdb"
+"""紧凑只读库的文件后缀"""
+COMPACT_PAGE_SIZE = 16384
+"""紧凑只读库的页大小（字节）"""
+COMPACT_DDL_TABLE = "_archive_ddl"
+"""紧凑只读库中保存原始建表 / 建索引语句的表，解冻时据此还原"""
+
+
+class ArchiveFormat(LocalizedMixin, StrEnum):
+    COMPRESSED = "compressed"
+    COMPACT = "compact"
+
+    __labels__ = MappingProxyType(
+        {
+            COMPRESSED: "压缩归档",
+            COMPACT: "紧凑只读库",
+        },
+    )
+
+
+class ArchiveError(Exception):
+    """归档压缩或解压失败"""
+
+
+class ArchiveCodec(ABC):
+    """单文件归档编解码器
+
+    `compress` / `decompress` 为阻塞调用，应放进工作线程执行。
+    输出先写入同目录临时文件，完成后 `os.replace` 到目标路径，中途失败不会留下半个文件。
+    """
+
+    name: ClassVar[str]
+    suffix: ClassVar[str]
+
+    @abstractmethod
+    def _compress(self, src: Path, dst: Path) -> None: ...
+
+    @abstractmethod
+    def _decompress(self, src: Path, dst: Path) -> None: ...
+
+    def compress(self, src: Path, dst: Path) -> None:
+        _write_atomic(dst, lambda tmp: self._compress(src, tmp))
+
+    def decompress(self, src: Path, dst: Path) -> None:
+        _write_atomic(dst, lambda tmp: self._decompress(src, tmp))
+
+
+class _StreamCodec(ArchiveCodec):
+    """基于文件对象的流式编解码，按 `ARCHIVE_CHUNK_SIZE` 分块读写"""
+
+    @abstractmethod
+    def _writer(self, raw: IO[bytes]) -> IO[bytes]: ...
+
+    @abstractmethod
+    def _reader(self, raw: IO[bytes]) -> IO[bytes]: ...
+
+    def _compress(self, src: Path, dst: Path) -> None:
+        with src.open("rb") as fin, dst.open("wb") as raw, self._writer(raw) as fout:
+            shutil.copyfileobj(fin, fout, ARCHIVE_CHUNK_SIZE)
+
+    def _decompress(self, src: Path, dst: Path) -> None:
+        with src.open("rb") as raw, self._reader(raw) as fin, dst.open("wb") as fout:
+            shutil.copyfileobj(fin, fout, ARCHIVE_CHUNK_SIZE)
+
+
+class LzmaCodec(_StreamCodec):
+    """标准库 lzma（.xz），无外部依赖"""
+
+    name = "lzma"
+    suffix = ".xz"
+
+    def __init__(self, preset: int = 6) -> None:
+        self.preset = preset
+
+    def _writer(self, raw: IO[bytes]) -> IO[bytes]:
+        return lzma.LZMAFile(raw, "wb", preset=self.preset)
+
+    def _reader(self, raw: IO[bytes]) -> IO[bytes]:
+        return lzma.LZMAFile(raw, "rb")
+
+
+class ZstdCodec(_StreamCodec):
+    """zstandard（.zst），压缩速度远快于 lzma；需安装可选依赖 `zstandard`"""
+
+    name = "zstd"
+    suffix = ".zst"
+    available: ClassVar[bool] = zstandard is not None
+
+    def __init__(self, level: int = 9) -> None:
+        self.level = level
+
+    def _require(self) -> None:
+        if zstandard is None:
+            raise ArchiveError("未安装 zstandard，无法处理 .zst 归档")
+
+    def _writer(self, raw: IO[bytes]) -> IO[bytes]:
+        self._require()
+        return zstandard.ZstdCompressor(level=self.level).stream_writer(
+            raw, closefd=False
+        )
+
+    def _reader(self, raw: IO[bytes]) -> IO[bytes]:
+        self._require()
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=False)
+
+
+class SevenZipCodec(ArchiveCodec):
+    """旧版 7z 归档（.7z），仅为兼容已有归档保留；需系统安装 `7z` 命令"""
+
+    name = "7z"
+    suffix = ".7z"
+
+    def _run(self, *args: str) -> None:
+        if shutil.which("7z") is None:
+            raise ArchiveError("未找到 7z 命令，无法处理 .7z 归档")
+        result = subprocess.run(
+            ["7z", *args],
+            capture_output=True,
+            timeout=SEVEN_ZIP_TIMEOUT,
+            check=False,
+        )
+        if result.returncode != 0:
+            stderr = result.stderr.decode("utf-8", errors="ignore")
+            raise ArchiveError(f"7z 退出码 {result.returncode}: {stderr}")
+
+    def _compress(self, src: Path, dst: Path) -> None:
+        self._run("a", "-t7z", "-m0=lzma2", str(dst), str(src))
+
+    def _decompress(self, src: Path, dst: Path) -> None:
+        with tempfile.TemporaryDirectory(dir=dst.parent) as out_dir:
+            self._run("x", str(src), f"-o{out_dir}", "-y")
+            members = [p for p in Path(out_dir).iterdir() if p.is_file()]
+            if len(members) != 1:
+                raise ArchiveError(f"归档应只含一个文件，实际 {len(members)} 个")
+            os.replace(members[0], dst)
+
+
+ARCHIVE_CODECS = MappingProxyType(
+    {codec.suffix: codec for codec in (ZstdCodec(), LzmaCodec(), SevenZipCodec())}
+)
+"""按后缀索引的全部编解码器，读取时据此识别已有归档的格式"""
+
+
+def default_codec() -> ArchiveCodec:
+    """新归档的默认格式：可用时使用 zstd，否则使用标准库 lzma"""
+    return ARCHIVE_CODECS[".zst" if ZstdCodec.available else ".xz"]
+
+
+def codec_for(path: Path) -> ArchiveCodec:
+    codec = ARCHIVE_CODECS.get(path.suffix)
+    if codec is None:
+        raise ArchiveError(f"未知的归档格式: {path.name}")
+    return codec
+
+
+def snapshot(db_path: Path, dst: Path) -> None:
+    """以 `VACUUM INTO` 导出一致且紧凑的单文件快照（回滚日志模式，不带 WAL）"""
+    dst.unlink(missing_ok=True)
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        conn.execute("VACUUM INTO ?", (str(dst),))
+    finally:
+        conn.close()
+
+
+def pack(codec: ArchiveCodec, db_path: Path, archive_path: Path) -> tuple[int, int]:
+    """快照并压缩数据库文件，返回 (快照字节数, 归档字节数)；源文件保持不变"""
+    snapshot_path = db_path.with_suffix(".snapshot")
+    try:
+        snapshot(db_path, snapshot_path)
+        codec.compress(snapshot_path, archive_path)
+        return snapshot_path.stat().st_size, archive_path.stat().st_size
+    finally:
+        snapshot_path.unlink(missing_ok=True)
+
+
+def unpack(archive_path: Path, db_path: Path) -> None:
+    """按归档后缀选择编解码器，解压到 `db_path`"""
+    codec_for(archive_path).decompress(archive_path, db_path)
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _cluster_key(
+    conn: sqlite3.Connection,
+    table: str,
+    columns: list[tuple],
+    time_column: str,
+) -> list[str]:
+    """聚簇键：主键前加上时间列，使行按时间顺序存放；时间列含 NULL 时只用主键"""
+    pk = [col[1] for col in sorted(columns, key=lambda c: c[5]) if col[5] > 0]
+    if not pk or time_column in pk or time_column not in {col[1] for col in columns}:
+        return pk
+    column = quote_identifier(time_column)
+    has_null = conn.execute(
+        f"SELECT 1 FROM src.{quote_identifier(table)} WHERE {column} IS NULL LIMIT 1"
+    ).fetchone()
+    return pk if has_null else [time_column, *pk]
+
+
+def _copy_rows_sql(table: str) -> str:
+    quoted = quote_identifier(table)
+    return f"INSERT INTO main.{quoted} SELECT * FROM src.{quoted}"
+
+
+def _compact_into(db_path: Path, dst: Path, time_column: str) -> None:
+    conn = sqlite3.connect(dst, isolation_level=None)
+    try:
+        conn.execute(f"PRAGMA page_size={COMPACT_PAGE_SIZE}")
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(
+            "ATTACH DATABASE ? AS src",
+            (f"{db_path.resolve().as_uri()}?mode=ro",),
+        )
+        conn.execute("BEGIN")
+        conn.execute(
+            f"CREATE TABLE {COMPACT_DDL_TABLE} (name TEXT PRIMARY KEY, "
+            "type TEXT NOT NULL, sql TEXT NOT NULL) WITHOUT ROWID"
+        )
+        objects = conn.execute(
+            "SELECT type, name, tbl_name, sql FROM src.sqlite_master "
+            "WHERE type IN ('table', 'index') AND sql IS NOT NULL "
+            "AND name NOT LIKE 'sqlite_%' ORDER BY type DESC, name"
+        ).fetchall()
+        conn.executemany(
+            f"INSERT INTO {COMPACT_DDL_TABLE} VALUES (?, ?, ?)",
+            [(name, kind, sql) for kind, name, _, sql in objects],
+        )
+
+        clustered: dict[str, list[str]] = {}
+        for kind, name, table, sql in objects:
+            if kind == "index":
+                key = clustered.get(table, [])
+                index_columns = [
+                    row[2]
+                    for row in conn.execute(
+                        f"PRAGMA src.index_info({quote_identifier(name)})"
+                    )
+                ]
+                # 聚簇键已覆盖的索引在紧凑库中多余
+                if index_columns != key[: len(index_columns)]:
+                    conn.execute(sql)
+                continue
+
+            columns = conn.execute(
+                f"PRAGMA src.table_info({quote_identifier(name)})"
+            ).fetchall()
+            key = _cluster_key(conn, name, columns, time_column)
+            if not key:
+                conn.execute(sql)
+                conn.execute(_copy_rows_sql(name))
+                continue
+            clustered[name] = key
+            definitions = ", ".join(
+                f"{quote_identifier(col[1])} {col[2]}".rstrip()
+                + (" NOT NULL" if col[3] else "")
+                for col in columns
+            )
+            key_sql = ", ".join(quote_identifier(c) for c in key)
+            conn.execute(
+                f"CREATE TABLE {quote_identifier(name)} ({definitions}, "
+                f"PRIMARY KEY ({key_sql})) WITHOUT ROWID"
+            )
+            conn.execute(
+                f"INSERT INTO main.{quote_identifier(name)} "
+                f"SELECT * FROM src.{quote_identifier(name)} ORDER BY {key_sql}"
+            )
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE src")
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+def compact(db_path: Path, dst: Path, time_column: str) -> tuple[int, int]:
+    """把数据库转写为紧凑只读库，返回 (源文件字节数, 紧凑库字节数)；源文件保持不变
+
+    紧凑库仍是 SQLite 文件，表名与列保持不变，可直接以 `immutable=1` + mmap 原地查询：
+        1. 有主键的表改为 `WITHOUT ROWID`，以 (时间列, 主键) 聚簇，行按时间顺序紧密存放。
+        2. 聚簇键已覆盖的索引（如单独的时间列索引）不再重建，其余索引照常保留。
+        3. 关闭日志、ANALYZE 后 VACUUM，文件中不含空闲页。
+    """  # noqa: E501
+    _write_atomic(dst, lambda tmp: _compact_into(db_path, tmp, time_column))
+    return db_path.stat().st_size, dst.stat().st_size
+
+
+def _thaw_into(compact_path: Path, dst: Path) -> None:
+    conn = sqlite3.connect(dst, isolation_level=None)
+    try:
+        conn.execute(
+            "ATTACH DATABASE ? AS src",
+            (f"{compact_path.resolve().as_uri()}?mode=ro&immutable=1",),
+        )
+        conn.execute("BEGIN")
+        objects = conn.execute(
+            f"SELECT name, type, sql FROM src.{COMPACT_DDL_TABLE} "
+            "ORDER BY type DESC, name"
+        ).fetchall()
+        for name, kind, sql in objects:
+            conn.execute(sql)
+            if kind == "table":
+                conn.execute(_copy_rows_sql(name))
+        conn.execute("COMMIT")
+        conn.execute("DETACH DATABASE src")
+        conn.execute("PRAGMA journal_mode=WAL")
+    finally:
+        conn.close()
+
+
+def thaw(compact_path: Path, db_path: Path) -> None:
+    """按紧凑库中保存的原始 DDL 还原为普通可写数据库"""
+    _write_atomic(db_path, lambda tmp: _thaw_into(compact_path, tmp))
+
+
+def _write_atomic(dst: Path, write: Callable[[Path], None]) -> None:
+    tmp = dst.with_name(f"{dst.name}.tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        write(tmp)
+        os.replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
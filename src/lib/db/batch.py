@@ -2,33 +2,261 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-08 17:18:19
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-01 14:07:17
+LastEditTime: 2026-03-10 11:02:47
 Description: 批量处理器
 """
 
 from __future__ import annotations
 
 import asyncio
-from collections import defaultdict
-from collections.abc import Awaitable, Callable, Mapping, Sequence
+from collections import OrderedDict, defaultdict
+from collections.abc import Awaitable, Callable, Hashable, Mapping, Sequence
+from contextlib import suppress
+from dataclasses import dataclass
+from enum import StrEnum
+import heapq
+from itertools import count
+import json
+from pathlib import Path
+from time import perf_counter
+from types import MappingProxyType
 from typing import TYPE_CHECKING, Any, NoReturn
 
-import arrow
 from loguru import logger
 
-from src.lib.utils.common import get_current_time
+from src.lib.consts import GLOBAL_JOURNAL_ROOT, GLOBAL_SPILL_ROOT
+from src.lib.enums import LocalizedMixin
+from src.lib.utils.calendar import local_calendar
 
-if TYPE_CHECKING:
-    from datetime import datetime
+from .journal import WriteJournal
 
+if TYPE_CHECKING:
     from .connectors import ShardedDB
     from .ops import BaseOps
 
 
+class OverflowPolicy(LocalizedMixin, StrEnum):
+    """缓冲区达到 `max_size` 后的溢出策略"""
+
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    SPILL = "spill"
+
+    __labels__ = MappingProxyType(
+        {
+            "block": "阻塞生产者",
+            "drop_oldest": "丢弃最旧",
+            "coalesce": "按键合并",
+            "spill": "溢写磁盘",
+        },
+    )
+
+
+@dataclass(slots=True)
+class BatchWriterStats:
+    dropped: int = 0
+    coalesced: int = 0
+    spilled: int = 0
+    flushed: int = 0
+    flushes: int = 0
+    last_latency: float = 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class AdaptiveConfig:
+    """自适应攒批参数
+
+    每次落盘后根据回调耗时与剩余积压调整 `batch_size` / `flush_interval`：
+
+    - 耗时超过 `target_latency`：批次减半，缩短单次事务持锁时间。
+    - 落盘后仍积压满一批：批次翻倍、间隔减半，高峰期每次 fsync 写入更多行。
+    - 批次不足四分之一：批次缓慢回落、间隔回到 `min_interval`，空闲期零星数据及时落盘。
+    - 按截止时间落盘且批次超过四分之一：间隔放宽，最长 `max_interval`，合并更多行。
+
+    调度器在没有积压时不会唤醒，间隔只决定积压数据的最长等待时间，因此只在攒批有收益时放宽。
+    """
+
+    min_batch_size: int = 50
+    max_batch_size: int = 2000
+    min_interval: float = 1.0
+    max_interval: float = 10.0
+    target_latency: float = 0.2
+
+
+class FlushScheduler:
+    """所有 BatchWriter 共享的落盘调度器
+
+    以最小堆维护各写入器的落盘截止时间，单个后台任务只在以下时刻被唤醒：
+
+    - 某个写入器攒满一批（写入器主动 `wake`）。
+    - 堆顶截止时间到期。
+
+    空闲时不存在任何轮询；每次唤醒后将到期写入器分发到独立的落盘任务，
+    避免单个慢回调拖住其他写入器。
+    """
+
+    def __init__(self) -> None:
+        self.writers: list[BatchWriter[Any]] = []
+        self._heap: list[tuple[float, int, BatchWriter[Any]]] = []
+        self._seq = count()
+        self._ready: set[BatchWriter[Any]] = set()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    def register(self, writer: BatchWriter[Any]) -> None:
+        self.writers.append(writer)
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+            logger.debug("BatchWriter flush scheduler started/restarted.")
+
+    def schedule(self, writer: BatchWriter[Any], deadline: float) -> None:
+        self._ensure_running()
+        heapq.heappush(self._heap, (deadline, next(self._seq), writer))
+        if self._heap[0][2] is writer:
+            self._wakeup.set()
+
+    def wake(self, writer: BatchWriter[Any]) -> None:
+        self._ensure_running()
+        self._ready.add(writer)
+        self._wakeup.set()
+
+    def _pop_due(self, now: float) -> set[BatchWriter[Any]]:
+        due, self._ready = self._ready, set()
+        while self._heap and (
+            self._heap[0][0] <= now or self._heap[0][2].deadline != self._heap[0][0]
+        ):
+            deadline, _, writer = heapq.heappop(self._heap)
+            if writer.deadline == deadline:
+                due.add(writer)
+        return due
+
+    async def _run(self) -> NoReturn:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            due = self._pop_due(loop.time())
+            for writer in due:
+                if writer.flushing:
+                    continue
+                task = asyncio.create_task(writer.flush_due())
+                self._flush_tasks.add(task)
+                task.add_done_callback(self._flush_tasks.discard)
+
+            if due:
+                continue
+            timeout = self._heap[0][0] - loop.time() if self._heap else None
+            with suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+
+    def recover_all(self) -> None:
+        """启动时接管全部写入器遗留的预写日志与溢写文件"""
+        for writer in self.writers:
+            writer.recover()
+
+    async def flush_all(self) -> None:
+        """立即清空全部写入器（含溢写积压），用于停机前落盘"""
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        for writer in self.writers:
+            while writer.size:
+                await writer.flush_due()
+
+
+flush_scheduler = FlushScheduler()
+
+
+class WriterGroup:
+    """协同落盘单元（unit of work）
+
+    组内任一写入器到期或攒满时，一次性抽干组内全部写入器，按注册顺序交给同一个回调，
+    由回调在单个事务内完成全部写入，并把衍生数据合并后按目标分片各写一次。
+    """
+
+    def __init__(
+        self,
+        flush_callback: Callable[
+            [list[tuple[BatchWriter[Any], list[Any]]]], Awaitable[None]
+        ],
+        name: str = "WriterGroup",
+    ) -> None:
+        self.flush_callback = flush_callback
+        self.name = name
+        self.writers: list[BatchWriter[Any]] = []
+        self.flushing = False
+
+    def add(self, writer: BatchWriter[Any]) -> None:
+        self.writers.append(writer)
+
+    async def flush_due(self) -> None:
+        if self.flushing:
+            return
+        self.flushing = True
+        for writer in self.writers:
+            writer.flushing = True
+        try:
+            while batches := [
+                (writer, batch)
+                for writer in self.writers
+                if (batch := writer._drain(writer.batch_size))
+            ]:
+                started = perf_counter()
+                ok = False
+                try:
+                    await self.flush_callback(batches)
+                    ok = True
+                except Exception as e:
+                    logger.error(f"WriterGroup {self.name} flush error: {e}")
+                finally:
+                    latency = perf_counter() - started
+                    for writer, batch in batches:
+                        writer._record_flush(len(batch), latency, ok)
+
+                if all(len(w._pending) < w.batch_size for w in self.writers):
+                    break
+        finally:
+            self.flushing = False
+            for writer in self.writers:
+                writer.flushing = False
+                writer.deadline = None
+                writer._arm()
+
+
 class BatchWriter[T]:
     """通用内存缓冲写入器
 
     执行流：积攒数据 -> 去重 -> 批量回调
+
+    Args:
+        flush_callback: 批量落盘回调。
+        batch_size: 单批最大条数。
+        flush_interval: 最长攒批时间（秒）。
+        max_size: 内存缓冲上限，0 表示不限制。
+        overflow: 缓冲达到上限后的溢出策略，见 `OverflowPolicy`。
+        key_func: 合并键，`COALESCE` 策略必填，同键新数据直接覆盖旧数据。
+        name: 写入器名称，用于日志与溢写文件名，默认取回调函数名。
+        spill_dir: `SPILL` 策略的溢写目录，默认 `GLOBAL_SPILL_ROOT`。
+        adaptive: 自适应攒批参数，为 None 时使用固定的批次与间隔。
+        scheduler: 落盘调度器，默认使用全局共享的 `flush_scheduler`。
+        group: 协同落盘单元，加入后由 `WriterGroup` 统一抽干落盘，`flush_callback`
+            仅在脱离协同模式时使用。
+        journal: 是否启用预写日志，启用后内存缓冲在进程崩溃后可回放。
+        journal_dir: 预写日志目录，默认 `GLOBAL_JOURNAL_ROOT`。
+
+    注意事项:
+        1. `COALESCE` 策略下同键数据始终合并，仅当出现新键且缓冲已满时阻塞生产者。
+        2. `SPILL` 策略下一旦存在溢写积压，新数据也会追加到磁盘，保证先进先出。
+        3. 溢写文件为 JSON Lines，数据项必须可被 `json` 序列化；溢写行先进入内存缓冲，
+           由后台任务在线程中分批追加到磁盘，尚未写入的部分可直接被下一次落盘取走。
+           读回偏移持久化在同名 `.offset` 文件中，读回后的数据与内存缓冲同等对待
+           （启用预写日志时可回放），重启不会重复读回。
+        4. 预写日志在每次成功落盘后截断为剩余缓冲，回放语义为至少一次；
+           `COALESCE` 键在检查点之后被合并过的已落盘数据可能被重复回放。
     """
 
     def __init__(
@@ -36,55 +264,477 @@ class BatchWriter[T]:
         flush_callback: Callable[[list[T]], Awaitable[None]],
         batch_size: int = 100,
         flush_interval: float = 3.0,
+        max_size: int = 0,
+        overflow: OverflowPolicy = OverflowPolicy.BLOCK,
+        key_func: Callable[[T], Hashable] | None = None,
+        name: str | None = None,
+        spill_dir: Path | None = None,
+        adaptive: AdaptiveConfig | None = None,
+        scheduler: FlushScheduler | None = None,
+        group: WriterGroup | None = None,
+        journal: bool = False,
+        journal_dir: Path | None = None,
     ) -> None:
-        self.queue = asyncio.Queue()
+        if overflow == OverflowPolicy.COALESCE and key_func is None:
+            raise ValueError("COALESCE 溢出策略必须提供 key_func")
+
         self.flush_callback = flush_callback
         self.batch_size = batch_size
         self.flush_interval = flush_interval
-        self._task: asyncio.Task | None = None
-        self._worker_name: str | None = None
+        self.max_size = max_size
+        self.overflow = overflow
+        self.key_func = key_func
+        self.name = name or getattr(flush_callback, "__name__", "Unknown")
+        self.adaptive = adaptive
+        self.stats = BatchWriterStats()
 
-    def _ensure_worker_running(self) -> None:
-        if self._task is None or self._task.done():
-            self._task = asyncio.create_task(self._worker())
-            self._worker_name = getattr(self.flush_callback, "__name__", "Unknown")
-            logger.debug(f"BatchWriter worker [{self._worker_name}] started/restarted.")
+        if adaptive is not None:
+            self.batch_size = min(
+                max(batch_size, adaptive.min_batch_size),
+                adaptive.max_batch_size,
+            )
+            self.flush_interval = min(
+                max(flush_interval, adaptive.min_interval),
+                adaptive.max_interval,
+            )
+
+        self._pending: OrderedDict[Hashable, T] = OrderedDict()
+        self._seq = count()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+
+        self._spill_path = (spill_dir or GLOBAL_SPILL_ROOT) / f"{self.name}.jsonl"
+        # 已读回的字节偏移，读回后的数据由内存缓冲（及预写日志）接管，重启后从此处继续
+        self._spill_offset_path = self._spill_path.with_suffix(".offset")
+        self._spill_offset = 0
+        self._spill_backlog = 0
+        # 溢写积压 = 磁盘上未读回的行 + 正在后台写入且未被取走的行 + 尚未写入的缓冲行
+        self._spill_readable = 0
+        self._spill_inflight: list[str] = []
+        self._spill_taken = 0
+        self._spill_buffer: list[str] = []
+        self._spill_task: asyncio.Task[None] | None = None
+        self._spill_recovered = False
+        self._journal = (
+            WriteJournal(journal_dir or GLOBAL_JOURNAL_ROOT, self.name)
+            if journal
+            else None
+        )
+        # 缓冲中各键最新一条日志记录的偏移，按偏移递增排列
+        self._journal_pos: OrderedDict[Hashable, int] = OrderedDict()
+
+        self.deadline: float | None = None
+        self.flushing = False
+        self._scheduler = scheduler or flush_scheduler
+        self._scheduler.register(self)
+        self.group = group
+        if group is not None:
+            group.add(self)
+
+    @property
+    def size(self) -> int:
+        """当前积压条数（内存 + 磁盘溢写）"""
+        return len(self._pending) + self._spill_backlog
+
+    def _is_full(self) -> bool:
+        return 0 < self.max_size <= len(self._pending)
+
+    def _ensure_recovered(self) -> None:
+        if not self._spill_recovered:
+            self._spill_recovered = True
+            self._recover_journal()
+            self._recover_spill()
+            self._arm()
+
+    def recover(self) -> None:
+        """接管上次进程遗留的预写日志与溢写文件，需在事件循环内调用"""
+        self._ensure_recovered()
+
+    def _key_of(self, item: T) -> Hashable:
+        if self.overflow == OverflowPolicy.COALESCE and self.key_func:
+            return self.key_func(item)
+        return next(self._seq)
+
+    def _arm(self) -> None:
+        """有积压时向调度器登记截止时间，攒满一批时立即唤醒"""
+        if self.flushing or not self._pending:
+            return
+        if len(self._pending) >= self.batch_size:
+            self._scheduler.wake(self)
+        if self.deadline is None:
+            self.deadline = asyncio.get_running_loop().time() + self.flush_interval
+            self._scheduler.schedule(self, self.deadline)
 
     async def add(self, item: T) -> None:
-        self._ensure_worker_running()
-        await self.queue.put(item)
+        self._ensure_recovered()
+        await self._put(item)
 
     async def add_all(self, items: list[T]) -> None:
         if not items:
             return
-        self._ensure_worker_running()
+        self._ensure_recovered()
         for item in items:
-            self.queue.put_nowait(item)
+            await self._put(item)
 
-    async def _worker(self) -> NoReturn:
-        buffer = []
-        last_flush = get_current_time()
+    async def _put(self, item: T) -> None:
+        key = self._key_of(item)
 
         while True:
-            try:
-                timeout = self.flush_interval - (get_current_time() - last_flush)
-                timeout = max(0.1, timeout)
-
-                item = await asyncio.wait_for(self.queue.get(), timeout=timeout)
-                buffer.append(item)
-            except TimeoutError:
-                pass
+            if key in self._pending:
+                self._pending[key] = item
+                self.stats.coalesced += 1
+                self._log(key, item)
+                return
 
-            if len(buffer) >= self.batch_size or (
-                buffer and get_current_time() - last_flush >= self.flush_interval
+            if self.overflow == OverflowPolicy.SPILL and (
+                self._spill_backlog or self._is_full()
             ):
+                self._spill(item)
+                return
+
+            if not self._is_full():
+                break
+
+            if self.overflow == OverflowPolicy.DROP_OLDEST:
+                dropped, _ = self._pending.popitem(last=False)
+                self._journal_pos.pop(dropped, None)
+                self.stats.dropped += 1
+                break
+
+            self._has_space.clear()
+            await self._has_space.wait()
+
+        self._pending[key] = item
+        self._log(key, item)
+        if self.deadline is None or len(self._pending) >= self.batch_size:
+            self._arm()
+
+    def _log(self, key: Hashable, item: T) -> None:
+        if self._journal is not None:
+            self._journal_pos[key] = self._journal.append(item)
+            self._journal_pos.move_to_end(key)
+
+    def _drain(self, limit: int) -> list[T]:
+        batch: list[T] = []
+        while self._pending and len(batch) < limit:
+            key, item = self._pending.popitem(last=False)
+            self._journal_pos.pop(key, None)
+            batch.append(item)
+
+        if self._spill_backlog:
+            room = self.max_size - len(self._pending) if self.max_size else limit
+            for item in self._load_spilled(room):
+                key = next(self._seq)
+                self._pending[key] = item
+                self._log(key, item)
+
+        if not self._is_full():
+            self._has_space.set()
+        return batch
+
+    def _spill(self, item: T) -> None:
+        line = json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+        self._spill_buffer.append(line + "\n")
+        self._spill_backlog += 1
+        self.stats.spilled += 1
+        if self._spill_task is None:
+            self._spill_task = asyncio.create_task(self._write_spilled())
+
+    async def _write_spilled(self) -> None:
+        """后台把溢写缓冲分批追加到磁盘，文件 IO 不占用事件循环"""
+        try:
+            while self._spill_buffer:
+                lines, self._spill_buffer = self._spill_buffer, []
+                self._spill_inflight, self._spill_taken = lines, 0
                 try:
-                    await self.flush_callback(buffer)
-                except Exception as e:
-                    logger.error(f"BatchWriter {self._worker_name} flush error: {e}")
+                    await asyncio.to_thread(self._append_spilled, lines)
+                except OSError as e:
+                    logger.error(f"BatchWriter [{self.name}] 溢写失败，暂留内存: {e}")
+                    self._spill_buffer[:0] = lines[self._spill_taken :]
+                    return
                 finally:
-                    buffer.clear()
-                    last_flush = get_current_time()
+                    self._spill_inflight = []
+                # 写入期间已从内存取走的行在文件中跳过
+                taken = lines[: self._spill_taken]
+                if taken:
+                    self._spill_offset += sum(len(line.encode()) for line in taken)
+                    self._save_spill_offset()
+                self._spill_readable += len(lines) - len(taken)
+                self._reset_spill_if_drained()
+        finally:
+            self._spill_task = None
+
+    def _append_spilled(self, lines: list[str]) -> None:
+        self._spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._spill_path.open("a", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    def _load_spilled(self, limit: int) -> list[T]:
+        """按先进先出读回溢写：磁盘 -> 在途写入 -> 内存缓冲，后者仅在前者取尽后读取"""
+        if limit <= 0 or not self._spill_backlog:
+            return []
+
+        items: list[T] = []
+        consumed = 0
+        if self._spill_readable:
+            want = min(limit, self._spill_readable)
+            with self._spill_path.open("r", encoding="utf-8") as f:
+                f.seek(self._spill_offset)
+                while consumed < want and (line := f.readline()):
+                    consumed += 1
+                    if (item := self._parse_spilled(line)) is not None:
+                        items.append(item)
+                self._spill_offset = f.tell()
+            self._spill_readable = (
+                self._spill_readable - consumed if consumed == want else 0
+            )
+            self._save_spill_offset()
+
+        if not self._spill_readable:
+            room = limit - consumed
+            start = self._spill_taken
+            taken = self._spill_inflight[start : start + room]
+            self._spill_taken += len(taken)
+            if self._spill_taken == len(self._spill_inflight):
+                rest = room - len(taken)
+                taken += self._spill_buffer[:rest]
+                del self._spill_buffer[:rest]
+            consumed += len(taken)
+            items.extend(json.loads(line) for line in taken)
+
+        self._spill_backlog = max(0, self._spill_backlog - consumed)
+        self._reset_spill_if_drained()
+        return items
+
+    def _parse_spilled(self, line: str) -> T | None:
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning(f"BatchWriter [{self.name}] 跳过损坏的溢写行: {line[:80]!r}")
+            return None
+
+    def _save_spill_offset(self) -> None:
+        self._spill_offset_path.write_text(str(self._spill_offset), encoding="utf-8")
+
+    def _reset_spill_if_drained(self) -> None:
+        """积压清空且无在途写入时删除溢写文件"""
+        if self._spill_backlog or self._spill_inflight:
+            return
+        self._spill_readable = 0
+        self._spill_offset = 0
+        self._spill_path.unlink(missing_ok=True)
+        self._spill_offset_path.unlink(missing_ok=True)
+
+    def _recover_journal(self) -> None:
+        """回放预写日志：同键数据按写入顺序合并，随后截断为当前缓冲"""
+        if self._journal is None:
+            return
+        try:
+            records = self._journal.open()
+        except OSError as e:
+            logger.error(f"BatchWriter [{self.name}] 预写日志打开失败，已禁用: {e}")
+            self._journal = None
+            return
+        for item in records:
+            self._pending[self._key_of(item)] = item
+        if records:
+            self._rotate_journal()
+
+    def _rotate_journal(self) -> None:
+        assert self._journal is not None
+        offsets = self._journal.reset(self._pending.values())
+        self._journal_pos = OrderedDict(zip(self._pending, offsets, strict=True))
+
+    def _release_journal(self) -> None:
+        """落盘成功后释放日志：无存活记录时原地截断，否则写检查点，必要时换段"""
+        journal = self._journal
+        if journal is None:
+            return
+        if not self._journal_pos:
+            journal.truncate()
+            return
+        live_from = next(iter(self._journal_pos.values()))
+        if journal.should_reset(live_from):
+            self._rotate_journal()
+        else:
+            journal.checkpoint(live_from)
+
+    def _recover_spill(self) -> None:
+        """接管上次进程遗留的溢写文件
+
+        从记录的偏移处继续，跳过已读回的部分与崩溃留下的空行、残行，
+        把剩余数据重写为紧凑的新文件后再计入积压。
+        """
+        if not self._spill_path.exists():
+            self._spill_offset_path.unlink(missing_ok=True)
+            return
+        try:
+            offset = int(self._spill_offset_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            offset = 0
+
+        lines: list[str] = []
+        with self._spill_path.open("r", encoding="utf-8") as f:
+            if 0 < offset <= self._spill_path.stat().st_size:
+                f.seek(offset)
+            for line in f:
+                if line.strip() and self._parse_spilled(line) is not None:
+                    lines.append(line if line.endswith("\n") else line + "\n")
+
+        if not lines:
+            self._reset_spill_if_drained()
+            return
+        tmp_path = self._spill_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            f.writelines(lines)
+        tmp_path.replace(self._spill_path)
+        self._spill_offset_path.unlink(missing_ok=True)
+
+        self._spill_backlog = self._spill_readable = len(lines)
+        logger.warning(
+            f"BatchWriter [{self.name}] 接管遗留溢写 {self._spill_backlog} 条"
+        )
+        if not self._pending:
+            for item in self._load_spilled(self.max_size or self.batch_size):
+                key = next(self._seq)
+                self._pending[key] = item
+                self._log(key, item)
+
+    def _adapt(self, flushed: int, latency: float) -> None:
+        cfg = self.adaptive
+        if cfg is None:
+            return
+
+        if latency > cfg.target_latency:
+            self.batch_size = max(cfg.min_batch_size, self.batch_size // 2)
+        elif self.size >= self.batch_size:
+            self.batch_size = min(cfg.max_batch_size, self.batch_size * 2)
+            self.flush_interval = max(cfg.min_interval, self.flush_interval / 2)
+        elif flushed < self.batch_size // 4:
+            self.batch_size = max(cfg.min_batch_size, self.batch_size * 3 // 4)
+            self.flush_interval = cfg.min_interval
+        elif flushed < self.batch_size:
+            self.flush_interval = min(cfg.max_interval, self.flush_interval * 1.5)
+
+    def _record_flush(self, flushed: int, latency: float, ok: bool) -> None:
+        if ok:
+            self.stats.flushed += flushed
+            self._release_journal()
+        self.stats.flushes += 1
+        self.stats.last_latency = latency
+        self._adapt(flushed, latency)
+
+    async def _flush(self, buffer: list[T]) -> None:
+        started = perf_counter()
+        ok = False
+        try:
+            await self.flush_callback(buffer)
+            ok = True
+        except Exception as e:
+            logger.error(f"BatchWriter {self.name} flush error: {e}")
+        finally:
+            self._record_flush(len(buffer), perf_counter() - started, ok)
+
+    async def flush_due(self) -> None:
+        """由调度器触发：连续落盘直到剩余不足一批，余量重新登记截止时间"""
+        if self.group is not None:
+            await self.group.flush_due()
+            return
+
+        self.flushing = True
+        try:
+            while batch := self._drain(self.batch_size):
+                await self._flush(batch)
+                if len(self._pending) < self.batch_size:
+                    break
+        finally:
+            self.flushing = False
+            self.deadline = None
+            self._arm()
+
+
+@dataclass(frozen=True, slots=True)
+class BatchWriteJob[PayloadT: Mapping[str, Any], OpsT: BaseOps[Any]]:
+    """`execute_batch_write_jobs` 的单个写入任务"""
+
+    batch: Sequence[PayloadT]
+    ops_class: type[OpsT]
+    method: Callable[[OpsT, list[PayloadT]], Awaitable[Any]]
+    time_field: str = "created_at"
+
+
+SHARD_WRITE_CONCURRENCY = 4
+"""`execute_batch_write_jobs` 默认的分片并发写入上限"""
+
+
+def _route_by_month[T: Mapping[str, Any]](
+    batch: Sequence[T],
+    time_field: str,
+) -> dict[int, list[T]]:
+    """按本地日历月份切分批次，路由键为月份零点时间戳"""
+    month_start = local_calendar.month_start
+    routes: dict[int, list[T]] = defaultdict(list)
+    for item in batch:
+        routes[month_start(item[time_field])].append(item)
+    return routes
+
+
+async def execute_batch_write_jobs(
+    db_instance: ShardedDB,
+    jobs: Sequence[BatchWriteJob[Any, Any]],
+    max_concurrency: int = SHARD_WRITE_CONCURRENCY,
+) -> None:
+    """将多个写入任务按月份路由后合并落盘：每个目标分片只开启一个事务。
+
+    Args:
+        db_instance: 目标分片数据库实例 (ShardedDB)。
+        jobs: 写入任务列表，同一分片内按列表顺序依次执行。
+        max_concurrency: 同时写入的分片数上限。
+
+    注意事项:
+        1. 路由规则与 `execute_batch_write` 一致。
+        2. 同一分片内任一任务失败将回滚该分片的全部任务，不影响其他分片。
+        3. 不同分片并发写入，彼此之间不保证先后顺序。
+    """
+    route_map: dict[int, list[tuple[BatchWriteJob[Any, Any], list[Any]]]] = defaultdict(
+        list
+    )
+    for job in jobs:
+        if not job.batch:
+            continue
+        for route_ctx, grouped_items in _route_by_month(
+            job.batch, job.time_field
+        ).items():
+            route_map[route_ctx].append((job, grouped_items))
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _write_shard(
+        time_ctx: int,
+        shard_jobs: list[tuple[BatchWriteJob[Any, Any], list[Any]]],
+    ) -> None:
+        logger_name = ",".join(
+            dict.fromkeys(j.ops_class.__name__ for j, _ in shard_jobs)
+        )
+        async with semaphore:
+            try:
+                async with db_instance.session(
+                    time_ctx=time_ctx, commit=True
+                ) as session:
+                    for job, grouped_items in shard_jobs:
+                        await job.method(job.ops_class(session), grouped_items)
+
+            except Exception as e:
+                logger.error(
+                    f"[{logger_name}] 落盘至 {local_calendar.shard_key(time_ctx)} 分片时发生错误: {e}"  # noqa: E501
+                )
+
+    if len(route_map) == 1:
+        await _write_shard(*next(iter(route_map.items())))
+        return
+    await asyncio.gather(
+        *(_write_shard(ctx, shard_jobs) for ctx, shard_jobs in route_map.items())
+    )
 
 
 async def execute_batch_write[PayloadT: Mapping[str, Any], OpsT: BaseOps[Any]](
@@ -93,6 +743,7 @@ async def execute_batch_write[PayloadT: Mapping[str, Any], OpsT: BaseOps[Any]](
     ops_class: type[OpsT],
     method: Callable[[OpsT, list[PayloadT]], Awaitable[Any]],
     time_field: str,
+    max_concurrency: int = SHARD_WRITE_CONCURRENCY,
 ) -> None:
     """按时间戳对批量数据进行分组路由，并写入对应的分片数据库。
 
@@ -102,12 +753,14 @@ async def execute_batch_write[PayloadT: Mapping[str, Any], OpsT: BaseOps[Any]](
         ops_class: 执行写入操作的 BaseOps 子类。
         method: 目标 Ops 类的未绑定异步写入方法。
         time_field: 用于计算路由的 Unix 时间戳字段名。
+        max_concurrency: 同时写入的分片数上限。
 
     注意事项:
         1. 仅支持传入 `ShardedDB` 实例，不可混用静态主库 (`StaticDB`)。
         2. `batch` 中所有字典项必须包含由 `time_field` 指定的整型时间戳字段。
-        3. 内部按东八区 (Asia/Shanghai) 截取月份作为路由上下文。
+        3. 内部按本地日历 (`local_calendar`) 截取月份作为路由上下文。
         4. 任意切片写入失败将被捕获并记录日志，不会阻断其他月份切片的执行。
+        5. 跨月切片（如月末边界、历史回填）并发写入各自分片。
 
     Example:
         >>> logs: list[AuditLogPayload] = [{"target_id": 1, "created_at": 1735660800}]
@@ -119,25 +772,8 @@ async def execute_batch_write[PayloadT: Mapping[str, Any], OpsT: BaseOps[Any]](
         ...     time_field="created_at"
         ... )
     """
-    if not batch:
-        return
-
-    logger_name = ops_class.__name__
-    route_map: dict[datetime, list[PayloadT]] = defaultdict(list)
-
-    for item in batch:
-        ts = item[time_field]
-        dt = arrow.get(ts).to("Asia/Shanghai").datetime
-        route_ctx = dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        route_map[route_ctx].append(item)
-
-    for time_ctx, grouped_items in route_map.items():
-        try:
-            async with db_instance.session(time_ctx=time_ctx, commit=True) as session:
-                ops_instance = ops_class(session)
-                await method(ops_instance, grouped_items)
-
-        except Exception as e:
-            logger.error(
-                f"[{logger_name}] 落盘至 {time_ctx.strftime('%Y_%m')} 分片时发生错误: {e}"  # noqa: E501
-            )
+    await execute_batch_write_jobs(
+        db_instance,
+        [BatchWriteJob(batch, ops_class, method, time_field)],
+        max_concurrency,
+    )
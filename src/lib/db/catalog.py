@@ -0,0 +1,239 @@
+"""
+Author: SakuraiCora<1479559098@qq.com>
+Date: 2026-03-04 15:08:33
+LastEditors: SakuraiCora<1479559098@qq.com>
+LastEditTime: 2026-03-04 15:08:33
+Description: 分片目录：时间范围 / 行数 / 归档状态 / 布隆过滤器
+"""
+
+from __future__ import annotations
+
+import base64
+from collections.abc import Iterable, Mapping
+from dataclasses import asdict, dataclass, field
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any
+
+from src.logger import logger
+
+CATALOG_VERSION = 1
+BLOOM_FALSE_POSITIVE_RATE = 0.01
+"""布隆过滤器目标误判率"""
+BLOOM_MIN_BITS = 1024
+"""布隆过滤器最小位数，避免小分片的过滤器过短导致误判率失控"""
+
+
+class BloomFilter:
+    """定长布隆过滤器，使用 blake2b 双重哈希
+
+    Args:
+        size: 位数组长度（位）。
+        hashes: 哈希函数个数。
+        bits: 已有的位数组，用于反序列化。
+    """
+
+    __slots__ = ("bits", "hashes", "size")
+
+    def __init__(self, size: int, hashes: int, bits: bytes | None = None) -> None:
+        self.size = max(8, size)
+        self.hashes = max(1, hashes)
+        self.bits = bytearray(bits) if bits else bytearray((self.size + 7) // 8)
+
+    @classmethod
+    def for_capacity(
+        cls,
+        capacity: int,
+        error_rate: float = BLOOM_FALSE_POSITIVE_RATE,
+    ) -> BloomFilter:
+        n = max(1, capacity)
+        optimal = math.ceil(-n * math.log(error_rate) / (math.log(2) ** 2))
+        size = max(BLOOM_MIN_BITS, optimal)
+        return cls(size, round(optimal / n * math.log(2)))
+
+    def _positions(self, value: str) -> Iterable[int]:
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, value: str) -> None:
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value)
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "size": self.size,
+            "hashes": self.hashes,
+            "bits": base64.b64encode(self.bits).decode(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> BloomFilter:
+        return cls(data["size"], data["hashes"], base64.b64decode(data["bits"]))
+
+
+def bloom_token(column: str, value: str) -> str:
+    return f"{column}\0{value}"
+
+
+@dataclass(slots=True)
+class ShardEntry:
+    """单个分片的目录项
+
+    Attributes:
+        shard_key: 分片键。
+        min_ts: 分片内最早的时间戳，空分片为 None。
+        max_ts: 分片内最晚的时间戳，空分片为 None。
+        rows: 各表行数之和。
+        columns: 已收录进布隆过滤器的列名。
+        archived: 是否已压缩归档（原始 .db 已删除）。
+        dirty: 统计后是否发生过写入；脏目录项不参与剪枝。
+        bloom: `列名\\0取值` 的布隆过滤器。
+    """
+
+    shard_key: str
+    min_ts: int | None = None
+    max_ts: int | None = None
+    rows: int = 0
+    columns: tuple[str, ...] = ()
+    archived: bool = False
+    dirty: bool = True
+    bloom: BloomFilter | None = field(default=None, repr=False)
+
+    def may_contain(
+        self,
+        start_ts: int,
+        end_ts: int,
+        probe: Mapping[str, str] | None = None,
+    ) -> bool:
+        """分片是否可能含有目标数据；无法判定时一律返回 True"""
+        if self.dirty:
+            return True
+        if self.rows == 0 or self.min_ts is None or self.max_ts is None:
+            return False
+        if self.max_ts < start_ts or self.min_ts > end_ts:
+            return False
+        if probe and self.bloom is not None:
+            for column, value in probe.items():
+                if (
+                    column in self.columns
+                    and bloom_token(column, value) not in self.bloom
+                ):
+                    return False
+        return True
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data["columns"] = list(self.columns)
+        data["bloom"] = self.bloom.to_dict() if self.bloom is not None else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> ShardEntry:
+        bloom = data.get("bloom")
+        return cls(
+            shard_key=data["shard_key"],
+            min_ts=data.get("min_ts"),
+            max_ts=data.get("max_ts"),
+            rows=data.get("rows", 0),
+            columns=tuple(data.get("columns", ())),
+            archived=data.get("archived", False),
+            dirty=data.get("dirty", True),
+            bloom=BloomFilter.from_dict(bloom) if bloom else None,
+        )
+
+
+class ShardCatalog:
+    """`ShardedDB` 的分片目录，以 JSON 旁路文件保存
+
+    Args:
+        path: 目录文件路径。
+
+    注意事项:
+        1. 目录只用于剪枝，任何不确定（缺项 / 脏项 / 文件损坏）都退化为“需要查询”。
+        2. 写入会把目录项标脏，直到下一次 `ShardedDB.refresh_catalog` 重新扫描。
+        3. 落盘使用临时文件 + `os.replace`，中途崩溃不会留下半个目录文件。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._entries: dict[str, ShardEntry] = {}
+        self._loaded = False
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") != CATALOG_VERSION:
+                return
+            self._entries = {
+                key: ShardEntry.from_dict(item) for key, item in data["shards"].items()
+            }
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"分片目录损坏，已忽略: {self.path.name} ({e})")
+            self._entries = {}
+
+    def get(self, shard_key: str) -> ShardEntry | None:
+        self._ensure_loaded()
+        return self._entries.get(shard_key)
+
+    def entries(self) -> list[ShardEntry]:
+        self._ensure_loaded()
+        return [self._entries[key] for key in sorted(self._entries)]
+
+    def may_contain(
+        self,
+        shard_key: str,
+        start_ts: int,
+        end_ts: int,
+        probe: Mapping[str, str] | None = None,
+    ) -> bool:
+        entry = self.get(shard_key)
+        return entry is None or entry.may_contain(start_ts, end_ts, probe)
+
+    def put(self, entry: ShardEntry) -> None:
+        self._ensure_loaded()
+        self._entries[entry.shard_key] = entry
+        self.save()
+
+    def mark_dirty(self, shard_key: str) -> None:
+        """标记分片已被写入；仅在状态变化时落盘"""
+        entry = self.get(shard_key)
+        if entry is None or entry.dirty:
+            return
+        entry.dirty = True
+        self.save()
+
+    def mark_archived(self, shard_key: str, archived: bool) -> None:
+        entry = self.get(shard_key)
+        if entry is None:
+            entry = self._entries[shard_key] = ShardEntry(shard_key)
+        if entry.archived == archived:
+            return
+        entry.archived = archived
+        self.save()
+
+    def save(self) -> None:
+        self._ensure_loaded()
+        payload = {
+            "version": CATALOG_VERSION,
+            "shards": {key: entry.to_dict() for key, entry in self._entries.items()},
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
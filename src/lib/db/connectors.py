@@ -2,7 +2,7 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-01 00:39:22
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-02 19:57:44
+LastEditTime: 2026-03-10 14:05:52
 Description: db 连接器
 """
 
@@ -10,35 +10,66 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 import asyncio
-from collections.abc import AsyncGenerator, Awaitable, Callable
+from collections.abc import AsyncGenerator, Awaitable, Callable, Iterable, Mapping
 from contextlib import _AsyncGeneratorContextManager, asynccontextmanager
 from dataclasses import dataclass, field
 import os
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, final
+from typing import TYPE_CHECKING, Any, ClassVar, final
 
-import arrow
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
 from src.lib.consts import GLOBAL_DB_ROOT
+from src.lib.utils.calendar import local_calendar
 from src.lib.utils.common import get_current_time
 from src.logger import logger
 
-from .manager import db_manager
+from .archive import (
+    ARCHIVE_CODECS,
+    ARCHIVE_CPU_BUDGET,
+    COMPACT_DDL_TABLE,
+    COMPACT_SUFFIX,
+    ArchiveCodec,
+    ArchiveFormat,
+    compact,
+    default_codec,
+    pack,
+    quote_identifier,
+    thaw,
+    unpack,
+)
+from .catalog import BloomFilter, ShardCatalog, ShardEntry, bloom_token
+from .manager import MAX_ATTACHED, db_manager
+from .profiles import (
+    ARCHIVE_PROFILE,
+    COLD_SHARD_PROFILE,
+    DEFAULT_PROFILE,
+    SqliteProfile,
+)
+from .scratch import scratch_cache
 
 if TYPE_CHECKING:
     from datetime import datetime
 
+SHARD_QUERY_CONCURRENCY = 4
+"""跨分片查询时同时在查的分片数上限"""
+PROVISION_LEAD_SECONDS = 6 * 3600
+"""距下个月不足该时长时才预建下个月分片"""
+
 
 @dataclass
 class BaseDB(ABC):
     """数据库管理的抽象基类。
 
     子类必须实现 session() 方法，返回一个 AsyncSession 的上下文管理器。
-    """
+    `commit=True` 的会话经由该文件的写入执行器串行提交；`commit=False` 的会话来自只读连接池，
+    只能用于查询，在 WAL 下不会排队等待写事务。
+    """  # noqa: E501
 
     namespace: str
+    profile: SqliteProfile = field(default=DEFAULT_PROFILE, kw_only=True)
 
     @abstractmethod
     def session(
@@ -68,10 +99,8 @@ class BaseDB(ABC):
             >>> await my_db.init(Base)
         """
         async with self.session() as session:
-            engine = session.bind
-            assert isinstance(engine, AsyncEngine)
-            async with engine.begin() as conn:
-                await conn.run_sync(base.metadata.create_all)
+            conn = await session.connection()
+            await conn.run_sync(base.metadata.create_all)
 
 
 @final
@@ -99,7 +128,7 @@ class StaticDB(BaseDB):
         commit: bool = True,
     ) -> _AsyncGeneratorContextManager[AsyncSession, None]:
         path = self.base_dir / self.filename
-        return db_manager.open(str(path), commit)
+        return db_manager.open(str(path), commit, self.profile, resident=True)
 
 
 @final
@@ -109,8 +138,10 @@ class ShardedDB(BaseDB):
 
     专门用于管理按时间切分的流水数据（如日志、聊天记录），内置跨库查询与冷库自动压缩/唤醒机制。
 
-    ⚠️ 环境依赖：
-        - 系统中必须安装 `7z` 命令。
+    冷库以 `codec` 指定的格式（默认 zstd，未安装时退回标准库 lzma）在进程内流式压缩，
+    读取时按后缀识别格式，旧版 `.7z` 归档仍可读取（需系统安装 `7z` 命令）。
+    `archive_format=ArchiveFormat.COMPACT` 为显式开启的选项：改为转写成紧凑只读库（`.cdb`），
+    查询时原地只读打开、无需解压，但文件体积大于压缩归档，仅适合冷库查询频繁且磁盘宽裕的场景。
 
     Attributes:
         prefix (str): 数据库文件名的前缀，例如 "water_logs"。
@@ -122,14 +153,12 @@ class ShardedDB(BaseDB):
         >>> water_db = ShardedDB(prefix="water_logs", fmt="%Y_%m")
 
         2. 日常单库读写（自动路由到目标时间的分库）
-        >>> import arrow
         >>> from src.lib.utils.common import get_current_time
         >>>
-        >>> now = arrow.get(get_current_time()).datetime
-        >>> async with water_db.session(time_ctx=now) as session:
+        >>> async with water_db.session(time_ctx=get_current_time()) as session:
         >>>     session.add(WaterMessage(user_id=123, group_id=456))
 
-        3. 跨库聚合查询（遇到冷库会自动静默解压）
+        3. 跨库聚合查询（分片并发查询，遇到冷库会自动静默解压）
         >>> start_time = arrow.get("2026-01-01").datetime
         >>> end_time = arrow.get("2026-03-31").datetime
         >>>
@@ -139,24 +168,103 @@ class ShardedDB(BaseDB):
         >>>
         >>> results: list[int] = await water_db.map_reduce(start_time, end_time, count_msgs)
         >>> total = sum(results)
+        >>>
+        >>> # 跨度较长时用 map_fold 边查边折叠，不必保留每个分片的结果
+        >>> total = await water_db.map_fold(start_time, end_time, count_msgs, operator.add, 0)
+        >>>
+        >>> # 需要跨分片 JOIN / 排序时，把分片附加到同一连接，直接按原表名写一条 SQL
+        >>> async with water_db.attached_session(start_time, end_time) as session:
+        >>>     total = (await session.execute(stmt)).scalar() or 0
 
         4. 配合定时任务执行冷库压缩（如使用 APScheduler）
         >>> @scheduler.scheduled_job("cron", hour=3)
         >>> async def archive_job():
         >>>     await water_db.run_archiver_task()
+
+        5. 登记表结构后分片按需建表（每个分片只建一次）；登记时与月末定时任务中预建下个月分片
+        >>> await water_db.init(WaterMessageBase)
+        >>> await provision_upcoming_shards()
+
+        6. 只读会话不会改动数据目录：不唤醒冷库、不建表；分片不存在或冷库解压失败时在内存空库上查询
     """  # noqa: E501
 
     prefix: str
     fmt: str = "%Y_%m"
     active_window_months: int = 2
+    cold_profile: SqliteProfile = field(default=COLD_SHARD_PROFILE, kw_only=True)
+    time_column: str = field(default="created_at", kw_only=True)
+    catalog_columns: tuple[str, ...] = field(
+        default=("user_id", "group_id"),
+        kw_only=True,
+    )
+    provision_lead_seconds: int = field(default=PROVISION_LEAD_SECONDS, kw_only=True)
+    codec: ArchiveCodec = field(default_factory=default_codec, kw_only=True)
+    archive_format: ArchiveFormat = field(
+        default=ArchiveFormat.COMPRESSED,
+        kw_only=True,
+    )
+    archive_profile: SqliteProfile = field(default=ARCHIVE_PROFILE, kw_only=True)
     _locks: dict[str, asyncio.Lock] = field(default_factory=dict)
+    _catalog: ShardCatalog | None = field(default=None, init=False, repr=False)
+    _schema: type[DeclarativeBase] | None = field(default=None, init=False, repr=False)
+    _initialized: set[str] = field(default_factory=set, init=False, repr=False)
+    registry: ClassVar[list[ShardedDB]] = []
+
+    def __post_init__(self) -> None:
+        ShardedDB.registry.append(self)
 
-    def _get_shard_key(self, dt: datetime) -> str:
-        return dt.strftime(self.fmt)
+    @property
+    def catalog(self) -> ShardCatalog:
+        if self._catalog is None:
+            self._catalog = ShardCatalog(self.base_dir / f"{self.prefix}.catalog.json")
+        return self._catalog
+
+    def _get_shard_key(self, time_ctx: datetime | int) -> str:
+        return local_calendar.shard_key(local_calendar.to_timestamp(time_ctx), self.fmt)
+
+    def _active_keys(self) -> list[str]:
+        """热数据窗口内的分片键，从当月开始倒序"""
+        keys: list[str] = []
+        cursor = local_calendar.month_start(get_current_time())
+        for _ in range(max(1, self.active_window_months)):
+            keys.append(self._get_shard_key(cursor))
+            cursor = local_calendar.month_start(cursor - 1)
+        return keys
+
+    def _is_active(self, shard_key: str) -> bool:
+        """分片是否处于热窗口内（含预建的未来分片），热分片常驻连接，不参与空闲释放"""
+        return shard_key >= self._active_keys()[-1]
+
+    def _profile_for(self, shard_key: str) -> SqliteProfile:
+        """热窗口内使用 `profile`，更早的分片使用 `cold_profile`"""
+        return self.profile if self._is_active(shard_key) else self.cold_profile
 
     def _get_file_paths(self, shard_key: str) -> tuple[Path, Path]:
         base = self.base_dir / f"{self.prefix}_{shard_key}"
-        return base.with_suffix(".db"), base.with_suffix(".7z")
+        suffix = (
+            COMPACT_SUFFIX
+            if self.archive_format is ArchiveFormat.COMPACT
+            else self.codec.suffix
+        )
+        return base.with_suffix(".db"), base.with_suffix(suffix)
+
+    def _archive_candidates(self, shard_key: str) -> list[Path]:
+        """分片可能存在的全部归档文件，当前格式排在最前"""
+        _, archive_path = self._get_file_paths(shard_key)
+        suffixes = dict.fromkeys((archive_path.suffix, COMPACT_SUFFIX, *ARCHIVE_CODECS))
+        return [archive_path.with_suffix(suffix) for suffix in suffixes]
+
+    def _find_archive(self, shard_key: str) -> Path | None:
+        """分片的现有归档：优先当前格式，其次按后缀兼容其他格式"""
+        return next(
+            (path for path in self._archive_candidates(shard_key) if path.exists()),
+            None,
+        )
+
+    def _read_profile(self, shard_key: str, path: Path) -> SqliteProfile:
+        if path.suffix == COMPACT_SUFFIX:
+            return self.archive_profile
+        return self._profile_for(shard_key)
 
     def _get_lock(self, shard_key: str) -> asyncio.Lock:
         if shard_key not in self._locks:
@@ -170,127 +278,571 @@ class ShardedDB(BaseDB):
             raise PermissionError("Access Denied: Path traversal attempt detected.")
         return resolved_target
 
+    async def _extract(self, archive_path: Path, target: Path) -> bool:
+        """在工作线程中把归档还原为 `target`（解压或解冻紧凑库），返回是否成功"""
+        restore = thaw if archive_path.suffix == COMPACT_SUFFIX else unpack
+        try:
+            await asyncio.to_thread(restore, archive_path, target)
+        except Exception as e:
+            logger.error(f"解压失败 [{archive_path.name}]: {e}")
+            return False
+        return True
+
+    def _scratch_path(self, shard_key: str) -> Path:
+        db_path, _ = self._get_file_paths(shard_key)
+        return scratch_cache.directory(self.namespace) / db_path.name
+
     async def _ensure_shard_online(self, shard_key: str) -> None:
-        db_path, zip_path = self._get_file_paths(shard_key)
-        if db_path.exists() or not zip_path.exists():
+        """把冷库解压回数据目录，用于写入；之后由归档任务重新压缩"""
+        db_path, _ = self._get_file_paths(shard_key)
+        if db_path.exists() or (archive_path := self._find_archive(shard_key)) is None:
             return
 
         async with self._get_lock(shard_key):
             if db_path.exists():
                 return
 
-            safe_zip = self._safe_resolve(zip_path)
-            safe_out = self._safe_resolve(self.base_dir)
+            safe_archive = self._safe_resolve(archive_path)
+            safe_db = self._safe_resolve(db_path)
 
-            logger.info(f"唤醒冷库: 正在静默解压 {safe_zip.name}")
+            logger.info(f"唤醒冷库: 正在静默解压 {safe_archive.name}")
+            if await self._extract(safe_archive, safe_db):
+                self.catalog.mark_archived(shard_key, archived=False)
+                await scratch_cache.discard(self._scratch_path(shard_key))
+                logger.success(f"冷库解压完成: {db_path.name}")
 
-            process = await asyncio.create_subprocess_exec(
-                "7z",
-                "x",
-                str(safe_zip),
-                f"-o{safe_out}",
-                "-aos",
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
+    async def _ensure_shard_readable(self, shard_key: str) -> tuple[Path, bool]:
+        """返回只读查询应打开的文件及其是否以不可变方式打开
 
-            try:
-                await asyncio.wait_for(process.communicate(), timeout=45.0)
-            except TimeoutError:
-                process.kill()
-                logger.error(f"解压超时被强杀: {safe_zip.name}")
-                raise
+        数据目录中有该分片时直接使用；紧凑只读库原地打开；压缩归档解压到临时解压区，
+        归档文件保持不变。
+        """
+        db_path, _ = self._get_file_paths(shard_key)
+        if db_path.exists() or (archive_path := self._find_archive(shard_key)) is None:
+            return db_path, False
+        if archive_path.suffix == COMPACT_SUFFIX:
+            return archive_path, True
 
-            if process.returncode == 0:
-                logger.success(f"冷库解压完成: {db_path.name}")
-            else:
-                logger.error(f"解压失败, Exit Code: {process.returncode}")
+        scratch_path = self._scratch_path(shard_key)
+        if scratch_cache.get(scratch_path):
+            return scratch_path, True
+
+        async with self._get_lock(shard_key):
+            if db_path.exists():
+                return db_path, False
+            if scratch_cache.get(scratch_path):
+                return scratch_path, True
+
+            safe_archive = self._safe_resolve(archive_path)
+            logger.info(f"读取冷库: 正在解压 {safe_archive.name} 至临时区")
+            if not await self._extract(safe_archive, scratch_path):
+                return db_path, False
+
+            await scratch_cache.add(scratch_path)
+            return scratch_path, True
+
+    async def _ensure_schema(self, shard_key: str) -> None:
+        """分片首次使用时建表，每个进程内每个分片只执行一次"""
+        if self._schema is None or shard_key in self._initialized:
+            return
+
+        async with self._get_lock(shard_key):
+            if shard_key in self._initialized:
+                return
+            db_path, _ = self._get_file_paths(shard_key)
+            async with db_manager.open(
+                str(db_path),
+                commit=True,
+                profile=self._profile_for(shard_key),
+                resident=self._is_active(shard_key),
+            ) as sess:
+                conn = await sess.connection()
+                await conn.run_sync(self._schema.metadata.create_all)
+            self._initialized.add(shard_key)
+
+    async def init(self, base: type[DeclarativeBase]) -> None:
+        """登记表结构并初始化当前分片，临近月末时一并预建下个月分片；其余分片在首次使用时自动建表"""
+        self._schema = base
+        self._initialized.clear()
+        await self._ensure_schema(self._get_shard_key(get_current_time()))
+        await self.provision_upcoming()
+
+    async def provision(self, time_ctx: datetime | int) -> bool:
+        """预建 `time_ctx` 所在分片：建库、建表并预热读写连接，返回是否新完成了建表"""
+        shard_key = self._get_shard_key(time_ctx)
+        if shard_key in self._initialized:
+            return False
+        await self._ensure_schema(shard_key)
+        db_path, _ = self._get_file_paths(shard_key)
+        async with db_manager.open(
+            str(db_path),
+            commit=False,
+            profile=self._profile_for(shard_key),
+            resident=self._is_active(shard_key),
+        ) as sess:
+            await sess.execute(text("SELECT 1"))
+        logger.info(f"分片预建完成: {self.prefix}_{shard_key}")
+        return True
+
+    async def provision_upcoming(self) -> bool:
+        """距下个月不足 `provision_lead_seconds` 时预建下个月的分片"""
+        now = get_current_time()
+        next_month = local_calendar.next_month_start(now)
+        if next_month - now > self.provision_lead_seconds:
+            return False
+        return await self.provision(next_month)
 
     @asynccontextmanager
     async def session(
         self,
         commit: bool = True,
-        time_ctx: datetime | None = None,
+        time_ctx: datetime | int | None = None,
     ) -> AsyncGenerator[AsyncSession, None]:
         if time_ctx is None:
-            time_ctx = arrow.get(get_current_time()).datetime
+            time_ctx = get_current_time()
 
         shard_key = self._get_shard_key(time_ctx)
+        if not commit:
+            # 只读会话不改动数据目录：不唤醒冷库、不建表
+            path, immutable = await self._ensure_shard_readable(shard_key)
+            if not path.exists():
+                if self._find_archive(shard_key) is not None:
+                    logger.warning(
+                        f"冷库不可读，按空分片查询: {self.prefix}_{shard_key}"
+                    )
+                async with self._empty_session() as sess:
+                    yield sess
+                return
+            async with db_manager.open(
+                str(path),
+                commit=False,
+                profile=self._read_profile(shard_key, path),
+                immutable=immutable,
+                resident=not immutable and self._is_active(shard_key),
+            ) as sess:
+                yield sess
+            return
+
         await self._ensure_shard_online(shard_key)
+        await self._ensure_schema(shard_key)
 
         db_path, _ = self._get_file_paths(shard_key)
-        async with db_manager.open(str(db_path), commit) as sess:
+        # 写前标脏保证崩溃后不漏掉已提交的行；提交后再标一次，
+        # 覆盖写会话期间并发扫描写回的干净目录项
+        self.catalog.mark_dirty(shard_key)
+        async with db_manager.open(
+            str(db_path),
+            commit=True,
+            profile=self._profile_for(shard_key),
+            resident=self._is_active(shard_key),
+        ) as sess:
             yield sess
+        self.catalog.mark_dirty(shard_key)
+
+    @asynccontextmanager
+    async def _empty_session(self) -> AsyncGenerator[AsyncSession, None]:
+        """不存在的分片：在按表结构建好的内存空库上只读查询，查询结果恒为空"""
+        engine = create_async_engine("sqlite+aiosqlite://")
+        try:
+            async with engine.begin() as conn:
+                if self._schema is not None:
+                    await conn.run_sync(self._schema.metadata.create_all)
+                await conn.execute(text("PRAGMA query_only=ON"))
+            async with AsyncSession(engine) as sess:
+                yield sess
+        finally:
+            await engine.dispose()
+
+    def _shard_keys(
+        self, start_time: datetime | int, end_time: datetime | int
+    ) -> list[str]:
+        months = local_calendar.month_starts(
+            local_calendar.to_timestamp(start_time),
+            local_calendar.to_timestamp(end_time),
+        )
+        return list(dict.fromkeys(self._get_shard_key(m) for m in months))
+
+    async def _query_shard[T](
+        self,
+        shard_key: str,
+        query_func: Callable[[AsyncSession], Awaitable[T]],
+        semaphore: asyncio.Semaphore,
+    ) -> tuple[str, T] | None:
+        async with semaphore:
+            path, immutable = await self._ensure_shard_readable(shard_key)
+            if not path.exists():
+                return None
+            async with db_manager.open(
+                str(path),
+                commit=False,
+                profile=self._read_profile(shard_key, path),
+                immutable=immutable,
+                resident=not immutable and self._is_active(shard_key),
+            ) as sess:
+                return shard_key, await query_func(sess)
+
+    def _candidate_keys(
+        self,
+        start_time: datetime | int,
+        end_time: datetime | int,
+        probe: Mapping[str, str] | None,
+    ) -> list[str]:
+        """按目录剪枝：跳过时间范围不相交、空分片与布隆过滤器判定不含目标的分片"""
+        start_ts = local_calendar.to_timestamp(start_time)
+        end_ts = local_calendar.to_timestamp(end_time)
+        catalog = self.catalog
+        return [
+            key
+            for key in self._shard_keys(start_ts, end_ts)
+            if catalog.may_contain(key, start_ts, end_ts, probe)
+        ]
+
+    async def _iter_shards[T](
+        self,
+        shard_keys: list[str],
+        query_func: Callable[[AsyncSession], Awaitable[T]],
+        max_concurrency: int,
+    ) -> AsyncGenerator[tuple[str, T], None]:
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        tasks = [
+            asyncio.create_task(self._query_shard(key, query_func, semaphore))
+            for key in shard_keys
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                if (item := await next_done) is not None:
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def map_fold[T, A](
+        self,
+        start_time: datetime | int,
+        end_time: datetime | int,
+        query_func: Callable[[AsyncSession], Awaitable[T]],
+        reducer: Callable[[A, T], A],
+        initial: A,
+        max_concurrency: int = SHARD_QUERY_CONCURRENCY,
+        probe: Mapping[str, str] | None = None,
+    ) -> A:
+        """并发查询时间范围内的全部分片，并按完成顺序把结果逐个折叠进累加器
+
+        Args:
+            start_time: 起始时间（含）。
+            end_time: 结束时间（含）。
+            query_func: 在单个分片只读会话上执行的查询。
+            reducer: `(acc, shard_result) -> acc`，在事件循环中串行调用，无需加锁。
+            initial: 累加器初始值。
+            max_concurrency: 同时在查（含冷库解压）的分片数上限。
+            probe: `{列名: 取值}`，目录判定不含该取值的分片将被跳过（不会被唤醒）。
+
+        注意事项:
+            1. 折叠顺序为分片完成顺序，`reducer` 需满足交换律；需要按时间顺序的结果请用 `map_reduce`。
+            2. 单个分片的结果折叠后即可释放，内存占用与时间跨度无关。
+            3. 任一分片失败会取消其余分片并向上抛出。
+            4. 传入 `probe` 时，`query_func` 必须同样按这些列过滤，否则剪枝会丢数据。
+        """  # noqa: E501
+        acc = initial
+        async for _, result in self._iter_shards(
+            self._candidate_keys(start_time, end_time, probe),
+            query_func,
+            max_concurrency,
+        ):
+            acc = reducer(acc, result)
+        return acc
 
     async def map_reduce[T](
         self,
-        start_time: datetime,
-        end_time: datetime,
+        start_time: datetime | int,
+        end_time: datetime | int,
         query_func: Callable[[AsyncSession], Awaitable[T]],
+        max_concurrency: int = SHARD_QUERY_CONCURRENCY,
+        probe: Mapping[str, str] | None = None,
     ) -> list[T]:
-        curr = arrow.get(start_time).floor("month")
-        end = arrow.get(end_time).floor("month")
-        months_span = (
-            (end_time.year - start_time.year) * 12 + end_time.month - start_time.month
-        )
-        if months_span > 6:
-            raise ValueError("目标超出 6 个月的最大范围")
-        keys = []
-        while curr <= end:
-            keys.append(curr.strftime(self.fmt))
-            curr = curr.shift(months=1)
+        """并发查询时间范围内的全部分片，按分片时间顺序返回各分片结果
 
-        shard_keys = list(dict.fromkeys(keys))
+        剪枝规则与 `probe` 的约束同 `map_fold`。
+        """
+        shard_keys = self._candidate_keys(start_time, end_time, probe)
+        results: dict[str, T] = {}
+        async for key, result in self._iter_shards(
+            shard_keys, query_func, max_concurrency
+        ):
+            results[key] = result
+        return [results[key] for key in shard_keys if key in results]
 
-        results: list[T] = []
-        for key in shard_keys:
-            await self._ensure_shard_online(key)
-            db_path, _ = self._get_file_paths(key)
-            if db_path.exists():
-                async with db_manager.open(str(db_path), commit=False) as sess:
-                    results.append(await query_func(sess))
-        return results
+    @asynccontextmanager
+    async def attached_session(
+        self,
+        start_time: datetime | int,
+        end_time: datetime | int,
+        tables: Iterable[str] | None = None,
+        probe: Mapping[str, str] | None = None,
+    ) -> AsyncGenerator[AsyncSession, None]:
+        """把时间范围内的分片附加到同一只读连接，每张表以同名 UNION ALL 临时视图暴露
 
-    async def run_archiver_task(self) -> None:
-        now = arrow.get(get_current_time())
-        active_keys = [now.strftime(self.fmt), now.shift(months=-1).strftime(self.fmt)]
+        Args:
+            start_time: 起始时间（含）。
+            end_time: 结束时间（含）。
+            tables: 需要合并的表名，默认为各分片中出现过的全部表。
+            probe: 同 `map_fold`，目录判定不含该取值的分片不会被附加。
+
+        Raises:
+            ValueError: 需要附加的分片数超过 `MAX_ATTACHED`，请缩小时间范围或改用 `map_fold`。
+
+        注意事项:
+            1. 视图只含各分片共有的列；某张表只存在于部分分片时，只合并这些分片。
+            2. 冷库按 `session(commit=False)` 的规则就地打开或解压到临时区，不会被唤醒。
+            3. SQLite 会把 WHERE 条件下推到 UNION ALL 的每个分支，各分片仍可走自身索引。
+        """  # noqa: E501
+        shard_keys = self._candidate_keys(start_time, end_time, probe)
+        if len(shard_keys) > MAX_ATTACHED:
+            raise ValueError(
+                f"跨分片附加查询最多 {MAX_ATTACHED} 个分片，"
+                f"当前范围涉及 {len(shard_keys)} 个: {self.prefix}"
+            )
 
-        for db_file in self.base_dir.glob(f"{self.prefix}_*.db"):
-            file_key = db_file.stem.replace(f"{self.prefix}_", "")
+        files: dict[str, tuple[str, bool]] = {}
+        for key in shard_keys:
+            path, immutable = await self._ensure_shard_readable(key)
+            if _exists(path):
+                files[f"shard_{key}"] = (str(path), immutable)
 
-            if file_key in active_keys:
-                continue
+        async with db_manager.open_attached(files, self.cold_profile) as sess:
+            await _create_union_views(
+                sess, list(files), set(tables) if tables is not None else None
+            )
+            yield sess
 
-            zip_path = db_file.with_suffix(".7z")
-            async with self._get_lock(file_key):
-                safe_db = self._safe_resolve(db_file)
-                safe_zip = self._safe_resolve(zip_path)
-
-                logger.info(f"归档冷库: {safe_db.name} -> {safe_zip.name}")
-
-                process = await asyncio.create_subprocess_exec(
-                    "7z",
-                    "a",
-                    "-t7z",
-                    "-m0=lzma2",
-                    str(safe_zip),
-                    str(safe_db),
-                    stdout=asyncio.subprocess.DEVNULL,
-                    stderr=asyncio.subprocess.PIPE,
+    async def _scan_shard(self, shard_key: str) -> ShardEntry:
+        db_path, _ = self._get_file_paths(shard_key)
+        entry = ShardEntry(shard_key, dirty=False)
+        bounds: list[int] = []
+        tokens: list[str] = []
+        columns: set[str] = set()
+        async with db_manager.open(
+            str(db_path),
+            commit=False,
+            profile=self._profile_for(shard_key),
+            resident=self._is_active(shard_key),
+        ) as sess:
+            tables = (
+                await sess.execute(
+                    text(
+                        "SELECT name FROM sqlite_master "
+                        "WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+                    )
                 )
+            ).scalars()
+            for table in list(tables):
+                info = await sess.execute(text(f'PRAGMA table_info("{table}")'))
+                table_columns = {row[1] for row in info}
+                if self.time_column in table_columns:
+                    low, high, count = (
+                        await sess.execute(
+                            text(
+                                f'SELECT MIN("{self.time_column}"), '
+                                f'MAX("{self.time_column}"), COUNT(*) FROM "{table}"'
+                            )
+                        )
+                    ).one()
+                    entry.rows += count
+                    bounds.extend(v for v in (low, high) if v is not None)
+                for column in self.catalog_columns:
+                    if column not in table_columns:
+                        continue
+                    columns.add(column)
+                    values = await sess.execute(
+                        text(
+                            f'SELECT DISTINCT "{column}" FROM "{table}" '
+                            f'WHERE "{column}" IS NOT NULL'
+                        )
+                    )
+                    tokens.extend(bloom_token(column, str(v)) for v in values.scalars())
+
+        if bounds:
+            entry.min_ts, entry.max_ts = min(bounds), max(bounds)
+        entry.columns = tuple(sorted(columns))
+        entry.bloom = BloomFilter.for_capacity(len(tokens))
+        for token in tokens:
+            entry.bloom.add(token)
+        return entry
+
+    async def refresh_catalog(self, shard_keys: Iterable[str] | None = None) -> int:
+        """重新扫描脏目录项（默认为全部在线的非活跃分片），返回刷新的分片数"""
+        active_keys = set(self._active_keys())
+        if shard_keys is None:
+            shard_keys = [
+                path.stem.removeprefix(f"{self.prefix}_")
+                for path in self._online_files()
+            ]
+        refreshed = 0
+        for key in shard_keys:
+            entry = self.catalog.get(key)
+            if key in active_keys or (entry is not None and not entry.dirty):
+                continue
+            db_path, _ = self._get_file_paths(key)
+            if not db_path.exists():
+                continue
+            try:
+                fresh = await self._scan_shard(key)
+            except Exception as e:
+                logger.warning(f"分片目录扫描失败 [{self.prefix}_{key}]: {e}")
+                continue
+            fresh.archived = entry.archived if entry is not None else False
+            self.catalog.put(fresh)
+            refreshed += 1
+        return refreshed
+
+    def _online_files(self) -> list[Path]:
+        return sorted(self.base_dir.glob(f"{self.prefix}_*.db"))
+
+    async def run_archiver_task(
+        self,
+        max_concurrency: int = ARCHIVE_CPU_BUDGET,
+    ) -> int:
+        """按 `archive_format` 归档热窗口之外仍在线的分片，返回归档成功的分片数
 
-                _, stderr = await process.communicate()
+        Args:
+            max_concurrency: 同时归档的分片数上限（CPU 预算），默认占用一半 CPU。
+        """
+        active_keys = set(self._active_keys())
+        await self.refresh_catalog()
+
+        shard_keys = [
+            key
+            for db_file in self._online_files()
+            if (key := db_file.stem.removeprefix(f"{self.prefix}_")) not in active_keys
+        ]
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        results = await asyncio.gather(
+            *(self._archive_shard(key, semaphore) for key in shard_keys)
+        )
+        return sum(results)
 
-                try:
-                    assert process.returncode == 0
-                    await db_manager.dispose(str(safe_db))
-                    os.remove(safe_db)
-                    logger.success(f"归档完成，已释放原始磁盘占用: {safe_db.name}")
-                except AssertionError:
-                    logger.error(
-                        f"归档压缩失败: {stderr.decode('utf-8', errors='ignore')}"
+    async def _archive_shard(
+        self, shard_key: str, semaphore: asyncio.Semaphore
+    ) -> bool:
+        """快照并压缩（或转写紧凑库）→ 校验源文件未变 → 删除源文件
+
+        归档期间若分片被重新打开或写入，则保留源文件，留待下次归档。
+        """
+        async with semaphore, self._get_lock(shard_key):
+            db_path, archive_path = self._get_file_paths(shard_key)
+            safe_db = self._safe_resolve(db_path)
+            safe_archive = self._safe_resolve(archive_path)
+            if not _exists(safe_db):
+                return False
+
+            logger.info(f"归档冷库: {safe_db.name} -> {safe_archive.name}")
+            # 会话以未解析的 db_path 为键打开引擎，释放与判空也须用同一个键
+            await db_manager.dispose(str(db_path))
+            self._initialized.discard(shard_key)
+            # 旧的紧凑库可能仍被只读引擎以 immutable 打开，覆盖前先释放
+            await db_manager.dispose(str(archive_path))
+            before = _file_state(safe_db)
+            try:
+                if self.archive_format is ArchiveFormat.COMPACT:
+                    raw, packed = await asyncio.to_thread(
+                        compact, safe_db, safe_archive, self.time_column
                     )
-                except PermissionError:
-                    logger.warning(
-                        f"归档文件被占用，保留源文件，明日重试: {safe_db.name}"
+                else:
+                    raw, packed = await asyncio.to_thread(
+                        pack, self.codec, safe_db, safe_archive
                     )
+            except Exception as e:
+                logger.error(f"归档压缩失败 [{safe_db.name}]: {e}")
+                return False
+
+            if not db_manager.is_idle(str(db_path)) or _file_state(safe_db) != before:
+                logger.warning(
+                    f"归档期间分片被写入，保留源文件，下次重试: {safe_db.name}"
+                )
+                return False
+            try:
+                _remove_db_files(safe_db)
+            except PermissionError:
+                logger.warning(f"归档文件被占用，保留源文件，明日重试: {safe_db.name}")
+                return False
+
+            for stale in self._archive_candidates(shard_key)[1:]:
+                await db_manager.dispose(str(stale))
+                stale.unlink(missing_ok=True)
+            self.catalog.mark_archived(shard_key, archived=True)
+            await scratch_cache.discard(self._scratch_path(shard_key))
+            logger.success(
+                f"归档完成，已释放原始磁盘占用: {safe_db.name} "
+                f"({raw / 1024:.0f}KiB -> {safe_archive.name} {packed / 1024:.0f}KiB)"
+            )
+            return True
+
+
+async def provision_upcoming_shards() -> list[str]:
+    """为所有已登记表结构的 `ShardedDB` 预建下个月的分片，返回新预建的实例前缀"""
+    provisioned: list[str] = []
+    for db in ShardedDB.registry:
+        if db._schema is None:
+            continue
+        try:
+            if await db.provision_upcoming():
+                provisioned.append(db.prefix)
+        except Exception as e:
+            logger.error(f"分片预建失败 [{db.namespace}/{db.prefix}]: {e}")
+    return provisioned
+
+
+async def _create_union_views(
+    session: AsyncSession,
+    aliases: list[str],
+    tables: set[str] | None,
+) -> None:
+    columns: dict[str, dict[str, list[str]]] = {}
+    for alias in aliases:
+        schema = quote_identifier(alias)
+        names = (
+            await session.execute(
+                text(
+                    f"SELECT name FROM {schema}.sqlite_master "
+                    "WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+                    "AND name != :ddl_table"
+                ),
+                {"ddl_table": COMPACT_DDL_TABLE},
+            )
+        ).scalars()
+        for name in list(names):
+            if tables is not None and name not in tables:
+                continue
+            info = await session.execute(
+                text(f"PRAGMA {schema}.table_info({quote_identifier(name)})")
+            )
+            columns.setdefault(name, {})[alias] = [row[1] for row in info]
+
+    for name, by_alias in columns.items():
+        first, *others = by_alias.values()
+        shared = [c for c in first if all(c in other for other in others)]
+        table = quote_identifier(name)
+        column_sql = ", ".join(quote_identifier(c) for c in shared)
+        union_sql = " UNION ALL ".join(
+            f"SELECT {column_sql} FROM {quote_identifier(alias)}.{table}"
+            for alias in by_alias
+        )
+        await session.execute(text(f"CREATE TEMP VIEW {table} AS {union_sql}"))
+
+
+def _exists(path: Path) -> bool:
+    return path.exists()
+
+
+def _file_state(db_path: Path) -> tuple[int, int, int]:
+    """源文件的 (大小, 修改时间, WAL 大小)，用于判断压缩期间是否被写入"""
+    stat = db_path.stat()
+    wal = db_path.with_name(db_path.name + "-wal")
+    return stat.st_size, stat.st_mtime_ns, wal.stat().st_size if wal.exists() else 0
+
+
+def _remove_db_files(db_path: Path) -> None:
+    os.remove(db_path)
+    for suffix in ("-wal", "-shm"):
+        db_path.with_name(db_path.name + suffix).unlink(missing_ok=True)
@@ -0,0 +1,250 @@
+"""
+Author: SakuraiCora<1479559098@qq.com>
+Date: 2026-03-02 21:04:37
+LastEditors: SakuraiCora<1479559098@qq.com>
+LastEditTime: 2026-03-09 11:03:18
+Description: 缓冲写入预写日志
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+import json
+import mmap
+from pathlib import Path
+import struct
+from typing import Any
+import zlib
+
+from loguru import logger
+
+_MAGIC = b"SWJ1"
+_HEADER = struct.Struct("<4sI")
+_RECORD = struct.Struct("<II")
+_CHECKPOINT = struct.Struct("<BI")
+_CHECKPOINT_TAG = 0
+_SEGMENTS = ("a", "b")
+
+
+def _seed(generation: int) -> int:
+    return zlib.crc32(generation.to_bytes(4, "little"))
+
+
+class WriteJournal:
+    """基于 mmap 的仅追加预写日志，为 `BatchWriter` 的内存缓冲兜底
+
+    文件布局：两个交替使用的段文件 `<name>.a.wal` / `<name>.b.wal`。
+    段头为 `magic(4) + generation(u32)`，其后为若干
+    `length(u32) + crc32(u32) + payload` 记录，以 length 为 0 结尾。
+    payload 为 JSON 数据项，或以 0 字节开头的检查点（其后为 u32 偏移），
+    回放时丢弃检查点偏移之前的记录。
+
+    Args:
+        directory: 日志目录。
+        name: 日志名称，通常与写入器同名。
+        initial_size: 段文件初始大小（字节），写满后按两倍扩容。
+
+    注意事项:
+        1. 记录 CRC 混入段代数，旧代残留的记录在回放时会被视为无效，无需清零文件。
+        2. 落盘后的截断走原地路径：无存活数据时 `truncate` 重写结尾标记与段头，
+           否则 `checkpoint` 追加一条检查点，均不重新序列化数据。
+        3. 仅当已失效的前缀足够大时才由 `reset` 把存活数据写入另一段，最后才写
+           段头切换代数；任一时刻崩溃，回放都能拿到完整的旧段或新段。
+        4. 写入只落到页缓存，可抵御进程崩溃；掉电场景需调用 `sync`。
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        initial_size: int = 1 << 20,
+    ) -> None:
+        self.directory = directory
+        self.name = name
+        self.initial_size = max(initial_size, _HEADER.size + _RECORD.size)
+
+        self._paths = [directory / f"{name}.{seg}.wal" for seg in _SEGMENTS]
+        self._active = 0
+        self._generation = 0
+        self._offset = _HEADER.size
+        self._file: Any = None
+        self._mm: mmap.mmap | None = None
+
+    @property
+    def opened(self) -> bool:
+        return self._mm is not None
+
+    @property
+    def used(self) -> int:
+        """当前段已写入的字节数（含段头）"""
+        return self._offset
+
+    def open(self) -> list[Any]:
+        """打开日志并返回上次进程遗留的全部记录（按写入顺序）"""
+        if self._mm is not None:
+            return []
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        best: tuple[int, int, list[Any], int] | None = None
+        for index, path in enumerate(self._paths):
+            scanned = self._scan(path)
+            if scanned is not None and (best is None or scanned[0] > best[0]):
+                best = (scanned[0], index, scanned[1], scanned[2])
+
+        if best is None:
+            self._active, self._generation = 0, 1
+            self._map(self._paths[0], self.initial_size)
+            self._write_terminator(_HEADER.size)
+            self._write_header()
+            self._offset = _HEADER.size
+            return []
+
+        self._generation, self._active, records, self._offset = best
+        self._map(self._paths[self._active], self.initial_size)
+        if records:
+            logger.warning(f"WriteJournal [{self.name}] 回放遗留记录 {len(records)} 条")
+        return records
+
+    def append(self, item: Any) -> int:
+        """追加一条记录并返回其偏移，数据项必须可被 `json` 序列化"""
+        payload = json.dumps(item, ensure_ascii=False, separators=(",", ":")).encode()
+        return self._write_record(payload)
+
+    def append_all(self, items: Iterable[Any]) -> list[int]:
+        return [self.append(item) for item in items]
+
+    def truncate(self) -> None:
+        """原地清空当前段：先写结尾标记、再递增代数，旧记录因校验失效"""
+        if self._mm is None:
+            return
+
+        self._generation += 1
+        self._offset = _HEADER.size
+        self._write_terminator(self._offset)
+        self._write_header()
+
+    def checkpoint(self, offset: int) -> None:
+        """标记 `offset` 之前的记录均已落盘，回放时跳过"""
+        self._write_record(_CHECKPOINT.pack(_CHECKPOINT_TAG, offset))
+
+    def should_reset(self, offset: int) -> bool:
+        """失效前缀不小于存活部分与半个初始段时值得换段，换段开销按追加量摊还"""
+        dead = offset - _HEADER.size
+        return dead >= max(self._offset - offset, self.initial_size // 2)
+
+    def reset(self, live: Iterable[Any] = ()) -> list[int]:
+        """换段：仅保留 `live` 中的数据项，写入另一段后切换代数，返回新偏移"""
+        if self._mm is None:
+            return []
+
+        self._unmap()
+        self._active ^= 1
+        self._generation += 1
+        self._map(self._paths[self._active], self.initial_size)
+        self._offset = _HEADER.size
+        self._write_terminator(self._offset)
+        # 先写记录、后写段头：段头落盘前崩溃，回放仍会选中旧段
+        offsets = self.append_all(live)
+        self._write_header()
+        return offsets
+
+    def sync(self) -> None:
+        if self._mm is not None:
+            self._mm.flush()
+
+    def close(self) -> None:
+        self._unmap()
+
+    def _scan(self, path: Path) -> tuple[int, list[Any], int] | None:
+        if not path.exists() or path.stat().st_size < _HEADER.size:
+            return None
+
+        data = path.read_bytes()
+        magic, generation = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC or generation == 0:
+            return None
+
+        records: list[Any] = []
+        offsets: list[int] = []
+        first = 0
+        seed = _seed(generation)
+        offset = _HEADER.size
+        while offset + _RECORD.size <= len(data):
+            length, crc = _RECORD.unpack_from(data, offset)
+            start = offset + _RECORD.size
+            end = start + length
+            if length == 0 or end > len(data):
+                break
+            payload = data[start:end]
+            if zlib.crc32(payload, seed) != crc:
+                logger.warning(
+                    f"WriteJournal [{self.name}] 记录校验失败，截断于 {offset}"
+                )
+                break
+            if payload[0] == _CHECKPOINT_TAG:
+                _, live_from = _CHECKPOINT.unpack(payload)
+                while first < len(offsets) and offsets[first] < live_from:
+                    first += 1
+            else:
+                try:
+                    records.append(json.loads(payload))
+                except ValueError:
+                    break
+                offsets.append(offset)
+            offset = end
+        return generation, records[first:], offset
+
+    def _map(self, path: Path, size: int) -> None:
+        path.touch(exist_ok=True)
+        self._file = path.open("r+b")
+        if path.stat().st_size < size:
+            self._file.truncate(size)
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    def _unmap(self) -> None:
+        # munmap 不会丢弃共享映射的脏页，msync 只在 `sync` 中显式执行
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _grow(self, needed: int) -> None:
+        assert self._mm is not None
+        size = len(self._mm)
+        while size < needed:
+            size *= 2
+        self._unmap()
+        self._map(self._paths[self._active], size)
+
+    def _write_header(self) -> None:
+        assert self._mm is not None
+        _HEADER.pack_into(self._mm, 0, _MAGIC, self._generation)
+
+    def _write_terminator(self, offset: int) -> None:
+        assert self._mm is not None
+        if offset + _RECORD.size <= len(self._mm):
+            _RECORD.pack_into(self._mm, offset, 0, 0)
+
+    def _write_record(self, payload: bytes) -> int:
+        if self._mm is None:
+            return self._offset
+
+        end = self._offset + _RECORD.size + len(payload)
+        if end + _RECORD.size > len(self._mm):
+            self._grow(end + _RECORD.size)
+
+        mm = self._mm
+        assert mm is not None
+        # 先写结尾标记与负载，最后写记录头，保证半条记录不会被当作有效数据
+        _RECORD.pack_into(mm, end, 0, 0)
+        mm[self._offset + _RECORD.size : end] = payload
+        _RECORD.pack_into(
+            mm,
+            self._offset,
+            len(payload),
+            zlib.crc32(payload, _seed(self._generation)),
+        )
+        start, self._offset = self._offset, end
+        return start
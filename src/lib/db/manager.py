@@ -2,91 +2,580 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-01 00:40:09
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-02-26 17:27:25
+LastEditTime: 2026-03-10 14:30:18
 Description: db 管理器
 """
 
+from __future__ import annotations
+
 import asyncio
-from collections.abc import AsyncGenerator
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Callable, Mapping, Sequence
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+import os
+import time
 from typing import Any
 
 from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import NullPool
 
 from src.logger import logger
 
+from .profiler import sql_profiler
+from .profiles import DEFAULT_PROFILE, SqliteProfile
+
+WRITE_GROUP_MAX_JOBS = 64
+"""单个合并事务最多容纳的写入任务数"""
+READ_POOL_SIZE = 4
+"""每个数据库文件只读连接池的默认大小"""
+MAX_OPEN_FILES = 16
+"""同时保持连接的非常驻数据库文件数上限，超出后按 LRU 释放空闲文件"""
+IDLE_TTL_SECONDS = 15 * 60
+"""非常驻数据库文件空闲超过该时长后释放其连接"""
+MAX_ATTACHED = 10
+"""单个连接可附加的数据库数上限，即 SQLite 编译默认的 `SQLITE_MAX_ATTACHED`"""
+
+_active_writes: ContextVar[dict[WriteExecutor, AsyncSession]] = ContextVar(
+    "_active_writes",
+    default={},
+)
+
+
+@dataclass(slots=True)
+class WriteExecutorStats:
+    jobs: int = 0
+    failed_jobs: int = 0
+    transactions: int = 0
+    failed_transactions: int = 0
+
+
+@dataclass(slots=True)
+class EngineStats:
+    files: int = 0
+    """当前保持连接的数据库文件数"""
+    resident: int = 0
+    """其中常驻、不参与释放的文件数"""
+    engines: int = 0
+    """存活的引擎数（写引擎 + 只读引擎）"""
+    connections: int = 0
+    """已建立的 SQLite 连接数，约等于占用的数据库文件句柄数"""
+    mmap_bytes: int = 0
+    """按档位估算的 mmap 地址空间上限之和"""
+    evictions: int = 0
+    """累计因 LRU / 空闲超时释放的文件数"""
+
+
+@dataclass(slots=True)
+class _WriteTicket:
+    ready: asyncio.Future[AsyncSession]
+    done: asyncio.Future[BaseException | None]
+    committed: asyncio.Future[None]
+
+
+def _readonly_url(full_path: str, immutable: bool = False) -> str:
+    params = "mode=ro&immutable=1" if immutable else "mode=ro"
+    return f"sqlite+aiosqlite:///file:{os.path.abspath(full_path)}?{params}&uri=true"
+
+
+def _attach_uri(full_path: str, immutable: bool = False) -> str:
+    params = "mode=ro&immutable=1" if immutable else "mode=ro"
+    return f"file:{os.path.abspath(full_path)}?{params}"
+
+
+def _resolve[T](future: asyncio.Future[T], result: T) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+class WriteExecutor:
+    """单个 SQLite 文件的写入执行器
+
+    独占一条长连接，按到达顺序串行执行写入任务，并把排队中的相邻任务合并进同一个事务，
+    从源头上避免多个写者争抢 SQLite 写锁。
+
+    Args:
+        url: 数据库连接串。
+        factory: 绑定到单连接引擎的会话工厂。
+        max_group: 单个合并事务最多容纳的任务数。
+
+    注意事项:
+        1. 每个任务运行在独立的 SAVEPOINT 中，任务抛错只回滚自身，不影响同组其他任务。
+        2. 任务退出上下文后会等待整组提交完成，提交失败时同组任务都会收到异常。
+        3. 同一调用链内重复进入同一文件的写上下文会复用当前会话（嵌套 SAVEPOINT），不会死锁。
+        4. 任务内禁止手动 `commit` / `rollback`，事务边界由执行器负责。
+    """  # noqa: E501
+
+    def __init__(
+        self,
+        url: str,
+        factory: async_sessionmaker[AsyncSession],
+        max_group: int = WRITE_GROUP_MAX_JOBS,
+    ) -> None:
+        self.url = url
+        self.max_group = max_group
+        self.stats = WriteExecutorStats()
+        self._factory = factory
+        self._queue: asyncio.Queue[_WriteTicket] = asyncio.Queue()
+        self._task: asyncio.Task[None] | None = None
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncGenerator[AsyncSession, None]:
+        active = _active_writes.get()
+        if (session := active.get(self)) is not None:
+            async with session.begin_nested():
+                yield session
+            return
+
+        self._ensure_running()
+        loop = asyncio.get_running_loop()
+        ticket = _WriteTicket(
+            loop.create_future(),
+            loop.create_future(),
+            loop.create_future(),
+        )
+        self._queue.put_nowait(ticket)
+
+        try:
+            session = await ticket.ready
+        except asyncio.CancelledError as e:
+            _resolve(ticket.done, e)
+            raise
+
+        token = _active_writes.set({**active, self: session})
+        try:
+            yield session
+        except BaseException as e:
+            _resolve(ticket.done, e)
+            raise
+        finally:
+            _active_writes.reset(token)
+            _resolve(ticket.done, None)
+        await ticket.committed
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            ticket = await queue.get()
+            try:
+                await self._run_group(ticket, queue)
+            except Exception as e:
+                logger.error(f"写入执行器异常 [{self.url}]: {e}")
+
+    async def _run_group(
+        self,
+        first: _WriteTicket,
+        queue: asyncio.Queue[_WriteTicket],
+    ) -> None:
+        accepted: list[_WriteTicket] = []
+        ticket: _WriteTicket | None = first
+        try:
+            async with self._factory() as session, session.begin():
+                while ticket is not None:
+                    if not ticket.ready.done():
+                        nested = await session.begin_nested()
+                        ticket.ready.set_result(session)
+                        if await ticket.done is None:
+                            await nested.commit()
+                            accepted.append(ticket)
+                        else:
+                            await nested.rollback()
+                            self.stats.failed_jobs += 1
+                    queue.task_done()
+                    ticket = (
+                        queue.get_nowait()
+                        if len(accepted) < self.max_group and not queue.empty()
+                        else None
+                    )
+        except Exception as e:
+            if ticket is not None:
+                if not ticket.ready.done():
+                    ticket.ready.set_exception(e)
+                elif not ticket.committed.done():
+                    ticket.committed.set_exception(e)
+                queue.task_done()
+            self.stats.failed_transactions += 1
+            for item in accepted:
+                if not item.committed.done():
+                    item.committed.set_exception(e)
+            raise
+        else:
+            self.stats.transactions += 1
+            self.stats.jobs += len(accepted)
+            for item in accepted:
+                _resolve(item.committed, None)
+
+    async def close(self) -> None:
+        """等待队列清空后停止执行器"""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.join()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
 
 class DatabaseManager:
-    def __init__(self) -> None:
+    """按文件管理 SQLite 连接：每个文件一个写入执行器 + 一个只读连接池
+
+    Args:
+        read_pool_size: 每个文件只读连接池的连接数。
+        instruments: 引擎创建后依次调用的挂载函数，默认挂载全局 SQL 剖析器。
+        max_files: 同时保持连接的非常驻文件数上限。
+        idle_ttl: 非常驻文件空闲多久（秒）后可被 `evict_idle` 释放。
+
+    注意事项:
+        1. `open(commit=True)` 走写入执行器，`open(commit=False)` 走只读连接池。
+        2. 只读连接以 `mode=ro` 打开并开启 `query_only`，在 WAL 下与写事务互不阻塞。
+        3. 调优档位在该文件首次建立连接时绑定，之后传入的档位在连接释放前不会生效。
+        4. 只释放没有未结束会话的文件；超过上限时若都在使用中，允许暂时超限。
+        5. 以 `resident=True` 打开的文件（主库、热窗口分片）常驻连接，不计入上限，
+           也不受空闲超时影响；常驻标记以该文件最近一次 `open` 为准。
+    """
+
+    def __init__(
+        self,
+        read_pool_size: int = READ_POOL_SIZE,
+        instruments: Sequence[Callable[[Engine], None]] | None = None,
+        max_files: int = MAX_OPEN_FILES,
+        idle_ttl: float = IDLE_TTL_SECONDS,
+    ) -> None:
+        self.read_pool_size = read_pool_size
+        self.max_files = max_files
+        self.idle_ttl = idle_ttl
+        self.instruments = (
+            list(instruments) if instruments is not None else [sql_profiler.attach]
+        )
         self._engines: dict[str, AsyncEngine] = {}
         self._session_factories: dict[str, async_sessionmaker] = {}
+        self._writers: dict[str, WriteExecutor] = {}
+        self._writer_engines: dict[str, AsyncEngine] = {}
+        self._profiles: dict[str, SqliteProfile] = {}
         self._lock = asyncio.Lock()
+        self._last_used: OrderedDict[str, float] = OrderedDict()
+        self._in_use: dict[str, int] = {}
+        self._resident: set[str] = set()
+        self._paths: dict[str, str] = {}
+        self._evictions = 0
 
-    def _init_sqlite_pragma(
-        self,
-        dbapi_connection: Any,
-        connection_record: Any,
-    ) -> None:
+    def _profile_of(self, url: str) -> SqliteProfile:
+        return self._profiles.get(url, DEFAULT_PROFILE)
+
+    def _apply_pragmas(self, dbapi_connection: Any, pragmas: list[str]) -> None:
         cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA journal_mode=WAL")
-        cursor.execute("PRAGMA synchronous=NORMAL")
-        cursor.execute(f"PRAGMA mmap_size={256 * 1024 * 1024}")
+        for pragma in pragmas:
+            cursor.execute(pragma)
         cursor.close()
 
-    async def _ensure_engine(self, url: str) -> None:
-        if url in self._session_factories:
-            return
+    def _writer_connect_listener(
+        self,
+        profile: SqliteProfile,
+    ) -> Callable[[Any, Any], None]:
+        def _on_connect(dbapi_connection: Any, connection_record: Any) -> None:
+            _ = connection_record
+            self._apply_pragmas(dbapi_connection, profile.writer_pragmas())
+            # 关闭驱动的隐式事务，由 begin 事件显式开启，SAVEPOINT 才能嵌套在同一事务内
+            dbapi_connection.isolation_level = None
+
+        return _on_connect
+
+    def _reader_connect_listener(
+        self,
+        profile: SqliteProfile,
+    ) -> Callable[[Any, Any], None]:
+        def _on_connect(dbapi_connection: Any, connection_record: Any) -> None:
+            _ = connection_record
+            self._apply_pragmas(dbapi_connection, profile.reader_pragmas())
+
+        return _on_connect
+
+    def _instrument(self, engine: AsyncEngine) -> None:
+        for attach in self.instruments:
+            attach(engine.sync_engine)
+
+    def _begin_immediate(self, conn: Any) -> None:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    async def _ensure_writer(self, url: str) -> WriteExecutor:
+        if (writer := self._writers.get(url)) is not None:
+            return writer
 
         async with self._lock:
-            if url in self._session_factories:
-                return
+            if (writer := self._writers.get(url)) is not None:
+                return writer
 
-            engine = create_async_engine(url, echo=True)  # TODO: 记得 echo 改为 False
-            event.listen(engine.sync_engine, "connect", self._init_sqlite_pragma)
+            engine = create_async_engine(
+                url,
+                pool_size=1,
+                max_overflow=0,
+            )
+            event.listen(
+                engine.sync_engine,
+                "connect",
+                self._writer_connect_listener(self._profile_of(url)),
+            )
+            event.listen(engine.sync_engine, "begin", self._begin_immediate)
+            self._instrument(engine)
 
+            # 由写连接负责建库并切换 WAL，只读连接随后才能以 mode=ro 打开
             async with engine.begin() as conn:
                 await conn.execute(text("SELECT 1"))
 
+            writer = WriteExecutor(
+                url,
+                async_sessionmaker(engine, expire_on_commit=False),
+            )
+            self._writer_engines[url] = engine
+            self._writers[url] = writer
+            logger.success(
+                f"数据库初始化成功: {url} (profile={self._profile_of(url).name})"
+            )
+            return writer
+
+    async def _ensure_reader(
+        self,
+        url: str,
+        full_path: str,
+        immutable: bool = False,
+    ) -> async_sessionmaker:
+        if (factory := self._session_factories.get(url)) is not None:
+            return factory
+
+        if not immutable:
+            await self._ensure_writer(url)
+        async with self._lock:
+            if (factory := self._session_factories.get(url)) is not None:
+                return factory
+
+            engine = create_async_engine(
+                _readonly_url(full_path, immutable),
+                pool_size=self.read_pool_size,
+                max_overflow=0,
+            )
+            event.listen(
+                engine.sync_engine,
+                "connect",
+                self._reader_connect_listener(self._profile_of(url)),
+            )
+            self._instrument(engine)
+
+            factory = async_sessionmaker(engine, expire_on_commit=False)
             self._engines[url] = engine
-            self._session_factories[url] = async_sessionmaker(
-                engine,
-                expire_on_commit=False,
+            self._session_factories[url] = factory
+            return factory
+
+    def _detach(
+        self,
+        url: str,
+    ) -> tuple[WriteExecutor | None, list[AsyncEngine]]:
+        """同步摘除文件的全部连接对象，之后的 `open` 会重新建立连接"""
+        self._last_used.pop(url, None)
+        self._resident.discard(url)
+        self._paths.pop(url, None)
+        self._profiles.pop(url, None)
+        self._session_factories.pop(url, None)
+        engines = [
+            engine
+            for engine in (
+                self._engines.pop(url, None),
+                self._writer_engines.pop(url, None),
             )
-            logger.success(f"数据库初始化成功: {url}")
+            if engine is not None
+        ]
+        return self._writers.pop(url, None), engines
+
+    async def _close(
+        self,
+        writer: WriteExecutor | None,
+        engines: list[AsyncEngine],
+    ) -> None:
+        if writer is not None:
+            await writer.close()
+        for engine in engines:
+            await engine.dispose()
 
     async def dispose(self, full_path: str) -> None:
         url = f"sqlite+aiosqlite:///{full_path}"
+        writer = self._writers.get(url)
+        if writer is not None:
+            await writer.close()
         async with self._lock:
-            if url in self._engines:
-                engine = self._engines.pop(url)
-                self._session_factories.pop(url, None)
-                await engine.dispose()
+            writer, engines = self._detach(url)
+            await self._close(writer, engines)
+            if engines:
                 logger.debug(f"释放 connection: {full_path}")
 
+    def _is_idle(self, url: str) -> bool:
+        return not self._in_use.get(url)
+
+    def is_idle(self, full_path: str) -> bool:
+        """该文件当前是否没有未结束的会话"""
+        return self._is_idle(f"sqlite+aiosqlite:///{full_path}")
+
+    async def evict_idle(self, now: float | None = None) -> int:
+        """释放空闲超时的非常驻文件，以及超出 `max_files` 的最久未用非常驻空闲文件，返回释放数"""  # noqa: E501
+        now = time.monotonic() if now is None else now
+        victims: list[str] = []
+        overflow = self._evictable_files() - self.max_files
+        for url, last_used in self._last_used.items():
+            if url in self._resident or not self._is_idle(url):
+                continue
+            if overflow > 0 or now - last_used >= self.idle_ttl:
+                victims.append(url)
+                overflow -= 1
+            else:
+                break
+
+        # 先同步摘除再异步关闭：摘除后到达的 open 会建立新连接，不会拿到正在关闭的对象
+        detached = [
+            (url, self._paths.get(url, url), *self._detach(url)) for url in victims
+        ]
+        for url, path, writer, engines in detached:
+            try:
+                await self._close(writer, engines)
+            except Exception as e:
+                logger.warning(f"释放空闲连接失败 [{url}]: {e}")
+            logger.debug(f"释放空闲 connection: {path}")
+        self._evictions += len(detached)
+        return len(detached)
+
+    def _evictable_files(self) -> int:
+        return len(self._last_used) - len(self._resident)
+
+    def stats(self) -> EngineStats:
+        stats = EngineStats(
+            files=len(self._last_used),
+            resident=len(self._resident),
+            evictions=self._evictions,
+        )
+        for engines in (self._engines, self._writer_engines):
+            for url, engine in engines.items():
+                pool: Any = engine.pool
+                connections = pool.checkedin() + pool.checkedout()
+                stats.engines += 1
+                stats.connections += connections
+                stats.mmap_bytes += connections * self._profile_of(url).mmap_size
+        return stats
+
     @asynccontextmanager
     async def open(
         self,
         full_path: str,
         commit: bool = True,
+        profile: SqliteProfile | None = None,
+        immutable: bool = False,
+        resident: bool = False,
     ) -> AsyncGenerator[AsyncSession, None]:
+        """打开会话：`commit=True` 走该文件的写入执行器，否则从只读连接池取会话
+
+        `immutable=True` 用于保证不会再变化的只读文件（如冷库解压副本）：
+        不建立写连接、不切换 WAL，并以 `immutable=1` 打开以省去文件锁。
+        `resident=True` 的文件常驻连接，不参与 `evict_idle`。
+        """
         url = f"sqlite+aiosqlite:///{full_path}"
-        if url not in self._session_factories:
-            await self._ensure_engine(url)
-        factory = self._session_factories[url]
-        async with factory() as sess:
-            try:
+        if profile is not None and url not in self._writers:
+            self._profiles[url] = profile
+        self._in_use[url] = self._in_use.get(url, 0) + 1
+        self._paths[url] = full_path
+        self._last_used[url] = time.monotonic()
+        self._last_used.move_to_end(url)
+        if resident:
+            self._resident.add(url)
+        else:
+            self._resident.discard(url)
+        try:
+            if self._evictable_files() > self.max_files:
+                await self.evict_idle()
+            if commit:
+                writer = await self._ensure_writer(url)
+                async with writer.transaction() as sess:
+                    yield sess
+                return
+
+            factory = await self._ensure_reader(url, full_path, immutable)
+            async with factory() as sess:
+                try:
+                    yield sess
+                except Exception:
+                    await sess.rollback()
+                    raise
+        finally:
+            remaining = self._in_use[url] - 1
+            if remaining:
+                self._in_use[url] = remaining
+            else:
+                del self._in_use[url]
+            if url in self._last_used:
+                self._last_used[url] = time.monotonic()
+                self._last_used.move_to_end(url)
+
+    @asynccontextmanager
+    async def open_attached(
+        self,
+        files: Mapping[str, tuple[str, bool]],
+        profile: SqliteProfile | None = None,
+    ) -> AsyncGenerator[AsyncSession, None]:
+        """打开临时的跨库只读会话：以内存库为主库，把 `files` 逐个只读 ATTACH
+
+        Args:
+            files: `{别名: (文件路径, 是否以 immutable 打开)}`，至多 `MAX_ATTACHED` 个。
+            profile: 连接使用的调优档位。
+
+        注意事项:
+            1. 连接不进连接池，会话结束即关闭，ATTACH 状态不会泄漏给其他会话。
+            2. 会话期间附加的文件计为使用中，不会被空闲淘汰或冷库解压区删除。
+            3. 主库为内存库，可在其上建临时视图 / 临时表，附加库本身只读。
+        """
+        if len(files) > MAX_ATTACHED:
+            raise ValueError(
+                f"单个连接最多附加 {MAX_ATTACHED} 个数据库，实际 {len(files)} 个"
+            )
+        profile = profile or DEFAULT_PROFILE
+        urls = [f"sqlite+aiosqlite:///{path}" for path, _ in files.values()]
+
+        def _on_connect(dbapi_connection: Any, connection_record: Any) -> None:
+            _ = connection_record
+            cursor = dbapi_connection.cursor()
+            for alias, (path, immutable) in files.items():
+                cursor.execute(
+                    f'ATTACH DATABASE ? AS "{alias}"', (_attach_uri(path, immutable),)
+                )
+            cursor.close()
+            self._apply_pragmas(dbapi_connection, profile.attached_pragmas())
+
+        engine = create_async_engine(
+            "sqlite+aiosqlite:///file::memory:?uri=true",
+            poolclass=NullPool,
+        )
+        event.listen(engine.sync_engine, "connect", _on_connect)
+        self._instrument(engine)
+        for url in urls:
+            self._in_use[url] = self._in_use.get(url, 0) + 1
+        try:
+            async with AsyncSession(engine, expire_on_commit=False) as sess:
                 yield sess
-                if commit:
-                    await sess.commit()
-            except Exception:
-                await sess.rollback()
-                raise
+        finally:
+            await engine.dispose()
+            for url in urls:
+                remaining = self._in_use[url] - 1
+                if remaining:
+                    self._in_use[url] = remaining
+                else:
+                    del self._in_use[url]
 
 
 db_manager = DatabaseManager()
@@ -7,18 +7,32 @@ Description: db 基类
 """
 
 from collections.abc import Sequence
+import inspect
 from typing import Any, cast, get_args
 
 from sqlalchemy import CursorResult, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 
+from .profiler import traced
+
 
 class BaseOps[T: DeclarativeBase]:
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
         self.model = self._get_model_class()
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """公开协程方法自动标注调用方，供 SQL 剖析器按 `*Ops` 方法归属语句"""
+        super().__init_subclass__(**kwargs)
+        for attr, value in list(vars(cls).items()):
+            if (
+                not attr.startswith("_")
+                and inspect.iscoroutinefunction(value)
+                and not getattr(value, "__sql_traced__", False)
+            ):
+                setattr(cls, attr, traced(value))
+
     def _get_model_class(self) -> type[T]:
         for base in getattr(self.__class__, "__orig_bases__", []):
             if getattr(base, "__origin__", None) is not BaseOps:
@@ -30,9 +44,11 @@ class BaseOps[T: DeclarativeBase]:
             "例如: class UserOps(BaseOps[User])",
         )
 
+    @traced
     async def get_by_id(self, id: int) -> T | None:
         return await self.session.get(self.model, id)
 
+    @traced
     async def get_list(
         self,
         limit: int = 20,
@@ -45,10 +61,12 @@ class BaseOps[T: DeclarativeBase]:
         result = await self.session.execute(stmt)
         return result.scalars().all()
 
+    @traced
     async def get_all(self) -> Sequence[T]:
         result = await self.session.execute(select(self.model))
         return result.scalars().all()
 
+    @traced
     async def bulk_create(self, data_list: list[dict], chunk_size: int = 1000) -> int:
         """
         【通用】极速批量插入 (Insert Only)
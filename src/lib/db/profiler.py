@@ -0,0 +1,285 @@
+"""
+Author: SakuraiCora<1479559098@qq.com>
+Date: 2026-03-04 10:26:51
+LastEditors: SakuraiCora<1479559098@qq.com>
+LastEditTime: 2026-03-04 10:26:51
+Description: SQL 性能剖析与慢查询日志
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import Awaitable, Callable, Mapping, Sequence
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import StrEnum
+import functools
+import re
+import time
+from types import MappingProxyType
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.lib.enums import LocalizedMixin
+from src.logger import logger
+
+SLOW_QUERY_MS = 200.0
+"""慢查询阈值（毫秒）"""
+LATENCY_BUCKETS_MS: tuple[float, ...] = (
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+)
+"""延迟直方图桶上界（毫秒），最后一个桶之外计入溢出桶"""
+FINGERPRINT_CACHE_SIZE = 4096
+"""SQL 指纹缓存容量"""
+UNKNOWN_CALLER = "-"
+
+_current_caller: ContextVar[str] = ContextVar("_current_caller", default=UNKNOWN_CALLER)
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_NAMED_PARAM_RE = re.compile(r"(?<!:):\w+")
+_SPACE_RE = re.compile(r"\s+")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS_RE = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+
+
+class SortKey(LocalizedMixin, StrEnum):
+    TOTAL = "total"
+    AVG = "avg"
+    MAX = "max"
+    P95 = "p95"
+    COUNT = "count"
+
+    __labels__ = MappingProxyType(
+        {
+            TOTAL: "总耗时",
+            AVG: "平均耗时",
+            MAX: "最大耗时",
+            P95: "P95",
+            COUNT: "执行次数",
+        },
+    )
+
+
+def fingerprint(statement: str) -> str:
+    """归一化 SQL：去注释与字面量，折叠占位符列表与多行 VALUES"""
+    sql = _COMMENT_RE.sub(" ", statement)
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NAMED_PARAM_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _SPACE_RE.sub(" ", sql).strip()
+    sql = _IN_LIST_RE.sub("(...)", sql)
+    return _ROWS_RE.sub("(...), ...", sql)
+
+
+def param_shape(parameters: Any, executemany: bool = False) -> str:
+    """只描述参数的结构与类型，不输出具体值"""
+    if executemany and isinstance(parameters, Sequence) and parameters:
+        return f"[{param_shape(parameters[0])}] x {len(parameters)}"
+    if isinstance(parameters, Mapping):
+        inner = ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items())
+        return f"{{{inner}}}"
+    if isinstance(parameters, Sequence) and not isinstance(parameters, str | bytes):
+        return f"({', '.join(type(v).__name__ for v in parameters)})"
+    return type(parameters).__name__
+
+
+@dataclass(slots=True)
+class QueryStats:
+    """同一 (指纹, 调用方) 的累计耗时与延迟直方图"""
+
+    fingerprint: str
+    caller: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    buckets: list[int] = field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1),
+    )
+
+    def record(self, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """按直方图估算分位数，返回所在桶的上界（溢出桶返回最大值）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= target:
+                if index < len(LATENCY_BUCKETS_MS):
+                    return min(LATENCY_BUCKETS_MS[index], self.max_ms)
+                break
+        return self.max_ms
+
+    def sort_value(self, key: SortKey) -> float:
+        match key:
+            case SortKey.TOTAL:
+                return self.total_ms
+            case SortKey.AVG:
+                return self.avg_ms
+            case SortKey.MAX:
+                return self.max_ms
+            case SortKey.P95:
+                return self.percentile(0.95)
+            case SortKey.COUNT:
+                return self.count
+
+
+class SqlProfiler:
+    """基于 SQLAlchemy 引擎事件的语句级剖析器
+
+    Args:
+        slow_query_ms: 慢查询阈值（毫秒），超过时以 WARNING 记录语句、调用方与参数结构。
+        enabled: 是否记录统计。
+
+    注意事项:
+        1. 统计按 (SQL 指纹, 调用方 `*Ops` 方法) 聚合，调用方由 `BaseOps` 子类的公开协程方法自动标注。
+        2. 只记录参数的结构与类型，不落具体值，避免日志泄露用户数据。
+        3. 计时覆盖驱动执行全程（含 aiosqlite 线程往返），不含结果集的 ORM 装配。
+    """  # noqa: E501
+
+    def __init__(
+        self,
+        slow_query_ms: float = SLOW_QUERY_MS,
+        enabled: bool = True,
+    ) -> None:
+        self.slow_query_ms = slow_query_ms
+        self.enabled = enabled
+        self.started_at = time.perf_counter()
+        self._stats: dict[tuple[str, str], QueryStats] = {}
+        self._fingerprints: dict[str, str] = {}
+
+    def attach(self, engine: Engine) -> None:
+        """为同步引擎（异步引擎的 `sync_engine`）挂载计时事件"""
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _fingerprint(self, statement: str) -> str:
+        fp = self._fingerprints.get(statement)
+        if fp is None:
+            if len(self._fingerprints) >= FINGERPRINT_CACHE_SIZE:
+                self._fingerprints.clear()
+            fp = self._fingerprints[statement] = fingerprint(statement)
+        return fp
+
+    def _before_cursor_execute(
+        self,
+        conn: Any,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        _ = (cursor, statement, parameters, context, executemany)
+        conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(
+        self,
+        conn: Any,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        _ = (cursor, context)
+        starts = conn.info.get("_query_start")
+        if not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+        if not self.enabled:
+            return
+        self.record(statement, elapsed_ms, parameters, executemany)
+
+    def record(
+        self,
+        statement: str,
+        elapsed_ms: float,
+        parameters: Any = None,
+        executemany: bool = False,
+    ) -> None:
+        caller = _current_caller.get()
+        fp = self._fingerprint(statement)
+        stats = self._stats.get((fp, caller))
+        if stats is None:
+            stats = self._stats[(fp, caller)] = QueryStats(fp, caller)
+        stats.record(elapsed_ms)
+
+        if elapsed_ms >= self.slow_query_ms:
+            logger.warning(
+                f"[慢查询] {elapsed_ms:.1f}ms caller={caller} sql={fp} "
+                f"params={param_shape(parameters, executemany)}",
+            )
+
+    def top(self, n: int = 10, key: SortKey = SortKey.TOTAL) -> list[QueryStats]:
+        return sorted(
+            self._stats.values(),
+            key=lambda s: s.sort_value(key),
+            reverse=True,
+        )[:n]
+
+    def reset(self) -> None:
+        self._stats.clear()
+        self.started_at = time.perf_counter()
+
+    def report(self, n: int = 10, key: SortKey = SortKey.TOTAL) -> str:
+        elapsed = time.perf_counter() - self.started_at
+        lines = [f"SQL Top {n}（按{key.label}，统计时长 {elapsed:.0f}s）"]
+        for rank, stats in enumerate(self.top(n, key), 1):
+            lines.append(
+                f"{rank}. {stats.caller} | {stats.count} 次 | "
+                f"总 {stats.total_ms:.1f}ms | 均 {stats.avg_ms:.2f}ms | "
+                f"P95 {stats.percentile(0.95):.2f}ms | 最大 {stats.max_ms:.1f}ms\n"
+                f"   {stats.fingerprint[:200]}",
+            )
+        if len(lines) == 1:
+            lines.append("暂无统计数据")
+        return "\n".join(lines)
+
+
+def traced[**P, R](
+    func: Callable[P, Awaitable[R]],
+) -> Callable[P, Awaitable[R]]:
+    """将调用方标注为 `<类名>.<方法名>`，供剖析器归属 SQL 语句"""
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        owner = type(args[0]).__name__ if args else ""
+        token = _current_caller.set(f"{owner}.{func.__name__}")
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _current_caller.reset(token)
+
+    wrapper.__sql_traced__ = True  # type: ignore[attr-defined]
+    return wrapper
+
+
+sql_profiler = SqlProfiler()
@@ -0,0 +1,134 @@
+"""
+Author: SakuraiCora<1479559098@qq.com>
+Date: 2026-03-03 20:15:32
+LastEditors: SakuraiCora<1479559098@qq.com>
+LastEditTime: 2026-03-03 20:15:32
+Description: SQLite 调优档位
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from enum import StrEnum
+from types import MappingProxyType
+
+from src.lib.enums import LocalizedMixin
+
+
+class TempStore(LocalizedMixin, StrEnum):
+    DEFAULT = "DEFAULT"
+    FILE = "FILE"
+    MEMORY = "MEMORY"
+
+    __labels__ = MappingProxyType(
+        {
+            DEFAULT: "编译默认",
+            FILE: "临时文件",
+            MEMORY: "内存",
+        },
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class SqliteProfile:
+    """单个数据库文件的 PRAGMA 调优档位
+
+    Attributes:
+        name: 档位名称，用于日志与基准测试输出。
+        cache_size: 页缓存大小，负数表示 KiB，正数表示页数。
+        mmap_size: 内存映射上限（字节），0 表示关闭 mmap。
+        temp_store: 临时表与排序的存放位置。
+        page_size: 页大小（字节），仅对新建数据库生效。
+        busy_timeout: 等待锁的超时时间（毫秒）。
+        wal_autocheckpoint: WAL 自动检查点阈值（页数），0 表示关闭。
+        synchronous: 同步级别。
+
+    注意事项:
+        1. 只读连接只应用 cache_size / mmap_size / temp_store / busy_timeout。
+        2. `page_size` 必须先于 `journal_mode=WAL` 设置，已有库需 VACUUM 后才会变化。
+    """
+
+    name: str
+    cache_size: int = -8 * 1024
+    mmap_size: int = 0
+    temp_store: TempStore = TempStore.DEFAULT
+    page_size: int = 4096
+    busy_timeout: int = 5000
+    wal_autocheckpoint: int = 1000
+    synchronous: str = "NORMAL"
+
+    def _shared_pragmas(self) -> list[str]:
+        return [
+            f"PRAGMA cache_size={self.cache_size}",
+            f"PRAGMA mmap_size={self.mmap_size}",
+            f"PRAGMA temp_store={self.temp_store.value}",
+            f"PRAGMA busy_timeout={self.busy_timeout}",
+        ]
+
+    def writer_pragmas(self) -> list[str]:
+        return [
+            f"PRAGMA page_size={self.page_size}",
+            "PRAGMA journal_mode=WAL",
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA wal_autocheckpoint={self.wal_autocheckpoint}",
+            *self._shared_pragmas(),
+        ]
+
+    def reader_pragmas(self) -> list[str]:
+        return ["PRAGMA query_only=ON", *self._shared_pragmas()]
+
+    def attached_pragmas(self) -> list[str]:
+        """跨库附加查询连接：主库为内存库，附加库均以 mode=ro 打开，不开启 query_only 以便建临时视图"""  # noqa: E501
+        return self._shared_pragmas()
+
+
+DEFAULT_PROFILE = SqliteProfile(
+    name="default",
+    mmap_size=256 * 1024 * 1024,
+)
+"""历史默认档位：WAL + NORMAL + 256MB mmap"""
+
+CORE_PROFILE = SqliteProfile(
+    name="core",
+    cache_size=-32 * 1024,
+    mmap_size=256 * 1024 * 1024,
+    temp_store=TempStore.MEMORY,
+)
+"""常驻主库：读多写多，给足缓存与 mmap"""
+
+HOT_SHARD_PROFILE = SqliteProfile(
+    name="hot_shard",
+    cache_size=-16 * 1024,
+    mmap_size=64 * 1024 * 1024,
+    temp_store=TempStore.MEMORY,
+    wal_autocheckpoint=4000,
+)
+"""活跃分片：批量追加为主，放宽检查点频率以减少写放大"""
+
+COLD_SHARD_PROFILE = SqliteProfile(
+    name="cold_shard",
+    cache_size=-2 * 1024,
+    mmap_size=0,
+    busy_timeout=10000,
+)
+"""冷分片：偶发查询，不占用 mmap 地址空间，缓存从简"""
+
+ARCHIVE_PROFILE = SqliteProfile(
+    name="archive",
+    cache_size=-2 * 1024,
+    mmap_size=256 * 1024 * 1024,
+)
+"""紧凑只读库：以 immutable 原地查询，靠 mmap 直接读取页面，页缓存从简"""
+
+PROFILES = MappingProxyType(
+    {
+        p.name: p
+        for p in (
+            DEFAULT_PROFILE,
+            CORE_PROFILE,
+            HOT_SHARD_PROFILE,
+            COLD_SHARD_PROFILE,
+            ARCHIVE_PROFILE,
+        )
+    }
+)
@@ -0,0 +1,153 @@
+"""
+Author: SakuraiCora<1479559098@qq.com>
+Date: 2026-03-05 10:31:06
+LastEditors: SakuraiCora<1479559098@qq.com>
+LastEditTime: 2026-03-05 10:31:06
+Description: 冷库临时解压区
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+import shutil
+import time
+
+from src.lib.consts import GLOBAL_SCRATCH_ROOT
+from src.logger import logger
+
+from .manager import db_manager
+
+SCRATCH_MAX_BYTES = 2 * 1024 * 1024 * 1024
+"""临时解压区容量上限（字节）"""
+SCRATCH_TTL_SECONDS = 30 * 60
+"""解压副本空闲超过该时长后删除"""
+
+
+@dataclass(slots=True)
+class ScratchStats:
+    files: int = 0
+    bytes: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+@dataclass(slots=True)
+class _ScratchEntry:
+    size: int
+    last_used: float
+
+
+def _exists(path: Path) -> bool:
+    return path.exists()
+
+
+def _file_size(path: Path) -> int:
+    return path.stat().st_size if path.exists() else 0
+
+
+def _remove_file(path: Path) -> None:
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+
+class ScratchCache:
+    """冷库解压副本的 LRU / TTL 缓存
+
+    归档文件始终是唯一可信来源，解压副本只读打开，淘汰时直接删除，不会回写归档。
+
+    Args:
+        root: 解压区根目录。
+        max_bytes: 解压副本总大小上限。
+        ttl: 副本空闲多久（秒）后可被 `evict_expired` 删除。
+
+    注意事项:
+        1. 进程首次使用时清空解压区，上次进程遗留的副本可能已与归档不一致。
+        2. 仍有会话在用的副本不会被淘汰，超限时允许暂时超出容量。
+    """
+
+    def __init__(
+        self,
+        root: Path = GLOBAL_SCRATCH_ROOT,
+        max_bytes: int = SCRATCH_MAX_BYTES,
+        ttl: float = SCRATCH_TTL_SECONDS,
+    ) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[Path, _ScratchEntry] = OrderedDict()
+        self._ready = False
+        self._stats = ScratchStats()
+
+    def directory(self, namespace: str) -> Path:
+        """命名空间对应的解压目录，首次调用时清理遗留副本"""
+        if not self._ready:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self._ready = True
+        d = self.root / namespace
+        d.mkdir(parents=True, exist_ok=True)
+        return d
+
+    def get(self, path: Path) -> bool:
+        """副本存在时刷新其 LRU 位置并返回 True"""
+        entry = self._entries.get(path)
+        if entry is None or not path.exists():
+            self._entries.pop(path, None)
+            self._stats.misses += 1
+            return False
+        entry.last_used = time.monotonic()
+        self._entries.move_to_end(path)
+        self._stats.hits += 1
+        return True
+
+    async def add(self, path: Path) -> None:
+        """登记新解压的副本，并按容量淘汰最久未用的其他副本"""
+        self._entries[path] = _ScratchEntry(_file_size(path), time.monotonic())
+        self._entries.move_to_end(path)
+        await self._evict(keep=path)
+
+    async def discard(self, path: Path) -> None:
+        if self._entries.pop(path, None) is not None or _exists(path):
+            await self._remove(path)
+
+    async def evict_expired(self, now: float | None = None) -> int:
+        now = time.monotonic() if now is None else now
+        return await self._evict(now=now)
+
+    async def _evict(self, keep: Path | None = None, now: float | None = None) -> int:
+        total = sum(entry.size for entry in self._entries.values())
+        victims: list[Path] = []
+        for path, entry in self._entries.items():
+            over_budget = total > self.max_bytes
+            expired = now is not None and now - entry.last_used >= self.ttl
+            if not over_budget and not expired:
+                break
+            if path == keep or not db_manager.is_idle(str(path)):
+                continue
+            victims.append(path)
+            total -= entry.size
+
+        for path in victims:
+            self._entries.pop(path, None)
+            await self._remove(path)
+        self._stats.evictions += len(victims)
+        return len(victims)
+
+    async def _remove(self, path: Path) -> None:
+        await db_manager.dispose(str(path))
+        try:
+            _remove_file(path)
+        except OSError as e:
+            logger.warning(f"删除冷库解压副本失败 [{path.name}]: {e}")
+        else:
+            logger.debug(f"删除冷库解压副本: {path.name}")
+
+    def stats(self) -> ScratchStats:
+        self._stats.files = len(self._entries)
+        self._stats.bytes = sum(entry.size for entry in self._entries.values())
+        return self._stats
+
+
+scratch_cache = ScratchCache()
@@ -0,0 +1,201 @@
+"""
+Author: SakuraiCora<1479559098@qq.com>
+Date: 2026-03-03 10:12:48
+LastEditors: SakuraiCora<1479559098@qq.com>
+LastEditTime: 2026-03-03 10:12:48
+Description: 本地日历：时间戳 -> 分片键 / 记录日期 / 小时
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+from src.lib.consts import LOCAL_TIMEZONE
+
+from .common import get_current_time
+
+DEFAULT_SHARD_FMT = "%Y_%m"
+
+
+class TimeSlot(NamedTuple):
+    """时间戳在本地日历中的位置"""
+
+    shard_key: str
+    """按 `DEFAULT_SHARD_FMT` 格式化的月分片键"""
+    record_date: int
+    """YYYYMMDD 整数日期"""
+    hour: int
+    """本地小时 (0-23)"""
+
+
+class Calendar:
+    """本地时区日历服务，统一全项目的日/月边界换算
+
+    按年惰性预计算每日零点时间戳、YYYYMMDD 日期与所属月份零点，
+    之后的换算只需一次二分查找与整数运算，不再逐条构造 arrow 对象。
+
+    Args:
+        tz: IANA 时区名，默认 `LOCAL_TIMEZONE`。
+
+    注意事项:
+        1. 区间上界均为闭区间（下一日/月零点 - 1），与 `arrow.ceil(...).int_timestamp` 一致。
+        2. `shard_key` 仅支持日及以上粒度的格式串。
+        3. 小时按距当日零点的秒数计算，夏令时切换日的小时可能偏移一位。
+    """  # noqa: E501
+
+    def __init__(self, tz: str = LOCAL_TIMEZONE) -> None:
+        self.tz = ZoneInfo(tz)
+        self._first_year = 0
+        self._last_year = -1
+        self._starts: list[int] = []
+        self._dates: list[int] = []
+        self._months: list[int] = []
+        self._date_index: dict[int, int] = {}
+        self._key_cache: dict[tuple[int, str], str] = {}
+        self._hint = (0, -1, 0)
+
+    def _build(self, first_year: int, last_year: int) -> None:
+        starts: list[int] = []
+        dates: list[int] = []
+        months: list[int] = []
+        day = datetime(first_year, 1, 1, tzinfo=self.tz)
+        month_start = int(day.timestamp())
+        while day.year <= last_year:
+            start = int(day.timestamp())
+            if day.day == 1:
+                month_start = start
+            starts.append(start)
+            dates.append(day.year * 10000 + day.month * 100 + day.day)
+            months.append(month_start)
+            day += timedelta(days=1)
+        # 哨兵：下一年元旦零点，用于计算最后一天的上界
+        starts.append(int(day.timestamp()))
+
+        self._first_year, self._last_year = first_year, last_year
+        self._starts, self._dates, self._months = starts, dates, months
+        self._date_index = {d: i for i, d in enumerate(dates)}
+        self._hint = (0, -1, 0)
+
+    def _cover_year(self, year: int) -> None:
+        if self._first_year <= year <= self._last_year:
+            return
+        if self._last_year < self._first_year:
+            self._build(year, year + 1)
+        else:
+            self._build(min(year, self._first_year), max(year, self._last_year))
+
+    def _index(self, ts: int) -> int:
+        lo, hi, idx = self._hint
+        if lo <= ts < hi:
+            return idx
+
+        starts = self._starts
+        if not starts or not starts[0] <= ts < starts[-1]:
+            self._cover_year(datetime.fromtimestamp(ts, self.tz).year)
+            starts = self._starts
+
+        idx = bisect_right(starts, ts) - 1
+        self._hint = (starts[idx], starts[idx + 1], idx)
+        return idx
+
+    def _date_idx(self, record_date: int) -> int:
+        if record_date not in self._date_index:
+            self._cover_year(record_date // 10000)
+        try:
+            return self._date_index[record_date]
+        except KeyError:
+            raise ValueError(f"无效日期: {record_date}") from None
+
+    def locate(self, ts: int) -> TimeSlot:
+        idx = self._index(ts)
+        return TimeSlot(
+            self.shard_key(ts),
+            self._dates[idx],
+            (ts - self._starts[idx]) // 3600,
+        )
+
+    def record_date(self, ts: int) -> int:
+        idx = self._index(ts)
+        return self._dates[idx]
+
+    def hour(self, ts: int) -> int:
+        idx = self._index(ts)
+        return (ts - self._starts[idx]) // 3600
+
+    def today(self) -> int:
+        return self.record_date(get_current_time())
+
+    def day_bounds(self, ts: int) -> tuple[int, int]:
+        idx = self._index(ts)
+        return self._starts[idx], self._starts[idx + 1] - 1
+
+    def date_bounds(self, record_date: int) -> tuple[int, int]:
+        idx = self._date_idx(record_date)
+        return self._starts[idx], self._starts[idx + 1] - 1
+
+    def shift_date(self, record_date: int, days: int) -> int:
+        """YYYYMMDD 日期加减天数"""
+        idx = self._date_idx(record_date) + days
+        if not 0 <= idx < len(self._dates):
+            target = date(
+                record_date // 10000, record_date // 100 % 100, record_date % 100
+            ) + timedelta(days=days)
+            self._cover_year(target.year)
+            idx = self._date_idx(record_date) + days
+        return self._dates[idx]
+
+    def date_range(self, end_date: int, days: int) -> list[int]:
+        """以 `end_date` 结尾、升序排列的连续 `days` 个日期"""
+        start = self._date_idx(self.shift_date(end_date, -(days - 1)))
+        return self._dates[start : start + days]
+
+    def month_start(self, ts: int) -> int:
+        idx = self._index(ts)
+        return self._months[idx]
+
+    def month_starts(self, start_ts: int, end_ts: int) -> list[int]:
+        """覆盖 [start_ts, end_ts] 的全部月份零点，升序"""
+        months: list[int] = []
+        cursor = self.month_start(start_ts)
+        while cursor <= end_ts:
+            months.append(cursor)
+            cursor = self.next_month_start(cursor)
+        return months
+
+    def next_month_start(self, ts: int) -> int:
+        """`ts` 所在月份的下一个月零点"""
+        idx = self._index(ts)
+        year, month = divmod(self._dates[idx] // 100, 100)
+        if month == 12:
+            year, month = year + 1, 1
+        else:
+            month += 1
+        idx = self._date_idx(year * 10000 + month * 100 + 1)
+        return self._starts[idx]
+
+    def shard_key(self, ts: int, fmt: str = DEFAULT_SHARD_FMT) -> str:
+        idx = self._index(ts)
+        day_start = self._starts[idx]
+        cache_key = (day_start, fmt)
+        key = self._key_cache.get(cache_key)
+        if key is None:
+            key = datetime.fromtimestamp(day_start, self.tz).strftime(fmt)
+            self._key_cache[cache_key] = key
+        return key
+
+    def to_datetime(self, ts: int) -> datetime:
+        return datetime.fromtimestamp(ts, self.tz)
+
+    def to_timestamp(self, value: datetime | int) -> int:
+        """datetime 转时间戳，无时区信息的 datetime 视为本地时间"""
+        if isinstance(value, int):
+            return value
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=self.tz)
+        return int(value.timestamp())
+
+
+local_calendar = Calendar()
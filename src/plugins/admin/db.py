@@ -0,0 +1,147 @@
+"""
+Author: SakuraiCora<1479559098@qq.com>
+Date: 2026-03-04 11:40:12
+LastEditors: SakuraiCora<1479559098@qq.com>
+LastEditTime: 2026-03-09 15:48:27
+Description: 数据库诊断插件
+"""
+
+from nonebot.adapters.onebot.v11.message import Message
+from nonebot.matcher import Matcher
+from nonebot.params import CommandArg
+from nonebot.permission import SUPERUSER
+from nonebot.plugin import CommandGroup, PluginMetadata
+
+from src.database.core.consts import Permission
+from src.lib.consts import TriggerType
+from src.lib.db.manager import db_manager
+from src.lib.db.profiler import SortKey, sql_profiler
+from src.lib.db.scratch import scratch_cache
+
+name = "数据库诊断模块"
+description = "数据库诊断模块: 查看 SQL 耗时排行、慢查询阈值与连接占用"
+
+usage = f"""
+===== {name} =====
+
+命令前缀: #admin.db / #数据库诊断
+
+1.耗时排行
+  top / 排行 [条数] [total|avg|max|p95|count]
+  示例: #admin.db top 10 p95
+
+2.重置统计
+  reset / 重置
+  示例: #admin.db reset
+
+3.慢查询阈值
+  slow / 慢查询 [毫秒]
+  示例: #admin.db slow 100
+
+4.连接占用
+  engines / 连接 [evict]
+  示例: #admin.db engines evict
+
+5.帮助信息
+  help / 帮助
+  示例: #admin.db help
+
+[注意事项]:
+1. 需要【Senrin】管理员权限。
+2. 统计按 SQL 指纹与调用的 *Ops 方法聚合，进程重启后清零。
+""".strip()
+
+__plugin_meta__ = PluginMetadata(
+    name=name,
+    description=description,
+    usage=usage,
+    extra={
+        "author": "SakuraiCora",
+        "version": "0.1.0",
+        "trigger": TriggerType.COMMAND,
+        "permission": Permission.SUPERUSER,
+    },
+)
+
+admin_command_group = CommandGroup(
+    "admin",
+    permission=SUPERUSER,
+    priority=5,
+    block=False,
+)
+admin_db = admin_command_group.command("db", aliases={"数据库诊断"})
+
+
+def top_statements(args: list[str]) -> str:
+    n = 10
+    key = SortKey.TOTAL
+    for arg in args:
+        if arg.isdigit():
+            n = max(1, min(int(arg), 50))
+        elif arg.lower() in SortKey:
+            key = SortKey(arg.lower())
+        else:
+            return f"未知的参数 [{arg}]\n\n{usage}"
+    return sql_profiler.report(n, key)
+
+
+def reset_statements() -> str:
+    sql_profiler.reset()
+    return "已重置 SQL 统计"
+
+
+def set_slow_threshold(args: list[str]) -> str:
+    if not args:
+        return f"当前慢查询阈值: {sql_profiler.slow_query_ms:g}ms"
+    try:
+        threshold = float(args[0])
+    except ValueError:
+        return f"错误: 非法阈值 [{args[0]}]"
+    if threshold <= 0:
+        return "错误: 阈值必须大于 0"
+    sql_profiler.slow_query_ms = threshold
+    return f"慢查询阈值已设为 {threshold:g}ms"
+
+
+async def engine_stats(args: list[str]) -> str:
+    lines: list[str] = []
+    if args and args[0].lower() in ("evict", "释放"):
+        evicted = await db_manager.evict_idle()
+        lines.append(f"已释放 {evicted} 个空闲文件的连接")
+    stats = db_manager.stats()
+    lines.extend(
+        [
+            f"文件: {stats.files} (常驻 {stats.resident})",
+            f"非常驻上限: {db_manager.max_files}",
+            f"引擎: {stats.engines}",
+            f"连接: {stats.connections}",
+            f"mmap 上限: {stats.mmap_bytes / 1024 / 1024:.0f}MB",
+            f"累计释放: {stats.evictions}",
+        ]
+    )
+    scratch = scratch_cache.stats()
+    lines.append(
+        f"冷库副本: {scratch.files} 个 / {scratch.bytes / 1024 / 1024:.0f}MB "
+        f"(命中 {scratch.hits} / 未命中 {scratch.misses} / 淘汰 {scratch.evictions})"
+    )
+    return "\n".join(lines)
+
+
+@admin_db.handle()
+async def _(matcher: Matcher, arg: Message = CommandArg()) -> None:
+    args = arg.extract_plain_text().strip().split()
+    command = args[0].lower() if args else "top"
+
+    match command:
+        case "help" | "帮助":
+            await matcher.finish(usage)
+        case "top" | "排行":
+            await matcher.finish(top_statements(args[1:]))
+        case "reset" | "重置":
+            await matcher.finish(reset_statements())
+        case "slow" | "慢查询":
+            await matcher.finish(set_slow_threshold(args[1:]))
+        case "engines" | "连接":
+            await matcher.finish(await engine_stats(args[1:]))
+        case _:
+            await matcher.finish(f"未知的操作指令。\n\n{usage}")
@@ -2,7 +2,7 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-19 00:20:20
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-02 19:25:29
+LastEditTime: 2026-03-10 11:40:16
 Description: 用户管理插件
 """
 
@@ -42,6 +42,7 @@ usage = f"""
   #admin.user ban 12345 67890 -r 恶意刷屏 -t 1d
   #admin.user unban 12345 -r 申诉通过
   #admin.user status 12345
+  #admin.user history 12345 -d 90
 """.strip()
 
 __plugin_meta__ = PluginMetadata(
@@ -56,6 +57,9 @@ __plugin_meta__ = PluginMetadata(
     },
 )
 
+HISTORY_DAYS = 90
+"""改名记录默认回溯天数"""
+
 # fmt: off
 user_parser = ArgumentParser()
 subparsers = user_parser.add_subparsers(dest="action", required=True, help="执行的操作")
@@ -73,6 +77,10 @@ unban_parser.add_argument("-r", "--reason", type=str, default=UNSET, help="操
 
 status_parser = subparsers.add_parser("status", aliases=["状态"], help="查询状态")
 status_parser.add_argument("uids", nargs="+", help="目标用户 ID 列表")
+
+history_parser = subparsers.add_parser("history", aliases=["曾用名"], help="查询改名记录")  # noqa: E501
+history_parser.add_argument("uids", nargs="+", help="目标用户 ID 列表")
+history_parser.add_argument("-d", "--days", type=int, default=HISTORY_DAYS, help=f"回溯天数 (缺省为 {HISTORY_DAYS})")  # noqa: E501
 # fmt: on
 
 admin_command_group = CommandGroup(
@@ -96,6 +104,7 @@ class AdminUserContext:
     blacklist: BlacklistCacheItem | Unset = UNSET
     time_str: str | Unset = UNSET
     reason: str | Unset = UNSET
+    days: int = HISTORY_DAYS
 
 
 async def ban_user(ctx: AdminUserContext) -> str:
@@ -152,6 +161,24 @@ async def status_user(ctx: AdminUserContext) -> str:
     return f"状态: {status}"
 
 
+async def history_user(ctx: AdminUserContext) -> str:
+    if ctx.days <= 0:
+        return "回溯天数必须大于 0"
+    end_ts = get_current_time()
+    history = await user_repo.get_name_history(
+        ctx.user.user_id, end_ts - ctx.days * 86400, end_ts
+    )
+    if not history:
+        return f"近 {ctx.days} 天无改名记录"
+    lines = [f"近 {ctx.days} 天改名 {len(history)} 次:"]
+    lines.extend(
+        f"  {arrow.get(created_at).to('Asia/Shanghai').format('YYYY-MM-DD HH:mm')} "
+        f"{content or '(空)'}"
+        for content, created_at in history
+    )
+    return "\n".join(lines)
+
+
 @admin_user.handle()
 async def _(
     bot: Bot,
@@ -170,6 +197,7 @@ async def _(
     group_id = getattr(args, "group", GLOBAL_GROUP_FLAG)
     reason = getattr(args, "reason", UNSET)
     time_str = getattr(args, "time", UNSET)
+    days = getattr(args, "days", HISTORY_DAYS)
 
     handler: Callable[[AdminUserContext], Awaitable[str]]
     match action:
@@ -179,6 +207,8 @@ async def _(
             handler = unban_user
         case "status" | "状态":
             handler = status_user
+        case "history" | "曾用名":
+            handler = history_user
         case _:
             await matcher.finish("未知的操作指令。")
 
@@ -209,6 +239,7 @@ async def _(
             reason=reason,
             blacklist=blacklist,
             time_str=time_str,
+            days=days,
         )
         res_msg = await handler(ctx)
         results.append(f"[{uid}|{name}] {res_msg}")
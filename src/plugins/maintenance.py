@@ -0,0 +1,84 @@
+"""
+Author: SakuraiCora<1479559098@qq.com>
+Date: 2026-03-04 19:12:40
+LastEditors: SakuraiCora<1479559098@qq.com>
+LastEditTime: 2026-03-08 10:05:37
+Description: 数据库维护定时任务
+"""
+
+from nonebot import require
+from nonebot.plugin import PluginMetadata
+
+from src.database.core.consts import Permission
+from src.lib.consts import TriggerType
+from src.lib.db.connectors import provision_upcoming_shards
+from src.lib.db.manager import db_manager
+from src.lib.db.scratch import scratch_cache
+from src.logger import logger
+from src.services.cache import dump_cache_snapshots
+
+require("nonebot_plugin_apscheduler")
+from nonebot_plugin_apscheduler import scheduler
+
+name = "数据库维护"
+description = """
+数据库维护模块: 月末预建下个月的分片库，定期释放空闲的数据库连接与冷库解压副本，
+定期写出缓存快照
+""".strip()
+
+usage = """
+定时任务
+""".strip()
+
+__plugin_meta__ = PluginMetadata(
+    name=name,
+    description=description,
+    usage=usage,
+    extra={
+        "author": "SakuraiCora",
+        "version": "0.1.0",
+        "trigger": TriggerType.CRON,
+        "permission": Permission.SUPERUSER,
+    },
+)
+
+
+@scheduler.scheduled_job(
+    "cron",
+    hour="21-23",
+    minute=30,
+    id="db_shard_provision",
+    coalesce=True,
+    misfire_grace_time=600,
+    max_instances=1,
+)
+async def _db_shard_provision_job() -> None:
+    provisioned = await provision_upcoming_shards()
+    if provisioned:
+        logger.success(f"[DB] 下个月分片预建完成: {', '.join(provisioned)}")
+
+
+@scheduler.scheduled_job(
+    "interval",
+    minutes=5,
+    id="db_idle_eviction",
+    coalesce=True,
+    max_instances=1,
+)
+async def _db_idle_eviction_job() -> None:
+    if removed := await scratch_cache.evict_expired():
+        logger.debug(f"[DB] 已删除 {removed} 个过期的冷库解压副本")
+    if evicted := await db_manager.evict_idle():
+        logger.debug(f"[DB] 已释放 {evicted} 个空闲数据库文件的连接")
+
+
+@scheduler.scheduled_job(
+    "interval",
+    minutes=30,
+    id="cache_snapshot",
+    coalesce=True,
+    max_instances=1,
+)
+async def _cache_snapshot_job() -> None:
+    size = await dump_cache_snapshots()
+    logger.debug(f"[Cache] 缓存快照已写出: {size / 1024:.1f} KiB")
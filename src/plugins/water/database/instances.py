@@ -7,15 +7,18 @@ Description: db 实例
 """
 
 from src.lib.db.connectors import ShardedDB, StaticDB
+from src.lib.db.profiles import CORE_PROFILE, HOT_SHARD_PROFILE
 
 water_message = ShardedDB(
     namespace="water_db",
     prefix="logs",
     fmt="%Y_%m",
     active_window_months=2,
+    profile=HOT_SHARD_PROFILE,
 )
 
 water_core_db = StaticDB(
     namespace="water_db",
     filename="core.db",
+    profile=CORE_PROFILE,
 )
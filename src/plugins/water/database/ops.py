@@ -1,17 +1,36 @@
 """Water 数据访问层。"""
 
+from collections import defaultdict
 from collections.abc import Sequence
 from math import floor, sqrt
 from typing import cast
 
-from sqlalchemy import CursorResult, and_, delete, func, or_, select, update
+from sqlalchemy import (
+    CursorResult,
+    FromClause,
+    Table,
+    and_,
+    bindparam,
+    delete,
+    func,
+    literal,
+    or_,
+    select,
+    text,
+    union_all,
+    update,
+)
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.engine.row import Row
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import CreateIndex, CreateTable, DropTable
 
 from src.lib.db.ops import BaseOps
+from src.lib.utils.calendar import local_calendar
 
 from .tables import (
+    WATER_MESSAGE_PARTITION_PREFIX,
     WaterDailySummary,
     WaterGlobalLevel,
     WaterGroupMatrixMap,
@@ -22,6 +41,8 @@ from .tables import (
     WaterPenaltyLog,
     WaterSettlementJob,
     WaterUserAchievement,
+    partition_record_date,
+    water_message_partition,
 )
 from .types import (
     WaterAchievementPayload,
@@ -35,14 +56,105 @@ from .types import (
     WaterUserExpPayload,
 )
 
+_created_partitions: defaultdict[str, set[str]] = defaultdict(set)
+"""各分片文件中本进程已建过的分区表，命中时落盘不再执行建表 DDL"""
+
 
 class WaterMessageOps(BaseOps[WaterMessage]):
+    """按日分区的流水读写
+
+    写入按 `created_at` 所在日期路由到 `water_message_YYYYMMDD`，每张分区表在本进程内
+    只在首次写入时建表；
+    读取只扫描时间范围覆盖到且已存在的分区，旧分片中遗留的 `water_message` 表仅在
+    仍有数据时参与读取，多个来源时以 UNION ALL 合并。
+    """
+
+    async def _existing_tables(self, names: list[str]) -> list[str]:
+        if not names:
+            return []
+        result = await self.session.execute(
+            # 跨分片附加会话中各表以同名临时视图出现
+            text(
+                "SELECT name FROM sqlite_master "
+                "WHERE type IN ('table', 'view') AND name IN :names "
+                "UNION SELECT name FROM sqlite_temp_master "
+                "WHERE type IN ('table', 'view') AND name IN :names"
+            ).bindparams(bindparam("names", expanding=True)),
+            {"names": names},
+        )
+        existing = set(result.scalars())
+        return [name for name in names if name in existing]
+
+    async def _sources(self, start_ts: int, end_ts: int) -> list[Table]:
+        partitions = {
+            water_message_partition(record_date).name: record_date
+            for record_date in _record_dates(start_ts, end_ts)
+        }
+        legacy = cast(Table, WaterMessage.__table__)
+        names = await self._existing_tables([legacy.name, *partitions])
+        if legacy.name in names and not await self._has_rows(legacy):
+            names.remove(legacy.name)
+        return [
+            water_message_partition(partitions[name]) if name in partitions else legacy
+            for name in names
+        ]
+
+    async def _has_rows(self, table: Table) -> bool:
+        stmt = select(literal(1)).select_from(table).limit(1)
+        return await self.session.scalar(stmt) is not None
+
+    async def _source(self, start_ts: int, end_ts: int) -> FromClause | None:
+        """时间范围内的流水来源；单个来源直接返回表，否则返回 UNION ALL 子查询"""
+        tables = await self._sources(start_ts, end_ts)
+        if not tables:
+            return None
+        if len(tables) == 1:
+            return tables[0]
+        return union_all(
+            *(
+                select(t.c.id, t.c.group_id, t.c.user_id, t.c.created_at).where(
+                    t.c.created_at >= start_ts,
+                    t.c.created_at <= end_ts,
+                )
+                for t in tables
+            )
+        ).subquery("water_message")
+
+    async def _known_partitions(self) -> set[str]:
+        conn = await self.session.connection()
+        return _created_partitions[str(conn.engine.url.database)]
+
+    async def _create_partition(self, table: Table) -> None:
+        await self.session.execute(CreateTable(table, if_not_exists=True))
+        for index in table.indexes:
+            await self.session.execute(CreateIndex(index, if_not_exists=True))
+
     async def bulk_insert_water_message(self, data: list[WaterMessagePayload]) -> int:
         if not data:
             return 0
-        stmt = sqlite_insert(WaterMessage).values(data)
-        result = await self.session.execute(stmt)
-        return cast(CursorResult, result).rowcount
+        by_date: defaultdict[int, list[WaterMessagePayload]] = defaultdict(list)
+        for item in data:
+            by_date[local_calendar.record_date(item["created_at"])].append(item)
+
+        known = await self._known_partitions()
+        inserted = 0
+        for record_date, rows in by_date.items():
+            table = water_message_partition(record_date)
+            created = table.name not in known
+            if created:
+                await self._create_partition(table)
+                known.add(table.name)
+            stmt = sqlite_insert(table).values(rows)
+            try:
+                result = await self.session.execute(stmt)
+            except OperationalError as e:
+                # 记录的建表所在事务已回滚，或分区已被删除：补建后重试一次
+                if created or "no such table" not in str(e):
+                    raise
+                await self._create_partition(table)
+                result = await self.session.execute(stmt)
+            inserted += cast(CursorResult, result).rowcount
+        return inserted
 
     async def get_top_users(
         self,
@@ -51,15 +163,18 @@ class WaterMessageOps(BaseOps[WaterMessage]):
         end_ts: int,
         limit: int = 20,
     ) -> Sequence[Row[tuple[str, int]]]:
+        src = await self._source(start_ts, end_ts)
+        if src is None:
+            return []
         stmt = (
-            select(WaterMessage.user_id, func.count(WaterMessage.id).label("count"))
+            select(src.c.user_id, func.count(src.c.id).label("count"))
             .where(
-                WaterMessage.group_id == group_id,
-                WaterMessage.created_at >= start_ts,
-                WaterMessage.created_at <= end_ts,
+                src.c.group_id == group_id,
+                src.c.created_at >= start_ts,
+                src.c.created_at <= end_ts,
             )
-            .group_by(WaterMessage.user_id)
-            .order_by(func.count(WaterMessage.id).desc())
+            .group_by(src.c.user_id)
+            .order_by(func.count(src.c.id).desc())
             .limit(limit)
         )
         result = await self.session.execute(stmt)
@@ -68,14 +183,17 @@ class WaterMessageOps(BaseOps[WaterMessage]):
     async def get_today_group_rank(
         self, group_id: str, start_ts: int, end_ts: int
     ) -> int:
+        src = await self._source(start_ts, end_ts)
+        if src is None:
+            return 999
         stmt = (
-            select(WaterMessage.group_id)
+            select(src.c.group_id)
             .where(
-                WaterMessage.created_at >= start_ts,
-                WaterMessage.created_at <= end_ts,
+                src.c.created_at >= start_ts,
+                src.c.created_at <= end_ts,
             )
-            .group_by(WaterMessage.group_id)
-            .order_by(func.count(WaterMessage.created_at).desc())
+            .group_by(src.c.group_id)
+            .order_by(func.count(src.c.created_at).desc())
         )
         result = await self.session.execute(stmt)
         groups = result.scalars().all()
@@ -84,11 +202,14 @@ class WaterMessageOps(BaseOps[WaterMessage]):
     async def get_users_timestamps(
         self, group_id: str, user_ids: list[str], start_ts: int, end_ts: int
     ) -> Sequence[Row[tuple[str, int]]]:
-        stmt = select(WaterMessage.user_id, WaterMessage.created_at).where(
-            WaterMessage.group_id == group_id,
-            WaterMessage.user_id.in_(user_ids),
-            WaterMessage.created_at >= start_ts,
-            WaterMessage.created_at <= end_ts,
+        src = await self._source(start_ts, end_ts)
+        if src is None:
+            return []
+        stmt = select(src.c.user_id, src.c.created_at).where(
+            src.c.group_id == group_id,
+            src.c.user_id.in_(user_ids),
+            src.c.created_at >= start_ts,
+            src.c.created_at <= end_ts,
         )
         result = await self.session.execute(stmt)
         return result.all()
@@ -99,23 +220,25 @@ class WaterMessageOps(BaseOps[WaterMessage]):
         end_ts: int,
     ) -> Sequence[Row[tuple[str, str, int, int]]]:
         """聚合日流水 -> (group_id, user_id, msg_count, active_hours)."""
-        hour_expr = func.strftime(
-            "%H", WaterMessage.created_at, "unixepoch", "localtime"
-        )
+        src = await self._source(start_ts, end_ts)
+        if src is None:
+            return []
+        # start_ts 为本地日历零点，按偏移换算小时，与 local_calendar 保持一致
+        hour_expr = (src.c.created_at - start_ts) // 3600
         stmt = (
             select(
-                WaterMessage.group_id,
-                WaterMessage.user_id,
-                func.count(WaterMessage.id).label("msg_count"),
+                src.c.group_id,
+                src.c.user_id,
+                func.count(src.c.id).label("msg_count"),
                 func.count(func.distinct(hour_expr)).label("active_hours"),
             )
             .where(
-                WaterMessage.created_at >= start_ts,
-                WaterMessage.created_at <= end_ts,
+                src.c.created_at >= start_ts,
+                src.c.created_at <= end_ts,
             )
             .group_by(
-                WaterMessage.group_id,
-                WaterMessage.user_id,
+                src.c.group_id,
+                src.c.user_id,
             )
         )
         result = await self.session.execute(stmt)
@@ -127,23 +250,25 @@ class WaterMessageOps(BaseOps[WaterMessage]):
         end_ts: int,
     ) -> Sequence[tuple[str, str, int, int]]:
         """聚合日流水 -> (group_id, user_id, hour, count)."""
-        hour_expr = func.strftime(
-            "%H", WaterMessage.created_at, "unixepoch", "localtime"
-        )
+        src = await self._source(start_ts, end_ts)
+        if src is None:
+            return []
+        # start_ts 为本地日历零点，按偏移换算小时，与 local_calendar 保持一致
+        hour_expr = (src.c.created_at - start_ts) // 3600
         stmt = (
             select(
-                WaterMessage.group_id,
-                WaterMessage.user_id,
+                src.c.group_id,
+                src.c.user_id,
                 hour_expr.label("hour"),
-                func.count(WaterMessage.id).label("msg_count"),
+                func.count(src.c.id).label("msg_count"),
             )
             .where(
-                WaterMessage.created_at >= start_ts,
-                WaterMessage.created_at <= end_ts,
+                src.c.created_at >= start_ts,
+                src.c.created_at <= end_ts,
             )
             .group_by(
-                WaterMessage.group_id,
-                WaterMessage.user_id,
+                src.c.group_id,
+                src.c.user_id,
                 hour_expr,
             )
         )
@@ -154,12 +279,50 @@ class WaterMessageOps(BaseOps[WaterMessage]):
             for group_id, user_id, hour, msg_count in rows
         ]
 
+    async def drop_partitions_before(self, record_date: int) -> list[str]:
+        """删除 `record_date` 之前的整日分区表，返回被删除的表名"""
+        result = await self.session.execute(
+            text(
+                "SELECT name FROM sqlite_master WHERE type = 'table' "
+                "AND name LIKE :pattern"
+            ),
+            {"pattern": f"{WATER_MESSAGE_PARTITION_PREFIX}%"},
+        )
+        known = await self._known_partitions()
+        dropped: list[str] = []
+        for name in sorted(result.scalars()):
+            day = partition_record_date(name)
+            if day is None or day >= record_date:
+                continue
+            await self.session.execute(
+                DropTable(water_message_partition(day), if_exists=True)
+            )
+            known.discard(name)
+            dropped.append(name)
+        return dropped
+
     async def prune_before(self, before_ts: int) -> int:
+        """清理未分区的旧 `water_message` 表中的历史流水，清空后删表"""
+        legacy = cast(Table, WaterMessage.__table__)
+        if not await self._existing_tables([legacy.name]):
+            return 0
         stmt = delete(WaterMessage).where(WaterMessage.created_at < before_ts)
         result = await self.session.execute(stmt)
+        if not await self._has_rows(legacy):
+            await self.session.execute(DropTable(legacy, if_exists=True))
         return cast(CursorResult, result).rowcount
 
 
+def _record_dates(start_ts: int, end_ts: int) -> list[int]:
+    if end_ts < start_ts:
+        return []
+    last = local_calendar.record_date(end_ts)
+    dates = [local_calendar.record_date(start_ts)]
+    while dates[-1] < last:
+        dates.append(local_calendar.shift_date(dates[-1], 1))
+    return dates
+
+
 class WaterSummaryOps(BaseOps[WaterDailySummary]):
     async def bulk_upsert_summary(self, summary_data: list[WaterSummaryPayload]) -> int:
         if not summary_data:
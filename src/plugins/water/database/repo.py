@@ -12,6 +12,7 @@ from sqlalchemy.engine.row import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.consts import WritePolicy
+from src.lib.utils.calendar import local_calendar
 from src.lib.utils.common import get_current_time, split_list
 
 from .instances import water_core_db, water_message
@@ -203,10 +204,9 @@ class WaterRepository:
         await water_writer.add(ctx.to_payload())
 
     async def _save_immediate(self, ctx: WaterMessageContext) -> None:
-        dt = arrow.get(ctx.created_at).datetime
-        time_ctx = dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        async with water_message.session(time_ctx=time_ctx, commit=True) as session:
+        async with water_message.session(
+            time_ctx=ctx.created_at, commit=True
+        ) as session:
             await WaterMessageOps(session).bulk_insert_water_message([ctx.to_payload()])
 
     async def save_message(
@@ -237,15 +237,12 @@ class WaterRepository:
     async def get_today_leaderboard(
         self, group_id: str, limit: int = 20
     ) -> list[RankItem]:
-        now = arrow.get(get_current_time())
-        start_ts = now.floor("day").int_timestamp
-        end_ts = now.ceil("day").int_timestamp
-        yesterday_int = int(now.shift(days=-1).format("YYYYMMDD"))
+        now = get_current_time()
+        start_ts, end_ts = local_calendar.day_bounds(now)
+        yesterday_int = local_calendar.shift_date(local_calendar.record_date(now), -1)
 
         async def _fetch_today() -> Sequence[Row[tuple[str, int]]]:
-            async with water_message.session(
-                time_ctx=now.datetime, commit=False
-            ) as session:
+            async with water_message.session(time_ctx=now, commit=False) as session:
                 return await WaterMessageOps(session).get_top_users(
                     group_id,
                     start_ts,
@@ -277,12 +274,11 @@ class WaterRepository:
         ]
 
     async def get_today_group_rank(self, group_id: str) -> int:
-        now = arrow.get(get_current_time())
-        start_ts = now.floor("day").int_timestamp
-        end_ts = now.ceil("day").int_timestamp
+        now = get_current_time()
+        start_ts, end_ts = local_calendar.day_bounds(now)
 
         async with water_message.session(
-            time_ctx=now.datetime,
+            time_ctx=now,
             commit=False,
         ) as session:
             return await WaterMessageOps(session).get_today_group_rank(
@@ -295,12 +291,11 @@ class WaterRepository:
         if not user_ids:
             return {}
 
-        now = arrow.get(get_current_time())
-        start_ts = now.floor("day").int_timestamp
-        end_ts = now.ceil("day").int_timestamp
+        now = get_current_time()
+        start_ts, end_ts = local_calendar.day_bounds(now)
 
         async with water_message.session(
-            time_ctx=now.datetime,
+            time_ctx=now,
             commit=False,
         ) as session:
             raw_timestamps = await WaterMessageOps(session).get_users_timestamps(
@@ -309,18 +304,16 @@ class WaterRepository:
 
         user_hourly: dict[str, list[int]] = defaultdict(lambda: [0] * 24)
         for uid, ts in raw_timestamps:
-            hour = arrow.get(ts).to("local").hour
-            user_hourly[uid][hour] += 1
+            user_hourly[uid][(ts - start_ts) // 3600] += 1
         return dict(user_hourly)
 
     async def collect_daily_aggregates(
         self,
         target_date: arrow.Arrow,
     ) -> list[DailyAggregateItem]:
-        day_start = target_date.floor("day")
-        day_end = target_date.ceil("day")
-        start_ts = day_start.int_timestamp
-        end_ts = day_end.int_timestamp
+        start_ts, end_ts = local_calendar.date_bounds(
+            int(target_date.format("YYYYMMDD"))
+        )
 
         async def _stats_in_shard(
             session: AsyncSession,
@@ -338,26 +331,38 @@ class WaterRepository:
                 end_ts,
             )
 
-        stats_per_shard = await water_message.map_reduce(
-            day_start.datetime,
-            day_end.datetime,
-            _stats_in_shard,
-        )
-        hourly_per_shard = await water_message.map_reduce(
-            day_start.datetime,
-            day_end.datetime,
-            _hourly_in_shard,
-        )
-
-        merged_stats: dict[tuple[str, str], tuple[int, int]] = {}
-        for shard_rows in stats_per_shard:
+        def _merge_stats(
+            acc: dict[tuple[str, str], tuple[int, int]],
+            shard_rows: Sequence[Row[tuple[str, str, int, int]]],
+        ) -> dict[tuple[str, str], tuple[int, int]]:
             for group_id, user_id, msg_count, active_hours in shard_rows:
-                merged_stats[(group_id, user_id)] = (msg_count, active_hours)
+                acc[(group_id, user_id)] = (msg_count, active_hours)
+            return acc
 
-        merged_hourly: dict[tuple[str, str], list[int]] = defaultdict(lambda: [0] * 24)
-        for shard_rows in hourly_per_shard:
+        def _merge_hourly(
+            acc: defaultdict[tuple[str, str], list[int]],
+            shard_rows: Sequence[tuple[str, str, int, int]],
+        ) -> defaultdict[tuple[str, str], list[int]]:
             for group_id, user_id, hour, count in shard_rows:
-                merged_hourly[(group_id, user_id)][hour] += count
+                acc[(group_id, user_id)][hour] += count
+            return acc
+
+        merged_stats, merged_hourly = await asyncio.gather(
+            water_message.map_fold(
+                start_ts,
+                end_ts,
+                _stats_in_shard,
+                _merge_stats,
+                {},
+            ),
+            water_message.map_fold(
+                start_ts,
+                end_ts,
+                _hourly_in_shard,
+                _merge_hourly,
+                defaultdict(lambda: [0] * 24),
+            ),
+        )
 
         group_ids = sorted({group_id for group_id, _ in merged_stats})
         group_matrix_map = await self.get_or_create_group_matrix_ids(group_ids)
@@ -573,22 +578,27 @@ class WaterRepository:
                     await penalty_ops.insert_penalty_logs(chunk)
 
         # 按规范执行裁剪钩子，保留最近 3 天流水。
-        prune_before_ts = target_date.shift(days=-2).floor("day").int_timestamp
+        prune_before_ts, _ = local_calendar.date_bounds(
+            local_calendar.shift_date(record_date, -2)
+        )
         await self.prune_old_messages(prune_before_ts)
 
     async def prune_old_messages(self, before_ts: int) -> int:
-        before = arrow.get(before_ts).floor("month")
-        now = arrow.get(get_current_time()).floor("month")
-        total = 0
-        cursor = before
-        while cursor <= now:
+        """删除 `before_ts` 所在日期之前的整日分区，返回删除的分区数
+
+        旧分片中遗留的未分区 `water_message` 表仍按时间 DELETE，清空后直接删表。
+        """
+        before_date = local_calendar.record_date(before_ts)
+        dropped = 0
+        for month_start in local_calendar.month_starts(before_ts, get_current_time()):
             async with water_message.session(
-                time_ctx=cursor.datetime,
+                time_ctx=month_start,
                 commit=True,
             ) as session:
-                total += await WaterMessageOps(session).prune_before(before_ts)
-            cursor = cursor.shift(months=1)
-        return total
+                ops = WaterMessageOps(session)
+                dropped += len(await ops.drop_partitions_before(before_date))
+                await ops.prune_before(before_ts)
+        return dropped
 
     async def unlock_achievements(self, payloads: list[WaterAchievementPayload]) -> int:
         if not payloads:
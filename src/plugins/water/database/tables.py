@@ -1,6 +1,16 @@
 """Water 数据表定义 (v2.0)."""
 
-from sqlalchemy import JSON, Index, Integer, String, Text, UniqueConstraint
+from sqlalchemy import (
+    JSON,
+    Column,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 from src.lib.db.orm import TimeMixin
@@ -14,7 +24,11 @@ class WaterCoreBase(DeclarativeBase):
     """水王核心资产主库表基类。"""
 
 
-class WaterMessage(WaterMessageBase):
+class WaterLegacyMessageBase(DeclarativeBase):
+    """未分区旧流水表基类，不参与建表，仅用于读取和清空历史分片中的遗留数据。"""
+
+
+class WaterMessage(WaterLegacyMessageBase):
     __tablename__ = "water_message"
     __table_args__ = (
         Index(
@@ -31,6 +45,39 @@ class WaterMessage(WaterMessageBase):
     created_at: Mapped[int] = mapped_column(Integer, nullable=False)
 
 
+WATER_MESSAGE_PARTITION_PREFIX = "water_message_"
+water_partition_metadata = MetaData()
+"""按日分区表的元数据，与 `WaterMessageBase` 分开，避免 `create_all` 建出所有分区"""
+
+
+def water_message_partition(record_date: int) -> Table:
+    """`record_date` 当天的流水分区表 `water_message_YYYYMMDD`，结构与 `water_message` 一致。
+
+    月分片内每天一张表，保留期之外的整天直接 `DROP TABLE`；旧的 `water_message` 表仅用于兼容历史数据。
+    """  # noqa: E501
+    name = f"{WATER_MESSAGE_PARTITION_PREFIX}{record_date}"
+    table = water_partition_metadata.tables.get(name)
+    if table is None:
+        table = Table(
+            name,
+            water_partition_metadata,
+            Column("id", Integer, primary_key=True, autoincrement=True),
+            Column("group_id", String(64), nullable=False),
+            Column("user_id", String(64), nullable=False),
+            Column("created_at", Integer, nullable=False),
+            Index(f"idx_{name}_group_user_time", "group_id", "user_id", "created_at"),
+        )
+    return table
+
+
+def partition_record_date(table_name: str) -> int | None:
+    """从分区表名解析出日期，非分区表返回 None"""
+    suffix = table_name.removeprefix(WATER_MESSAGE_PARTITION_PREFIX)
+    if suffix == table_name or len(suffix) != 8 or not suffix.isdigit():
+        return None
+    return int(suffix)
+
+
 class WaterDailySummary(WaterCoreBase, TimeMixin):
     __tablename__ = "water_daily_summary"
     __table_args__ = (
@@ -6,7 +6,12 @@ LastEditTime: 2026-03-01 02:49:04
 Description: water db writers
 """
 
-from src.lib.db.batch import BatchWriter, execute_batch_write
+from src.lib.db.batch import (
+    AdaptiveConfig,
+    BatchWriter,
+    OverflowPolicy,
+    execute_batch_write,
+)
 
 from .instances import water_message
 from .ops import WaterMessageOps
@@ -30,4 +35,13 @@ water_writer = BatchWriter[WaterMessagePayload](
     flush_callback=_flush_water_logs,
     batch_size=100,
     flush_interval=3.0,
+    max_size=20000,
+    overflow=OverflowPolicy.SPILL,
+    adaptive=AdaptiveConfig(
+        min_batch_size=100,
+        max_batch_size=5000,
+        min_interval=1.0,
+        max_interval=30.0,
+    ),
+    journal=True,
 )
@@ -1,10 +1,9 @@
 """Water 成就查询命令处理。"""
 
-import arrow
 from nonebot.adapters.onebot.v11.event import GroupMessageEvent
 from nonebot.matcher import Matcher
 
-from src.lib.utils.common import get_current_time
+from src.lib.utils.calendar import local_calendar
 from src.plugins.water.database import water_repo
 from src.plugins.water.services import achievement_service
 
@@ -13,7 +12,7 @@ async def handle_my_achievements(matcher: Matcher, event: GroupMessageEvent) ->
     user_id = str(event.user_id)
     group_id = str(event.group_id)
     matrix_id = await water_repo.get_or_create_group_matrix_id(group_id)
-    record_date = int(arrow.get(get_current_time()).format("YYYYMMDD"))
+    record_date = local_calendar.today()
 
     message = await achievement_service.build_user_achievement_message(
         user_id=user_id,
@@ -6,6 +6,7 @@ from typing import Literal
 
 import arrow
 
+from src.lib.utils.calendar import local_calendar
 from src.lib.utils.common import get_current_time
 from src.plugins.water.database import water_repo
 from src.plugins.water.database.types import WaterAchievementPayload
@@ -70,9 +71,11 @@ class AchievementService:
 
     @staticmethod
     def current_season_id(ts: int | None = None) -> str:
-        now = arrow.get(ts or get_current_time()).to("Asia/Shanghai")
-        quarter = (now.month - 1) // 3 + 1
-        return f"{now.year}S{quarter}"
+        year, month = divmod(
+            local_calendar.record_date(ts or get_current_time()) // 100, 100
+        )
+        quarter = (month - 1) // 3 + 1
+        return f"{year}S{quarter}"
 
     async def check_and_unlock(
         self,
@@ -223,20 +226,18 @@ class AchievementService:
         today_msg_count: int = 0,
     ) -> bool:
         _ = today_msg_count
-        end_day = arrow.get(str(record_date), "YYYYMMDD")
-        start_day = end_day.shift(days=-2)
+        days = local_calendar.date_range(record_date, 3)
         summaries = await water_repo.get_user_recent_summaries(
             user_id=user_id,
             matrix_id=matrix_id,
-            start_date=int(start_day.format("YYYYMMDD")),
+            start_date=days[0],
             end_date=record_date,
         )
         if len(summaries) < 3:
             return False
 
         day_to_hourly = {item.record_date: item.hourly_counts for item in summaries}
-        for i in range(3):
-            cur_day = int(start_day.shift(days=i).format("YYYYMMDD"))
+        for cur_day in days:
             if cur_day not in day_to_hourly:
                 return False
             hourly = day_to_hourly[cur_day] or [0] * 24
@@ -266,22 +267,17 @@ class AchievementService:
         today_msg_count: int = 0,
     ) -> bool:
         _ = today_msg_count
-        end_day = arrow.get(str(record_date), "YYYYMMDD")
-        start_day = end_day.shift(days=-29)
+        days = local_calendar.date_range(record_date, 30)
         summaries = await water_repo.get_user_recent_summaries(
             user_id=user_id,
             matrix_id=matrix_id,
-            start_date=int(start_day.format("YYYYMMDD")),
+            start_date=days[0],
             end_date=record_date,
         )
         if len(summaries) < 30:
             return False
         summary_days = {item.record_date for item in summaries}
-        for i in range(30):
-            cur_day = int(start_day.shift(days=i).format("YYYYMMDD"))
-            if cur_day not in summary_days:
-                return False
-        return True
+        return all(cur_day in summary_days for cur_day in days)
 
     async def _progress_text(
         self,
@@ -315,12 +311,11 @@ class AchievementService:
         matrix_id: str,
         record_date: int,
     ) -> int:
-        end_day = arrow.get(str(record_date), "YYYYMMDD")
-        start_day = end_day.shift(days=-2)
+        days = local_calendar.date_range(record_date, 3)
         summaries = await water_repo.get_user_recent_summaries(
             user_id=user_id,
             matrix_id=matrix_id,
-            start_date=int(start_day.format("YYYYMMDD")),
+            start_date=days[0],
             end_date=record_date,
         )
         day_to_night = {}
@@ -329,8 +324,7 @@ class AchievementService:
             day_to_night[item.record_date] = sum(hourly[2:5]) > 0
 
         streak = 0
-        for i in range(2, -1, -1):
-            day = int(start_day.shift(days=i).format("YYYYMMDD"))
+        for day in reversed(days):
             if day_to_night.get(day, False):
                 streak += 1
             else:
@@ -343,18 +337,16 @@ class AchievementService:
         matrix_id: str,
         record_date: int,
     ) -> int:
-        end_day = arrow.get(str(record_date), "YYYYMMDD")
-        start_day = end_day.shift(days=-29)
+        days = local_calendar.date_range(record_date, 30)
         summaries = await water_repo.get_user_recent_summaries(
             user_id=user_id,
             matrix_id=matrix_id,
-            start_date=int(start_day.format("YYYYMMDD")),
+            start_date=days[0],
             end_date=record_date,
         )
         summary_days = {item.record_date for item in summaries}
         streak = 0
-        for i in range(29, -1, -1):
-            day = int(start_day.shift(days=i).format("YYYYMMDD"))
+        for day in reversed(days):
             if day in summary_days:
                 streak += 1
             else:
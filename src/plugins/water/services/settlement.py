@@ -6,7 +6,7 @@ from dataclasses import dataclass
 import arrow
 from loguru import logger
 
-from src.lib.utils.common import get_current_time
+from src.lib.utils.calendar import local_calendar
 from src.plugins.water.database import water_repo
 from src.plugins.water.database.repo import DailyAggregateItem
 
@@ -40,10 +40,11 @@ class WaterSettlementService:
         3. 结尾流水裁剪钩子。
         """
         if target_date is None:
-            target = arrow.get(get_current_time()).shift(days=-1).floor("day")
+            record_date = local_calendar.shift_date(local_calendar.today(), -1)
+            target = arrow.get(str(record_date), "YYYYMMDD")
         else:
             target = target_date.floor("day")
-        record_date = int(target.format("YYYYMMDD"))
+            record_date = int(target.format("YYYYMMDD"))
 
         started, reason = await water_repo.try_start_settlement_job(
             record_date,
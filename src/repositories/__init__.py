@@ -2,13 +2,14 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-13 19:41:15
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-02-22 17:31:44
+LastEditTime: 2026-03-08 10:05:37
 Description: repo 实现
 
 `get_xxx` cache -> db -> 回填
 """
 
 from src.lib.cache import blacklist_cache, group_cache, member_cache, user_cache
+from src.lib.consts import GLOBAL_CACHE_ROOT
 
 from .blacklist import BlacklistRepository
 from .group import GroupRepository
@@ -17,10 +18,10 @@ from .member import MemberRepository
 from .user import UserRepository
 
 blacklist_repo = BlacklistRepository(blacklist_cache)
-group_repo = GroupRepository(group_cache)
+group_repo = GroupRepository(group_cache, GLOBAL_CACHE_ROOT / "group.snap")
 invite_repo = InviteRepository()
-member_repo = MemberRepository(member_cache)
-user_repo = UserRepository(user_cache)
+member_repo = MemberRepository(member_cache, GLOBAL_CACHE_ROOT / "member.snap")
+user_repo = UserRepository(user_cache, GLOBAL_CACHE_ROOT / "user.snap")
 
 __all__ = [
     "blacklist_repo",
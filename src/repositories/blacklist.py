@@ -2,7 +2,7 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-13 21:03:25
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-02 19:25:01
+LastEditTime: 2026-03-08 16:22:51
 Description: blacklist 相关实现
 """
 
@@ -15,7 +15,7 @@ from src.database.instances import core_db, log_db
 from src.database.log.consts import AuditAction, AuditCategory, AuditContext
 from src.database.log.ops import AuditLogOps
 from src.lib.cache.field import BlacklistCacheItem
-from src.lib.cache.impl import BlacklistCache
+from src.lib.cache.impl import BlacklistCache, NegativeCache
 from src.lib.consts import GLOBAL_GROUP_FLAG, PERMANENT_BAN_FLAG
 from src.lib.utils.common import get_current_time
 
@@ -30,18 +30,21 @@ class BlacklistRepository:
         cache: BlacklistCache,
     ) -> None:
         self.cache = cache
-
-    async def warm_up(self) -> None:
-        async with core_db.session() as session:
-            data = await BlacklistOps(session).get_all()
-        self.cache.set_batch(
-            {
-                self.cache._gen_key(d.target_user_id, d.group_id): BlacklistCacheItem(
-                    expiry=d.ban_expiry
-                )
-                for d in data
-            },
-        )
+        self.missing = NegativeCache()
+
+    async def warm_up(self) -> int:
+        """解封会物理删除行，无法增量回源，始终全量流式载入
+
+        Returns:
+            载入的行数
+        """
+        loaded = 0
+        async with core_db.session(commit=False) as session:
+            async for rows in BlacklistOps(session).stream_cache_rows():
+                for user_id, group_id, expiry in rows:
+                    self.cache.set_ban(user_id, group_id, expiry)
+                loaded += len(rows)
+        return loaded
 
     async def get_blacklist(
         self,
@@ -50,13 +53,16 @@ class BlacklistRepository:
     ) -> BlacklistCacheItem | None:
         if item := self.cache.get_ban(user_id, group_id):
             return item
+        if self.missing.is_missing(group_id, user_id):
+            return None
 
-        async with core_db.session() as session:
+        async with core_db.session(commit=False) as session:
             db_item = await BlacklistOps(session).get_by_uid_and_gid(
                 target_user_id=user_id,
                 group_id=group_id,
             )
             if not db_item:
+                self.missing.mark(group_id, user_id)
                 return None
 
         self.cache.set_ban(user_id, group_id, db_item.ban_expiry)
@@ -80,6 +86,7 @@ class BlacklistRepository:
             else arrow.get(get_current_time()).shift(seconds=duration).int_timestamp
         )
         self.cache.set_ban(target_user_id, group_id, expiry)
+        self.missing.forget(group_id, target_user_id)
 
         async with core_db.session() as core_session:
             await BlacklistOps(core_session).add_ban(
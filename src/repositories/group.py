@@ -2,11 +2,12 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-13 19:46:09
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-02 19:30:37
+LastEditTime: 2026-03-10 10:20:05
 Description: group 相关实现
 """
 
 from dataclasses import dataclass
+from pathlib import Path
 
 from src.database.consts import WritePolicy
 from src.database.core.consts import GroupStatus
@@ -15,8 +16,9 @@ from src.database.instances import core_db, log_db, snapshot_db
 from src.database.log.consts import AuditAction, AuditCategory, AuditContext
 from src.database.log.ops import AuditLogOps
 from src.database.snapshot.ops import GroupSnapshotOps
-from src.lib.cache.field import GroupCacheItem
-from src.lib.cache.impl import GroupCache
+from src.lib.cache.field import GroupCacheItem, fingerprint
+from src.lib.cache.impl import GroupCache, NegativeCache
+from src.lib.cache.snapshot import read_snapshot, write_snapshot
 from src.lib.types import UNSET, Unset, is_set, resolve_unset
 from src.lib.utils.common import get_current_time
 from src.services.writers import (
@@ -53,8 +55,10 @@ class GroupChangeContext:
 
 
 class GroupRepository:
-    def __init__(self, cache: GroupCache) -> None:
+    def __init__(self, cache: GroupCache, snapshot_path: Path | None = None) -> None:
         self.cache = cache
+        self.snapshot_path = snapshot_path
+        self.missing = NegativeCache()
 
     async def _save_buffered(self, ctx: GroupChangeContext) -> None:
         event_time = get_current_time()
@@ -137,12 +141,13 @@ class GroupRepository:
         3. 策略分流 (Buffered / Immediate)
         """
         ctx = GroupChangeContext(group_id, group_name, status, is_all_shut)
-        old_item = self.cache.get(group_id)
+        old_item = await self.get_group(group_id)
         ctx.is_new = old_item is None
+        self.missing.forget(group_id)
 
         self.cache.upsert_group(group_id, group_name, status, is_all_shut)
         if not ctx.is_new and old_item:
-            if is_set(group_name) and old_item.name_hash == hash(group_name):
+            if is_set(group_name) and old_item.name_hash == fingerprint(group_name):
                 ctx.group_name = UNSET
             if is_set(status) and old_item.status == status:
                 ctx.status = UNSET
@@ -154,29 +159,50 @@ class GroupRepository:
         elif policy == WritePolicy.IMMEDIATE:
             await self._save_immediate(ctx)
 
-    async def warm_up(self) -> None:
-        async with core_db.session() as session:
-            db_groups = await GroupOps(session).get_all()
-
-        self.cache.set_batch(
-            {
-                g.group_id: GroupCacheItem(
-                    group_id=str(g.group_id),
-                    name_hash=hash(g.group_name),
-                    status=g.status,
-                    is_all_shut=False,
-                )
-                for g in db_groups
-            },
-        )
+    async def warm_up(self) -> int:
+        """先载入快照，再流式回源快照水位之后更新过的行；无快照时全量预热
+
+        Returns:
+            回源的行数
+        """
+        since = None
+        if self.snapshot_path:
+            since = await read_snapshot(self.cache, self.snapshot_path)
+        loaded = 0
+        async with core_db.session(commit=False) as session:
+            async for rows in GroupOps(session).stream_cache_rows(since):
+                for group_id, group_name, status in rows:
+                    old = self.cache.get(group_id)
+                    self.cache.set(
+                        group_id,
+                        GroupCacheItem(
+                            group_id=group_id,
+                            name_hash=fingerprint(group_name),
+                            status=status,
+                            is_all_shut=False,
+                            disabled_plugins=(
+                                old.disabled_plugins if old else frozenset()
+                            ),
+                        ),
+                    )
+                loaded += len(rows)
+        return loaded
+
+    async def dump_snapshot(self) -> int:
+        if not self.snapshot_path:
+            return 0
+        return await write_snapshot(self.cache, self.snapshot_path, get_current_time())
 
     async def get_group(self, group_id: str) -> GroupCacheItem | None:
         if item := self.cache.get(group_id):
             return item
+        if self.missing.is_missing(group_id):
+            return None
 
-        async with core_db.session() as session:
+        async with core_db.session(commit=False) as session:
             db_group = await GroupOps(session).get_by_group_id(group_id)
             if not db_group:
+                self.missing.mark(group_id)
                 return None
 
             self.cache.upsert_group(
@@ -184,9 +210,10 @@ class GroupRepository:
                 group_name=db_group.group_name,
                 status=db_group.status,
             )
+            return self.cache.get(group_id)
 
     async def get_name_by_gid(self, group_id: str) -> str | None:
-        async with core_db.session() as session:
+        async with core_db.session(commit=False) as session:
             return await GroupOps(session).get_name_by_gid(group_id)
 
     async def update_status(self, group_id: str, status: GroupStatus) -> None:
@@ -210,5 +237,5 @@ class GroupRepository:
         )
 
     async def get_working_group_ids(self) -> list[str]:
-        async with core_db.session() as session:
+        async with core_db.session(commit=False) as session:
             return await GroupOps(session).get_working_group_ids()
@@ -51,25 +51,25 @@ class InviteRepository:
             )
 
     async def get_by_message_id(self, message_id: str) -> Invitation | None:
-        async with core_db.session() as core_session:
+        async with core_db.session(commit=False) as core_session:
             return await InvitationOps(core_session).get_by_message_id(
                 message_id=message_id,
             )
 
     async def get_by_status(self, status: InvitationStatus) -> Sequence[Invitation]:
-        async with core_db.session() as core_session:
+        async with core_db.session(commit=False) as core_session:
             return await InvitationOps(core_session).get_by_status(status)
 
     async def get_by_id(self, invitation_id: int) -> Invitation | None:
-        async with core_db.session() as core_session:
+        async with core_db.session(commit=False) as core_session:
             return await InvitationOps(core_session).get_by_id(invitation_id)
 
     async def get_by_group_id(self, group_id: str) -> Invitation | None:
-        async with core_db.session() as core_session:
+        async with core_db.session(commit=False) as core_session:
             return await InvitationOps(core_session).get_by_group_id(group_id)
 
     async def get_by_flag(self, flag: str) -> Invitation | None:
-        async with core_db.session() as core_session:
+        async with core_db.session(commit=False) as core_session:
             return await InvitationOps(core_session).get_by_flag(flag)
 
     async def ignore_all_pending(self) -> Sequence[Invitation]:
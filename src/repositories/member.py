@@ -2,12 +2,13 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-13 19:46:12
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-02 19:48:53
+LastEditTime: 2026-03-09 10:12:40
 Description: member 相关实现
 """
 
 from collections.abc import Sequence
 from dataclasses import dataclass
+from pathlib import Path
 
 from src.database.consts import WritePolicy
 from src.database.core.consts import Permission
@@ -17,8 +18,9 @@ from src.database.instances import core_db, log_db, snapshot_db
 from src.database.log.consts import AuditAction, AuditCategory, AuditContext
 from src.database.log.ops import AuditLogOps
 from src.database.snapshot.ops import MemberSnapshotOps
-from src.lib.cache.field import MemberCacheItem
-from src.lib.cache.impl import MemberCache
+from src.lib.cache.field import MemberCacheItem, fingerprint
+from src.lib.cache.impl import MemberCache, NegativeCache
+from src.lib.cache.snapshot import read_snapshot, write_snapshot
 from src.lib.types import UNSET, Unset, is_set, resolve_unset
 from src.lib.utils.common import get_current_time
 from src.services.writers import (
@@ -51,8 +53,10 @@ class MemberChangeContext:
 
 
 class MemberRepository:
-    def __init__(self, cache: MemberCache) -> None:
+    def __init__(self, cache: MemberCache, snapshot_path: Path | None = None) -> None:
         self.cache = cache
+        self.snapshot_path = snapshot_path
+        self.missing = NegativeCache()
 
     async def _save_buffered(self, ctx: MemberChangeContext) -> None:
         """
@@ -147,12 +151,13 @@ class MemberRepository:
         policy: WritePolicy = WritePolicy.BUFFERED,
     ) -> None:
         ctx = MemberChangeContext(user_id, group_id, group_card, permission)
-        old_item = self.cache.get_member(user_id, group_id)
+        old_item = await self.get_member(user_id, group_id)
         ctx.is_new = old_item is None
+        self.missing.forget(group_id, user_id)
         self.cache.upsert_member(user_id, group_id, permission, group_card)
 
         if not ctx.is_new and old_item:
-            if is_set(group_card) and old_item.card_hash == hash(group_card):
+            if is_set(group_card) and old_item.card_hash == fingerprint(group_card):
                 ctx.group_card = UNSET
 
             if is_set(permission) and old_item.permission == permission:
@@ -163,19 +168,30 @@ class MemberRepository:
         elif policy == WritePolicy.IMMEDIATE:
             await self._save_immediate(ctx)
 
-    async def warm_up(self) -> None:
-        async with core_db.session() as session:
-            members = await MemberOps(session).get_all()
+    async def warm_up(self) -> int:
+        """先载入快照，再流式回源快照水位之后最近更新的行，条目数不超过缓存上限
 
-        self.cache.set_batch(
-            {
-                self.cache._gen_key(m.user_id, m.group_id): MemberCacheItem(
-                    card_hash=hash(m.group_card),
-                    permission=m.permission,
-                )
-                for m in members
-            },
-        )
+        Returns:
+            回源的行数
+        """
+        since = None
+        if self.snapshot_path:
+            since = await read_snapshot(self.cache, self.snapshot_path)
+        loaded = 0
+        async with core_db.session(commit=False) as session:
+            ops = MemberOps(session)
+            async for rows in ops.stream_cache_rows(since, self.cache.max_size):
+                for user_id, group_id, group_card, permission in rows:
+                    self.cache.put_member(
+                        user_id, group_id, fingerprint(group_card), permission
+                    )
+                loaded += len(rows)
+        return loaded
+
+    async def dump_snapshot(self) -> int:
+        if not self.snapshot_path:
+            return 0
+        return await write_snapshot(self.cache, self.snapshot_path, get_current_time())
 
     async def get_member(
         self,
@@ -184,10 +200,13 @@ class MemberRepository:
     ) -> MemberCacheItem | None:
         if item := self.cache.get_member(user_id, group_id):
             return item
+        if self.missing.is_missing(group_id, user_id):
+            return None
 
-        async with core_db.session() as session:
+        async with core_db.session(commit=False) as session:
             db_member = await MemberOps(session).get_by_uid_gid(user_id, group_id)
             if not db_member:
+                self.missing.mark(group_id, user_id)
                 return None
 
             self.cache.upsert_member(
@@ -199,19 +218,19 @@ class MemberRepository:
             return self.cache.get_member(user_id, group_id)
 
     async def get_card_by_uid_gid(self, user_id: str, group_id: str) -> str | None:
-        async with core_db.session() as session:
+        async with core_db.session(commit=False) as session:
             return await MemberOps(session).get_card_by_uid_gid(user_id, group_id)
 
     async def get_admin_member_by_uid(self, user_id: str) -> Sequence[Member]:
-        async with core_db.session() as session:
+        async with core_db.session(commit=False) as session:
             return await MemberOps(session).get_admin_by_uid(user_id)
 
     async def get_distinct_user_count(self, group_id: str) -> int:
-        async with core_db.session() as session:
+        async with core_db.session(commit=False) as session:
             return await MemberOps(session).get_distinct_user_count(group_id)
 
     async def get_intersection_user_count(self, group_a: str, group_b: str) -> int:
-        async with core_db.session() as session:
+        async with core_db.session(commit=False) as session:
             return await MemberOps(session).get_intersection_user_count(
                 group_a,
                 group_b,
@@ -2,11 +2,15 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-13 18:59:47
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-03 14:16:03
+LastEditTime: 2026-03-09 10:12:40
 Description: user 相关实现
 """
 
+from collections.abc import Sequence
 from dataclasses import dataclass
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.consts import WritePolicy
 from src.database.core.consts import Permission
@@ -15,8 +19,9 @@ from src.database.instances import core_db, log_db, snapshot_db
 from src.database.log.consts import AuditAction, AuditCategory, AuditContext
 from src.database.log.ops import AuditLogOps
 from src.database.snapshot.ops import UserSnapshotOps
-from src.lib.cache.field import UserCacheItem
-from src.lib.cache.impl import UserCache
+from src.lib.cache.field import UserCacheItem, fingerprint
+from src.lib.cache.impl import NegativeCache, UserCache
+from src.lib.cache.snapshot import read_snapshot, write_snapshot
 from src.lib.types import UNSET, Unset, is_set, resolve_unset
 from src.lib.utils.common import get_current_time
 from src.services.writers import (
@@ -49,8 +54,10 @@ class UserChangeContext:
 
 
 class UserRepository:
-    def __init__(self, cache: UserCache) -> None:
+    def __init__(self, cache: UserCache, snapshot_path: Path | None = None) -> None:
         self.cache = cache
+        self.snapshot_path = snapshot_path
+        self.missing = NegativeCache()
 
     async def _save_buffered(self, ctx: UserChangeContext) -> None:
         event_time = get_current_time()
@@ -121,12 +128,13 @@ class UserRepository:
         policy: WritePolicy = WritePolicy.BUFFERED,
     ) -> None:
         ctx = UserChangeContext(user_id, user_name, permission)
-        old_item = self.cache.get(user_id)
+        old_item = await self.get_user(user_id)
         ctx.is_new = old_item is None
+        self.missing.forget(user_id)
         self.cache.upsert_user(user_id, user_name, permission)
 
         if not ctx.is_new and old_item:
-            if is_set(user_name) and old_item.name_hash == hash(user_name):
+            if is_set(user_name) and old_item.name_hash == fingerprint(user_name):
                 ctx.user_name = UNSET
             if is_set(permission) and old_item.permission == permission:
                 ctx.permission = UNSET
@@ -136,27 +144,66 @@ class UserRepository:
         elif policy == WritePolicy.IMMEDIATE:
             await self._save_immediate(ctx)
 
-    async def warm_up(self) -> None:
-        async with core_db.session() as session:
-            users = await UserOps(session).get_all()
-        self.cache.set_batch(
-            {
-                u.user_id: UserCacheItem(
-                    user_id=str(u.user_id),
-                    name_hash=hash(u.user_name),
-                    permission=u.permission,
-                )
-                for u in users
-            },
+    async def get_name_history(
+        self,
+        user_id: str,
+        start_ts: int,
+        end_ts: int,
+    ) -> list[tuple[str | None, int]]:
+        """用户在时间范围内的改名记录，目录判定不含该用户的分片不会被唤醒"""
+
+        async def _in_shard(session: AsyncSession) -> Sequence[tuple[str | None, int]]:
+            return await UserSnapshotOps(session).get_user_snapshots(
+                user_id, start_ts, end_ts
+            )
+
+        per_shard = await snapshot_db.map_reduce(
+            start_ts,
+            end_ts,
+            _in_shard,
+            probe={"user_id": user_id},
         )
+        return [row for rows in per_shard for row in rows]
+
+    async def warm_up(self) -> int:
+        """先载入快照，再流式回源快照水位之后更新过的行；无快照时全量预热
+
+        Returns:
+            回源的行数
+        """
+        since = None
+        if self.snapshot_path:
+            since = await read_snapshot(self.cache, self.snapshot_path)
+        loaded = 0
+        async with core_db.session(commit=False) as session:
+            async for rows in UserOps(session).stream_cache_rows(since):
+                for user_id, user_name, permission in rows:
+                    self.cache.set(
+                        user_id,
+                        UserCacheItem(
+                            user_id=user_id,
+                            name_hash=fingerprint(user_name),
+                            permission=permission,
+                        ),
+                    )
+                loaded += len(rows)
+        return loaded
+
+    async def dump_snapshot(self) -> int:
+        if not self.snapshot_path:
+            return 0
+        return await write_snapshot(self.cache, self.snapshot_path, get_current_time())
 
     async def get_user(self, user_id: str) -> UserCacheItem | None:
         if item := self.cache.get(user_id):
             return item
+        if self.missing.is_missing(user_id):
+            return None
 
-        async with core_db.session() as session:
+        async with core_db.session(commit=False) as session:
             db_user = await UserOps(session).get_by_user_id(user_id)
             if not db_user:
+                self.missing.mark(user_id)
                 return None
 
             self.cache.upsert_user(
@@ -167,5 +214,5 @@ class UserRepository:
             return self.cache.get(user_id)
 
     async def get_name_by_uid(self, user_id: str) -> str | None:
-        async with core_db.session() as session:
+        async with core_db.session(commit=False) as session:
             return await UserOps(session).get_name_by_uid(user_id)
@@ -0,0 +1,119 @@
+"""
+Author: SakuraiCora<1479559098@qq.com>
+Date: 2026-03-03 21:02:16
+LastEditors: SakuraiCora<1479559098@qq.com>
+LastEditTime: 2026-03-03 21:02:16
+Description: SQLite 调优档位基准测试
+
+用法: python -m src.scripts.bench_sqlite [--rows 50000] [--batch 500] [--queries 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from pathlib import Path
+import random
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from src.lib.db.manager import DatabaseManager
+from src.lib.db.profiles import PROFILES, SqliteProfile
+from src.logger import logger
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS bench_message (
+    id INTEGER PRIMARY KEY,
+    group_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    content TEXT NOT NULL
+)
+"""
+_INDEX = (
+    "CREATE INDEX IF NOT EXISTS ix_bench_group_time "
+    "ON bench_message (group_id, created_at)"
+)
+_INSERT = text(
+    "INSERT INTO bench_message (group_id, user_id, created_at, content) "
+    "VALUES (:group_id, :user_id, :created_at, :content)"
+)
+_QUERY = text(
+    "SELECT user_id, COUNT(*) FROM bench_message "
+    "WHERE group_id = :group_id AND created_at BETWEEN :start AND :end "
+    "GROUP BY user_id"
+)
+
+
+def _rows(count: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "group_id": str(rng.randrange(50)),
+            "user_id": str(rng.randrange(5000)),
+            "created_at": 1_767_196_800 + i * 30,
+            "content": "水" * rng.randrange(4, 64),
+        }
+        for i in range(count)
+    ]
+
+
+async def _bench(
+    profile: SqliteProfile,
+    path: Path,
+    rows: list[dict],
+    batch: int,
+    queries: int,
+) -> tuple[float, float]:
+    manager = DatabaseManager()
+    full_path = str(path)
+    async with manager.open(full_path, profile=profile) as sess:
+        await sess.execute(text(_DDL))
+        await sess.execute(text(_INDEX))
+
+    start = time.perf_counter()
+    for i in range(0, len(rows), batch):
+        async with manager.open(full_path) as sess:
+            await sess.execute(_INSERT, rows[i : i + batch])
+    insert_rate = len(rows) / (time.perf_counter() - start)
+
+    rng = random.Random(0)
+    span = rows[-1]["created_at"] - rows[0]["created_at"]
+    start = time.perf_counter()
+    for _ in range(queries):
+        begin = rows[0]["created_at"] + rng.randrange(span)
+        async with manager.open(full_path, commit=False) as sess:
+            await sess.execute(
+                _QUERY,
+                {
+                    "group_id": str(rng.randrange(50)),
+                    "start": begin,
+                    "end": begin + 86400,
+                },
+            )
+    query_rate = queries / (time.perf_counter() - start)
+
+    await manager.dispose(full_path)
+    return insert_rate, query_rate
+
+
+async def main(rows: int, batch: int, queries: int) -> None:
+    data = _rows(rows, seed=42)
+    logger.info(f"rows={rows} batch={batch} queries={queries}")
+    logger.info(f"{'profile':<12}{'insert rows/s':>16}{'query ops/s':>16}")
+    with tempfile.TemporaryDirectory(prefix="bench_sqlite_") as tmp:
+        for name, profile in PROFILES.items():
+            path = Path(tmp) / f"{name}.db"
+            insert_rate, query_rate = await _bench(profile, path, data, batch, queries)
+            logger.info(f"{name:<12}{insert_rate:>16.0f}{query_rate:>16.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite 调优档位基准测试")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.batch, args.queries))
@@ -0,0 +1,54 @@
+"""
+Author: SakuraiCora<1479559098@qq.com>
+Date: 2026-03-08 10:05:37
+LastEditors: SakuraiCora<1479559098@qq.com>
+LastEditTime: 2026-03-08 16:22:51
+Description: 缓存预热与快照
+"""
+
+import asyncio
+import time
+
+from src.logger import logger
+from src.repositories import blacklist_repo, group_repo, member_repo, user_repo
+
+_warm_up_task: asyncio.Task[None] | None = None
+
+
+async def _warm_up_all() -> None:
+    start = time.perf_counter()
+    users, groups, members, bans = await asyncio.gather(
+        user_repo.warm_up(),
+        group_repo.warm_up(),
+        member_repo.warm_up(),
+        blacklist_repo.warm_up(),
+    )
+    logger.success(
+        f"[Cache] 缓存预热完成 ({time.perf_counter() - start:.2f}s): "
+        f"回源用户 {users} / 群组 {groups} / 成员 {members} / 黑名单 {bans}"
+    )
+
+
+async def warm_up_caches() -> None:
+    """并发预热全部缓存，每个进程只执行一次
+
+    用户、群组、成员缓存从快照增量预热；黑名单会物理删除，始终全量载入。
+    重复或并发调用等待同一次预热，预热失败后允许下次调用重试。
+    """
+    global _warm_up_task
+    if _warm_up_task is None:
+        _warm_up_task = asyncio.create_task(_warm_up_all())
+    try:
+        await asyncio.shield(_warm_up_task)
+    except Exception:
+        if _warm_up_task.done():
+            _warm_up_task = None
+        raise
+
+
+async def dump_cache_snapshots() -> int:
+    """写出全部缓存快照，返回总字节数"""
+    total = 0
+    for repo in (user_repo, group_repo, member_repo):
+        total += await repo.dump_snapshot()
+    return total
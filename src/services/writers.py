@@ -2,11 +2,18 @@
 Author: SakuraiCora<1479559098@qq.com>
 Date: 2026-02-12 20:48:16
 LastEditors: SakuraiCora<1479559098@qq.com>
-LastEditTime: 2026-03-02 19:49:22
+LastEditTime: 2026-03-10 15:20:33
 Description: 批量写入逻辑
 注：所有的 update / create 操作均为 **带 log / snapshot** 的操作。
 """
 
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import TYPE_CHECKING, Any
+
 from src.database.core.consts import GroupStatus, Permission
 from src.database.core.ops import GroupOps, MemberOps, UserOps
 from src.database.core.types import (
@@ -34,71 +41,121 @@ from src.database.snapshot.types import (
     MemberSnapshotPayload,
     UserSnapshotPayload,
 )
-from src.lib.db.batch import BatchWriter, execute_batch_write
-
-
-async def _flush_create_user(batch_data: list[UserPayload]) -> None:
+from src.lib.db.batch import (
+    AdaptiveConfig,
+    BatchWriteJob,
+    BatchWriter,
+    OverflowPolicy,
+    WriterGroup,
+    execute_batch_write_jobs,
+)
+from src.logger import logger
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+type _Applier[T] = Callable[[AsyncSession, list[T], _DerivedRows], Awaitable[None]]
+
+
+@dataclass
+class _DerivedRows:
+    """一次核心库落盘衍生出的快照 / 审计数据，统一在核心事务提交后写入分片"""
+
+    user_snapshots: list[UserSnapshotPayload] = field(default_factory=list)
+    group_snapshots: list[GroupSnapshotPayload] = field(default_factory=list)
+    member_snapshots: list[MemberSnapshotPayload] = field(default_factory=list)
+    audit_logs: list[AuditLogPayload] = field(default_factory=list)
+
+    async def write(self) -> None:
+        await execute_batch_write_jobs(
+            snapshot_db,
+            [
+                BatchWriteJob(
+                    self.user_snapshots,
+                    UserSnapshotOps,
+                    UserSnapshotOps.bulk_create_user_snapshots,
+                ),
+                BatchWriteJob(
+                    self.group_snapshots,
+                    GroupSnapshotOps,
+                    GroupSnapshotOps.bulk_create_group_snapshots,
+                ),
+                BatchWriteJob(
+                    self.member_snapshots,
+                    MemberSnapshotOps,
+                    MemberSnapshotOps.bulk_create_member_snapshots,
+                ),
+            ],
+        )
+        await execute_batch_write_jobs(
+            log_db,
+            [
+                BatchWriteJob(
+                    self.audit_logs,
+                    AuditLogOps,
+                    AuditLogOps.bulk_create_audit_logs,
+                ),
+            ],
+        )
+
+
+async def _apply_create_user(
+    session: AsyncSession,
+    batch_data: list[UserPayload],
+    rows: _DerivedRows,
+) -> None:
     unique_data = {item["user_id"]: item for item in batch_data}.values()
     final_data = list(unique_data)
     if not final_data:
         return
 
-    async with core_db.session() as session:
-        await UserOps(session).bulk_upsert_users(final_data)
+    await UserOps(session).bulk_upsert_users(final_data)
 
-    snapshots: list[UserSnapshotPayload] = [
+    rows.user_snapshots.extend(
         {
             "user_id": d["user_id"],
             "content": d["user_name"],
             "created_at": d["updated_at"],
         }
         for d in final_data
-    ]
-    await execute_batch_write(
-        batch=snapshots,
-        db_instance=snapshot_db,
-        ops_class=UserSnapshotOps,
-        method=UserSnapshotOps.bulk_create_user_snapshots,
-        time_field="created_at",
     )
 
 
-async def _flush_update_user_name(batch_data: list[BulkUpdateUserNamePayload]) -> None:
+async def _apply_update_user_name(
+    session: AsyncSession,
+    batch_data: list[BulkUpdateUserNamePayload],
+    rows: _DerivedRows,
+) -> None:
     unique_data = {item["user_id"]: item for item in batch_data}.values()
     final_data = list(unique_data)
     if not final_data:
         return
 
-    async with core_db.session() as session:
-        await UserOps(session).bulk_upsert_names(final_data)
+    await UserOps(session).bulk_upsert_names(final_data)
 
-    snapshots: list[UserSnapshotPayload] = [
+    rows.user_snapshots.extend(
         {
             "user_id": d["user_id"],
             "content": d["user_name"],
             "created_at": d["updated_at"],
         }
         for d in final_data
-    ]
-    await execute_batch_write(
-        batch=snapshots,
-        db_instance=snapshot_db,
-        ops_class=UserSnapshotOps,
-        method=UserSnapshotOps.bulk_create_user_snapshots,
-        time_field="created_at",
     )
 
 
-async def _flush_update_user_perm(batch_data: list[BulkUpdateUserPermPayload]) -> None:
+async def _apply_update_user_perm(
+    session: AsyncSession,
+    batch_data: list[BulkUpdateUserPermPayload],
+    rows: _DerivedRows,
+) -> None:
     unique_data = {item["user_id"]: item for item in batch_data}.values()
     final_data = list(unique_data)
     if not final_data:
         return
 
-    async with core_db.session() as session:
-        await UserOps(session).bulk_update_permissions(final_data)
+    await UserOps(session).bulk_update_permissions(final_data)
 
-    audit_logs: list[AuditLogPayload] = [
+    rows.audit_logs.extend(
         {
             "target_id": d["user_id"],
             "context_type": AuditContext.USER,
@@ -107,82 +164,66 @@ async def _flush_update_user_perm(batch_data: list[BulkUpdateUserPermPayload]) -
             "created_at": d["updated_at"],
         }
         for d in final_data
-    ]
-    await execute_batch_write(
-        batch=audit_logs,
-        db_instance=log_db,
-        ops_class=AuditLogOps,
-        method=AuditLogOps.bulk_create_audit_logs,
-        time_field="created_at",
     )
 
 
-async def _flush_create_group(batch_data: list[GroupPayload]) -> None:
+async def _apply_create_group(
+    session: AsyncSession,
+    batch_data: list[GroupPayload],
+    rows: _DerivedRows,
+) -> None:
     unique_data = {item["group_id"]: item for item in batch_data}.values()
     final_data = list(unique_data)
     if not final_data:
         return
 
-    async with core_db.session() as session:
-        await GroupOps(session).bulk_upsert_groups(final_data)
+    await GroupOps(session).bulk_upsert_groups(final_data)
 
-    snapshots: list[GroupSnapshotPayload] = [
+    rows.group_snapshots.extend(
         {
             "group_id": d["group_id"],
             "content": d["group_name"],
             "created_at": d["updated_at"],
         }
         for d in final_data
-    ]
-    await execute_batch_write(
-        batch=snapshots,
-        db_instance=snapshot_db,
-        ops_class=GroupSnapshotOps,
-        method=GroupSnapshotOps.bulk_create_group_snapshots,
-        time_field="created_at",
     )
 
 
-async def _flush_update_group_name(
+async def _apply_update_group_name(
+    session: AsyncSession,
     batch_data: list[BulkUpdateGroupNamePayload],
+    rows: _DerivedRows,
 ) -> None:
     unique_data = {item["group_id"]: item for item in batch_data}.values()
     final_data = list(unique_data)
     if not final_data:
         return
 
-    async with core_db.session() as session:
-        await GroupOps(session).bulk_upsert_names(final_data)
+    await GroupOps(session).bulk_upsert_names(final_data)
 
-    snapshots: list[GroupSnapshotPayload] = [
+    rows.group_snapshots.extend(
         {
             "group_id": d["group_id"],
             "content": d["group_name"],
             "created_at": d["updated_at"],
         }
         for d in final_data
-    ]
-    await execute_batch_write(
-        batch=snapshots,
-        db_instance=snapshot_db,
-        ops_class=GroupSnapshotOps,
-        method=GroupSnapshotOps.bulk_create_group_snapshots,
-        time_field="created_at",
     )
 
 
-async def _flush_update_group_status(
+async def _apply_update_group_status(
+    session: AsyncSession,
     batch_data: list[BulkUpdateGroupStatusPayload],
+    rows: _DerivedRows,
 ) -> None:
     unique_data = {item["group_id"]: item for item in batch_data}.values()
     final_data = list(unique_data)
     if not final_data:
         return
 
-    async with core_db.session() as session:
-        await GroupOps(session).bulk_update_statuses(final_data)
+    await GroupOps(session).bulk_update_statuses(final_data)
 
-    audit_logs: list[AuditLogPayload] = [
+    rows.audit_logs.extend(
         {
             "target_id": d["group_id"],
             "context_type": AuditContext.GROUP,
@@ -192,51 +233,55 @@ async def _flush_update_group_status(
             "created_at": d["updated_at"],
         }
         for d in final_data
-    ]
-    await execute_batch_write(
-        batch=audit_logs,
-        db_instance=log_db,
-        ops_class=AuditLogOps,
-        method=AuditLogOps.bulk_create_audit_logs,
-        time_field="created_at",
     )
 
 
-async def _flush_create_member(batch_data: list[MemberPayload]) -> None:
-    unique_data = {
-        (item["group_id"], item["user_id"]): item for item in batch_data
-    }.values()
-    members_data: list[MemberPayload] = list(unique_data)
+def _latest_per_member[T: Mapping[str, Any]](batch_data: list[T]) -> list[T]:
+    """按 `(group_id, user_id)` 去重，同一成员只保留最后一条
+
+    成员数据必须按群与用户联合去重：仅按 `group_id` 去重会让同一批次中同群的多个成员
+    只剩最后一个，其余成员的名片 / 权限变更被静默丢弃。
+    """
+    return list(
+        {(item["group_id"], item["user_id"]): item for item in batch_data}.values()
+    )
+
+
+async def _apply_create_member(
+    session: AsyncSession,
+    batch_data: list[MemberPayload],
+    rows: _DerivedRows,
+) -> None:
+    members_data = _latest_per_member(batch_data)
     if not members_data:
         return
 
-    async with core_db.session() as session:
-        users_data: list[UserPayload] = [
-            {
-                "user_id": item["user_id"],
-                "user_name": "",
-                "permission": Permission.NORMAL,
-                "remark": None,
-                "created_at": item["updated_at"],
-                "updated_at": item["updated_at"],
-            }
-            for item in members_data
-        ]
-        groups_data: list[GroupPayload] = [
-            {
-                "group_id": item["group_id"],
-                "group_name": "",
-                "status": GroupStatus.UNAUTHORIZED,
-                "created_at": item["updated_at"],
-                "updated_at": item["updated_at"],
-            }
-            for item in members_data
-        ]
-        await UserOps(session).bulk_insert_ignore(users_data)
-        await GroupOps(session).bulk_insert_ignore(groups_data)
-        await MemberOps(session).bulk_upsert_members(members_data)
-
-    snapshots: list[MemberSnapshotPayload] = [
+    users_data: list[UserPayload] = [
+        {
+            "user_id": item["user_id"],
+            "user_name": "",
+            "permission": Permission.NORMAL,
+            "remark": None,
+            "created_at": item["updated_at"],
+            "updated_at": item["updated_at"],
+        }
+        for item in members_data
+    ]
+    groups_data: list[GroupPayload] = [
+        {
+            "group_id": item["group_id"],
+            "group_name": "",
+            "status": GroupStatus.UNAUTHORIZED,
+            "created_at": item["updated_at"],
+            "updated_at": item["updated_at"],
+        }
+        for item in members_data
+    ]
+    await UserOps(session).bulk_insert_ignore(users_data)
+    await GroupOps(session).bulk_insert_ignore(groups_data)
+    await MemberOps(session).bulk_upsert_members(members_data)
+
+    rows.member_snapshots.extend(
         {
             "user_id": d["user_id"],
             "group_id": d["group_id"],
@@ -244,28 +289,21 @@ async def _flush_create_member(batch_data: list[MemberPayload]) -> None:
             "created_at": d["updated_at"],
         }
         for d in members_data
-    ]
-    await execute_batch_write(
-        batch=snapshots,
-        db_instance=snapshot_db,
-        ops_class=MemberSnapshotOps,
-        method=MemberSnapshotOps.bulk_create_member_snapshots,
-        time_field="created_at",
     )
 
 
-async def _flush_update_group_card(
+async def _apply_update_group_card(
+    session: AsyncSession,
     batch_data: list[BulkUpdateMemberCardPayload],
+    rows: _DerivedRows,
 ) -> None:
-    unique_data = {item["group_id"]: item for item in batch_data}.values()
-    final_data = list(unique_data)
+    final_data = _latest_per_member(batch_data)
     if not final_data:
         return
 
-    async with core_db.session() as session:
-        await MemberOps(session).bulk_upsert_cards(final_data)
+    await MemberOps(session).bulk_upsert_cards(final_data)
 
-    snapshots: list[MemberSnapshotPayload] = [
+    rows.member_snapshots.extend(
         {
             "user_id": d["user_id"],
             "group_id": d["group_id"],
@@ -273,28 +311,21 @@ async def _flush_update_group_card(
             "created_at": d["updated_at"],
         }
         for d in final_data
-    ]
-    await execute_batch_write(
-        batch=snapshots,
-        db_instance=snapshot_db,
-        ops_class=MemberSnapshotOps,
-        method=MemberSnapshotOps.bulk_create_member_snapshots,
-        time_field="created_at",
     )
 
 
-async def _flush_update_member_permission(
+async def _apply_update_member_permission(
+    session: AsyncSession,
     batch_data: list[BulkUpdateMemberPermPayload],
+    rows: _DerivedRows,
 ) -> None:
-    unique_data = {item["group_id"]: item for item in batch_data}.values()
-    final_data = list(unique_data)
+    final_data = _latest_per_member(batch_data)
     if not final_data:
         return
 
-    async with core_db.session() as session:
-        await MemberOps(session).bulk_update_permissions(final_data)
+    await MemberOps(session).bulk_update_permissions(final_data)
 
-    audit_logs: list[AuditLogPayload] = [
+    rows.audit_logs.extend(
         {
             "target_id": d["user_id"],
             "context_type": AuditContext.GROUP,
@@ -304,60 +335,161 @@ async def _flush_update_member_permission(
             "created_at": d["updated_at"],
         }
         for d in final_data
-    ]
-    await execute_batch_write(
-        batch=audit_logs,
-        db_instance=log_db,
-        ops_class=AuditLogOps,
-        method=AuditLogOps.bulk_create_audit_logs,
-        time_field="created_at",
     )
 
 
+def _standalone[T](apply: _Applier[T]) -> Callable[[list[T]], Awaitable[None]]:
+    """脱离协同模式时的单写入器落盘：独立的核心事务 + 衍生数据"""
+
+    async def _flush(batch_data: list[T]) -> None:
+        rows = _DerivedRows()
+        async with core_db.session() as session:
+            await apply(session, batch_data, rows)
+        await rows.write()
+
+    _flush.__name__ = apply.__name__.replace("_apply", "_flush", 1)
+    return _flush
+
+
+async def _flush_core(batches: list[tuple[BatchWriter[Any], list[Any]]]) -> None:
+    """协同落盘：全部核心写入共用一个事务，衍生数据每个目标分片各一个事务。
+
+    每个写入器的批次包在独立的 SAVEPOINT 中，单个批次失败只回滚自身，不拖垮同一事务内的其他写入。
+    """  # noqa: E501
+    rows = _DerivedRows()
+    async with core_db.session() as session:
+        for writer, batch_data in batches:
+            try:
+                async with session.begin_nested():
+                    await _CORE_APPLIERS[writer](session, batch_data, rows)
+            except Exception as e:
+                logger.error(f"[{writer.name}] 协同落盘时发生错误: {e}")
+    await rows.write()
+
+
+CORE_WRITER_MAX_SIZE = 5000
+CORE_WRITER_ADAPTIVE = AdaptiveConfig(
+    min_batch_size=50,
+    max_batch_size=1000,
+    min_interval=1.0,
+    max_interval=15.0,
+)
+CORE_WRITER_JOURNAL = True
+COORDINATED_CORE_FLUSH = True
+
+core_writer_group = WriterGroup(flush_callback=_flush_core, name="core")
+_core_group = core_writer_group if COORDINATED_CORE_FLUSH else None
+
 user_create_writer = BatchWriter[UserPayload](
-    flush_callback=_flush_create_user,
+    flush_callback=_standalone(_apply_create_user),
     batch_size=50,
     flush_interval=3.0,
+    max_size=CORE_WRITER_MAX_SIZE,
+    overflow=OverflowPolicy.COALESCE,
+    key_func=itemgetter("user_id"),
+    adaptive=CORE_WRITER_ADAPTIVE,
+    group=_core_group,
+    journal=CORE_WRITER_JOURNAL,
 )
 user_update_name_writer = BatchWriter[BulkUpdateUserNamePayload](
-    flush_callback=_flush_update_user_name,
+    flush_callback=_standalone(_apply_update_user_name),
     batch_size=50,
     flush_interval=3.0,
+    max_size=CORE_WRITER_MAX_SIZE,
+    overflow=OverflowPolicy.COALESCE,
+    key_func=itemgetter("user_id"),
+    adaptive=CORE_WRITER_ADAPTIVE,
+    group=_core_group,
+    journal=CORE_WRITER_JOURNAL,
 )
 user_update_perm_writer = BatchWriter[BulkUpdateUserPermPayload](
-    flush_callback=_flush_update_user_perm,
+    flush_callback=_standalone(_apply_update_user_perm),
     batch_size=50,
     flush_interval=3.0,
+    max_size=CORE_WRITER_MAX_SIZE,
+    overflow=OverflowPolicy.COALESCE,
+    key_func=itemgetter("user_id"),
+    adaptive=CORE_WRITER_ADAPTIVE,
+    group=_core_group,
+    journal=CORE_WRITER_JOURNAL,
 )
 
 group_create_writer = BatchWriter[GroupPayload](
-    flush_callback=_flush_create_group,
+    flush_callback=_standalone(_apply_create_group),
     batch_size=50,
     flush_interval=3.0,
+    max_size=CORE_WRITER_MAX_SIZE,
+    overflow=OverflowPolicy.COALESCE,
+    key_func=itemgetter("group_id"),
+    adaptive=CORE_WRITER_ADAPTIVE,
+    group=_core_group,
+    journal=CORE_WRITER_JOURNAL,
 )
 group_update_name_writer = BatchWriter[BulkUpdateGroupNamePayload](
-    flush_callback=_flush_update_group_name,
+    flush_callback=_standalone(_apply_update_group_name),
     batch_size=50,
     flush_interval=3.0,
+    max_size=CORE_WRITER_MAX_SIZE,
+    overflow=OverflowPolicy.COALESCE,
+    key_func=itemgetter("group_id"),
+    adaptive=CORE_WRITER_ADAPTIVE,
+    group=_core_group,
+    journal=CORE_WRITER_JOURNAL,
 )
 group_update_status_writer = BatchWriter[BulkUpdateGroupStatusPayload](
-    flush_callback=_flush_update_group_status,
+    flush_callback=_standalone(_apply_update_group_status),
     batch_size=50,
     flush_interval=3.0,
+    max_size=CORE_WRITER_MAX_SIZE,
+    overflow=OverflowPolicy.COALESCE,
+    key_func=itemgetter("group_id"),
+    adaptive=CORE_WRITER_ADAPTIVE,
+    group=_core_group,
+    journal=CORE_WRITER_JOURNAL,
 )
 
 member_create_writer = BatchWriter[MemberPayload](
-    flush_callback=_flush_create_member,
+    flush_callback=_standalone(_apply_create_member),
     batch_size=50,
     flush_interval=3.0,
+    max_size=CORE_WRITER_MAX_SIZE,
+    overflow=OverflowPolicy.COALESCE,
+    key_func=itemgetter("group_id", "user_id"),
+    adaptive=CORE_WRITER_ADAPTIVE,
+    group=_core_group,
+    journal=CORE_WRITER_JOURNAL,
 )
 member_update_card_writer = BatchWriter[BulkUpdateMemberCardPayload](
-    flush_callback=_flush_update_group_card,
+    flush_callback=_standalone(_apply_update_group_card),
     batch_size=50,
     flush_interval=3.0,
+    max_size=CORE_WRITER_MAX_SIZE,
+    overflow=OverflowPolicy.COALESCE,
+    key_func=itemgetter("group_id", "user_id"),
+    adaptive=CORE_WRITER_ADAPTIVE,
+    group=_core_group,
+    journal=CORE_WRITER_JOURNAL,
 )
 member_update_perm_writer = BatchWriter[BulkUpdateMemberPermPayload](
-    flush_callback=_flush_update_member_permission,
+    flush_callback=_standalone(_apply_update_member_permission),
     batch_size=50,
     flush_interval=3.0,
+    max_size=CORE_WRITER_MAX_SIZE,
+    overflow=OverflowPolicy.COALESCE,
+    key_func=itemgetter("group_id", "user_id"),
+    adaptive=CORE_WRITER_ADAPTIVE,
+    group=_core_group,
+    journal=CORE_WRITER_JOURNAL,
 )
+
+_CORE_APPLIERS: dict[BatchWriter[Any], _Applier[Any]] = {
+    user_create_writer: _apply_create_user,
+    user_update_name_writer: _apply_update_user_name,
+    user_update_perm_writer: _apply_update_user_perm,
+    group_create_writer: _apply_create_group,
+    group_update_name_writer: _apply_update_group_name,
+    group_update_status_writer: _apply_update_group_status,
+    member_create_writer: _apply_create_member,
+    member_update_card_writer: _apply_update_group_card,
+    member_update_perm_writer: _apply_update_member_permission,
+}
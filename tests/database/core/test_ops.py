@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import pytest
+
+from src.database.core.consts import Permission
+from src.database.core.ops import MemberOps
+from src.database.core.tables import CoreBase, Group, Member, User
+from src.lib.db.manager import DatabaseManager
+
+
+@pytest.mark.asyncio
+async def test_member_cache_rows_stream_recent_rows_oldest_first(
+    tmp_path: Path,
+) -> None:
+    manager = DatabaseManager()
+    path = str(tmp_path / "core.db")
+    async with manager.open(path) as session:
+        await session.run_sync(lambda s: CoreBase.metadata.create_all(s.connection()))
+        session.add(Group(group_id="g", group_name="", created_at=0, updated_at=0))
+        session.add_all(
+            User(user_id=str(i), user_name="", created_at=0, updated_at=0)
+            for i in range(5)
+        )
+        session.add_all(
+            Member(
+                group_id="g",
+                user_id=str(i),
+                group_card=f"c{i}",
+                permission=Permission.NORMAL,
+                created_at=0,
+                updated_at=100 - i * 10,
+            )
+            for i in range(5)
+        )
+
+    async with manager.open(path, commit=False) as session:
+        ops = MemberOps(session)
+        chunks = [rows async for rows in ops.stream_cache_rows(limit=3, chunk_size=2)]
+        recent = [rows async for rows in ops.stream_cache_rows(since=90)]
+
+    assert [len(rows) for rows in chunks] == [2, 1]
+    assert [tuple(row) for rows in chunks for row in rows] == [
+        ("2", "g", "c2", Permission.NORMAL),
+        ("1", "g", "c1", Permission.NORMAL),
+        ("0", "g", "c0", Permission.NORMAL),
+    ]
+    assert [row.user_id for rows in recent for row in rows] == ["1", "0"]
+    await manager.dispose(path)
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from src.database.core.consts import GroupStatus, Permission
+from src.lib.cache.impl import GroupCache, MemberCache, UserCache
+
+
+def test_bounded_cache_evicts_least_recently_used() -> None:
+    cache = MemberCache(max_size=2)
+    cache.upsert_member("u1", "g1", group_card="a")
+    cache.upsert_member("u2", "g2", group_card="b")
+    assert cache.get_member("u1", "g1") is not None
+
+    cache.upsert_member("u3", "g3", group_card="c")
+
+    assert cache.get_member("u2", "g2") is None
+    assert cache.get_member("u1", "g1") is not None
+    assert cache.count() == 2
+    stats = cache.stats()
+    assert (stats.size, stats.hits, stats.misses, stats.evictions) == (2, 2, 1, 1)
+    assert stats.hit_rate == pytest.approx(2 / 3)
+
+
+def test_pinned_entries_survive_eviction() -> None:
+    cache = UserCache(max_size=2)
+    cache.upsert_user("root", "admin", Permission.SUPERUSER)
+    for uid in ("a", "b", "c"):
+        cache.upsert_user(uid, uid)
+
+    assert cache.exists("root")
+    assert sorted(cache.get_storage()) == ["b", "c", "root"]
+    assert cache.stats().pinned == 1
+
+    cache.upsert_user("root", permission=Permission.NORMAL)
+    cache.upsert_user("d", "d")
+    cache.upsert_user("e", "e")
+    assert sorted(cache.get_storage()) == ["d", "e"]
+
+
+def test_authorized_groups_are_pinned() -> None:
+    cache = GroupCache(max_size=1)
+    cache.upsert_group("g1", "one", GroupStatus.AUTHORIZED)
+    cache.upsert_group("g2", "two")
+    cache.upsert_group("g3", "three")
+
+    assert cache.is_pinned("g1")
+    assert sorted(cache.get_storage()) == ["g1", "g3"]
+
+    cache.set_group_status("g1", GroupStatus.LEFT)
+    assert not cache.is_pinned("g1")
+    assert sorted(cache.get_storage()) == ["g1"]
+
+
+def test_ttl_expires_unpinned_entries(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 1000.0
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    cache = MemberCache(ttl=60)
+    cache.upsert_member("u1", "g1")
+    cache.upsert_member("u2", "g2")
+    cache.pin("g2")
+
+    now += 61
+    assert cache.get_member("u1", "g1") is None
+    assert cache.get_member("u2", "g2") is not None
+    assert cache.evict_expired() == 0
+    assert cache.stats().evictions == 1
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from src.database.core.consts import Permission
+from src.lib.cache.field import MemberCacheItem, fingerprint
+from src.lib.cache.impl import MemberCache, NegativeCache
+
+
+def test_member_cache_nests_members_by_group() -> None:
+    cache = MemberCache()
+    cache.upsert_member("10001", "20002", Permission.GROUP_ADMIN, "card")
+    cache.upsert_member("1_0", "g", group_card="x")
+    cache.upsert_member("10", "g", Permission.NONE)
+
+    assert list(cache.get_storage()) == ["20002", "g"]
+    assert cache.count() == 3
+    member = cache.get_member("10001", "20002")
+    assert member is not None
+    assert member.card_hash == fingerprint("card")
+    assert member.permission is Permission.GROUP_ADMIN
+    assert cache.get_member("20002", "10001") is None
+    assert cache.get_member("1_0", "g") != cache.get_member("10", "g")
+    assert cache.get_member(" 10", "g") is None
+
+    cache.upsert_member("10001", "20002", group_card="renamed")
+    member = cache.get_member("10001", "20002")
+    assert member is not None
+    assert member.card_hash == fingerprint("renamed")
+    assert member.permission is Permission.GROUP_ADMIN
+    assert MemberCacheItem.pack(0, Permission.NONE)
+
+
+def test_member_cache_evicts_whole_groups() -> None:
+    cache = MemberCache(max_size=3)
+    cache.put_member("1", "g1", 1, Permission.NORMAL)
+    cache.put_member("2", "g1", 2, Permission.NORMAL)
+    cache.put_member("3", "g2", 3, Permission.GROUP_OWNER)
+    cache.put_member("4", "g3", 4, Permission.NORMAL)
+
+    assert list(cache.get_storage()) == ["g2", "g3"]
+    assert (cache.count(), cache.stats().evictions) == (2, 2)
+    assert cache.get_member("3", "g2") == MemberCacheItem.pack(
+        3, Permission.GROUP_OWNER
+    )
+
+    cache.delete_member("4", "g3")
+    assert list(cache.get_storage()) == ["g2"]
+    assert cache.count() == 1
+
+
+def test_negative_cache_expires_and_forgets(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 0.0
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    missing = NegativeCache(ttl=30)
+    missing.mark("g", "u")
+    missing.mark("h", "u")
+
+    assert missing.is_missing("g", "u")
+    assert not missing.is_missing("u", "g")
+    missing.forget("g", "u")
+    assert not missing.is_missing("g", "u")
+
+    now += 31
+    assert not missing.is_missing("h", "u")
+    stats = missing.stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 3, 0)
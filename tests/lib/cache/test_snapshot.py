@@ -0,0 +1,83 @@
+from pathlib import Path
+
+import pytest
+
+from src.database.core.consts import GroupStatus, Permission
+from src.lib.cache.field import MemberCacheItem, fingerprint
+from src.lib.cache.impl import GroupCache, MemberCache, UserCache
+from src.lib.cache.snapshot import (
+    SnapshotError,
+    decode_snapshot,
+    encode_snapshot,
+    read_snapshot,
+    write_snapshot,
+)
+
+
+def _names(directory: Path) -> list[str]:
+    return sorted(p.name for p in directory.iterdir())
+
+
+def test_fingerprint_is_stable_across_processes() -> None:
+    assert fingerprint("") == -5426141060434712860
+    assert fingerprint("樱井千凛") != fingerprint("樱井千鈴")
+
+
+@pytest.mark.asyncio
+async def test_snapshot_roundtrip_keeps_items_order_and_pins(tmp_path: Path) -> None:
+    users = UserCache(max_size=2)
+    users.upsert_user("1", "root", Permission.SUPERUSER)
+    users.upsert_user("2", "a")
+    users.upsert_user("3", "b")
+    users.get("2")
+    groups = GroupCache()
+    groups.upsert_group("10", "授权群", GroupStatus.AUTHORIZED)
+    groups.set_plugin_state("10", "water", enabled=False)
+    groups.upsert_group("11", "禁言群", GroupStatus.AUTHORIZED, is_all_shut=True)
+    members = MemberCache()
+    members.upsert_member("2", "10", Permission.GROUP_OWNER, "群主")
+    members.upsert_member("x", "10", group_card="")
+
+    for cache, name in ((users, "user"), (groups, "group"), (members, "member")):
+        assert await write_snapshot(cache, tmp_path / f"{name}.snap", 1234) > 0
+
+    users_back, groups_back, members_back = UserCache(2), GroupCache(), MemberCache()
+    assert await read_snapshot(users_back, tmp_path / "user.snap") == 1234
+    assert await read_snapshot(groups_back, tmp_path / "group.snap") == 1234
+    assert await read_snapshot(members_back, tmp_path / "member.snap") == 1234
+
+    assert list(users_back.get_storage()) == ["3", "2", "1"]
+    assert users_back.is_pinned("1")
+    assert users_back.get("2") == users.get("2")
+    assert groups_back.get("10") == groups.get("10")
+    muted = groups_back.get("11")
+    assert muted is not None
+    assert not muted.is_all_shut
+    assert members_back.get_member("2", "10") == MemberCacheItem.pack(
+        fingerprint("群主"),
+        Permission.GROUP_OWNER,
+    )
+    assert members_back.get_member("x", "10") == members.get_member("x", "10")
+    assert _names(tmp_path) == [
+        "group.snap",
+        "member.snap",
+        "user.snap",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_damaged_snapshot_falls_back_to_full_warm_up(tmp_path: Path) -> None:
+    cache = UserCache()
+    cache.upsert_user("1", "a")
+    payload = encode_snapshot(cache, 99)
+
+    with pytest.raises(SnapshotError):
+        decode_snapshot(UserCache(), b"XXXX" + payload[4:])
+
+    path = tmp_path / "user.snap"
+    path.write_bytes(payload[:-1])
+    restored = UserCache()
+    restored.upsert_user("stale", "s")
+    assert await read_snapshot(restored, path) is None
+    assert restored.count() == 0
+    assert await read_snapshot(restored, tmp_path / "missing.snap") is None
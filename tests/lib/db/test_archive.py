@@ -0,0 +1,250 @@
+import lzma
+from pathlib import Path
+import sqlite3
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.lib.db import connectors
+from src.lib.db.archive import (
+    ArchiveError,
+    ArchiveFormat,
+    LzmaCodec,
+    codec_for,
+    compact,
+    pack,
+    snapshot,
+    thaw,
+    unpack,
+)
+from src.lib.db.connectors import ShardedDB
+from src.lib.db.manager import db_manager
+from src.lib.db.scratch import ScratchCache
+from src.lib.utils.calendar import local_calendar
+
+
+def _wal_db(path: Path, rows: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+    conn.execute("CREATE TABLE t (v INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", ((i,) for i in range(rows)))
+    conn.commit()
+    return conn
+
+
+def _count(path: Path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_snapshot_includes_uncheckpointed_wal(tmp_path: Path) -> None:
+    db_path = tmp_path / "live.db"
+    conn = _wal_db(db_path, 100)
+    try:
+        snapshot(db_path, tmp_path / "snap.db")
+    finally:
+        conn.close()
+
+    assert _count(tmp_path / "snap.db") == 100
+    assert not (tmp_path / "snap.db-wal").exists()
+
+
+def test_pack_unpack_roundtrip(tmp_path: Path) -> None:
+    db_path = tmp_path / "log.db"
+    _wal_db(db_path, 5000).close()
+
+    raw, packed = pack(LzmaCodec(preset=1), db_path, tmp_path / "log.xz")
+    unpack(tmp_path / "log.xz", tmp_path / "restored.db")
+
+    assert packed < raw
+    assert _count(tmp_path / "restored.db") == 5000
+    assert db_path.exists()
+    assert sorted(p.name for p in tmp_path.glob("*.tmp")) == []
+
+
+def test_corrupt_archive_leaves_no_partial_output(tmp_path: Path) -> None:
+    archive = tmp_path / "broken.xz"
+    archive.write_bytes(b"not an xz stream")
+
+    with pytest.raises(lzma.LZMAError):
+        unpack(archive, tmp_path / "out.db")
+    assert list(tmp_path.iterdir()) == [archive]
+
+    with pytest.raises(ArchiveError):
+        codec_for(tmp_path / "unknown.rar")
+
+
+@pytest.mark.asyncio
+async def test_archiver_compresses_cold_shards_in_process(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    cache = ScratchCache(root=Path("data/scratch"))
+    monkeypatch.setattr(connectors, "scratch_cache", cache)
+    db = ShardedDB(namespace="archive_test", prefix="log", fmt="%Y%m")
+    db.codec = LzmaCodec(preset=1)
+    months = [local_calendar.date_bounds(d)[0] for d in (20250115, 20250215, 20250315)]
+    for ts in months:
+        async with db.session(time_ctx=ts) as session:
+            await session.execute(text("CREATE TABLE t (v INTEGER)"))
+            await session.execute(text("INSERT INTO t VALUES (:v)"), {"v": ts})
+    _, stale = db._get_file_paths("202501")
+    stale.with_suffix(".7z").write_bytes(b"legacy")
+
+    assert await db.run_archiver_task(max_concurrency=2) == 3
+
+    assert sorted(p.name for p in db.base_dir.iterdir() if p.suffix != ".json") == [
+        "log_202501.xz",
+        "log_202502.xz",
+        "log_202503.xz",
+    ]
+    assert all(entry.archived for entry in db.catalog.entries())
+    for ts in months:
+        async with db.session(commit=False, time_ctx=ts) as session:
+            assert (await session.execute(text("SELECT v FROM t"))).scalar_one() == ts
+    assert await cache.evict_expired(now=float("inf")) == 3
+
+
+@pytest.mark.asyncio
+async def test_reads_never_unarchive_into_the_data_dir(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    cache = ScratchCache(root=Path("data/scratch"))
+    monkeypatch.setattr(connectors, "scratch_cache", cache)
+    db = ShardedDB(namespace="read_only_test", prefix="log", fmt="%Y%m")
+    db.codec = LzmaCodec(preset=1)
+    ts = local_calendar.date_bounds(20250115)[0]
+    for month in (ts, None):
+        async with db.session(time_ctx=month) as session:
+            await session.execute(text("CREATE TABLE t (v INTEGER)"))
+    assert await db.run_archiver_task() == 1
+
+    async def _fail(archive_path: Path, target: Path) -> bool:
+        _ = archive_path, target
+        return False
+
+    monkeypatch.setattr(db, "_extract", _fail)
+    monkeypatch.setattr(db, "_ensure_schema", None)
+    async with db.session(commit=False, time_ctx=ts) as session:
+        assert (await session.execute(text("SELECT 1"))).scalar_one() == 1
+
+    async with db.session(commit=False) as session:
+        assert (await session.execute(text("SELECT COUNT(*) FROM t"))).scalar_one() == 0
+
+    assert [p.name for p in db.base_dir.glob("*.db")] == [
+        db._get_file_paths(db._active_keys()[0])[0].name
+    ]
+    assert not db.catalog.get("202501").dirty  # type: ignore[union-attr]
+
+
+_USER_RANGE_SQL = "SELECT COUNT(*) FROM audit WHERE user_id = '5' AND created_at < 1000"
+
+
+def _audit_db(path: Path, rows: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE audit (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id VARCHAR(64) NOT NULL,
+            created_at INTEGER NOT NULL
+        );
+        CREATE INDEX idx_audit_time ON audit (created_at);
+        CREATE INDEX idx_audit_user ON audit (user_id, created_at);
+        """
+    )
+    conn.executemany(
+        "INSERT INTO audit (user_id, created_at) VALUES (?, ?)",
+        ((str(i % 97), (i * 7919) % rows) for i in range(rows)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_compact_clusters_by_time_and_thaws_back(tmp_path: Path) -> None:
+    db_path = tmp_path / "log.db"
+    _audit_db(db_path, 20000)
+
+    raw, packed = compact(db_path, tmp_path / "log.cdb", "created_at")
+
+    assert packed < raw
+    conn = sqlite3.connect(f"{(tmp_path / 'log.cdb').as_uri()}?immutable=1", uri=True)
+    try:
+        schema = dict(
+            conn.execute("SELECT name, sql FROM sqlite_master WHERE sql IS NOT NULL")
+        )
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM audit WHERE created_at < 10"
+        ).fetchone()[-1]
+        hits = conn.execute(_USER_RANGE_SQL).fetchone()[0]
+    finally:
+        conn.close()
+    assert schema["audit"].endswith("WITHOUT ROWID")
+    assert "idx_audit_time" not in schema
+    assert "idx_audit_user" in schema
+    assert "USING PRIMARY KEY" in plan
+    source = sqlite3.connect(db_path)
+    try:
+        assert hits == source.execute(_USER_RANGE_SQL).fetchone()[0]
+    finally:
+        source.close()
+
+    thaw(tmp_path / "log.cdb", tmp_path / "thawed.db")
+    conn = sqlite3.connect(tmp_path / "thawed.db")
+    try:
+        conn.execute("INSERT INTO audit (user_id, created_at) VALUES ('x', 1)")
+        new_id = conn.execute("SELECT MAX(id) FROM audit").fetchone()[0]
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(audit)")}
+    finally:
+        conn.close()
+    assert new_id == 20001
+    assert indexes == {"idx_audit_time", "idx_audit_user"}
+
+
+@pytest.mark.asyncio
+async def test_compact_archives_are_queried_in_place(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    cache = ScratchCache(root=Path("data/scratch"))
+    monkeypatch.setattr(connectors, "scratch_cache", cache)
+    db = ShardedDB(
+        namespace="compact_test",
+        prefix="log",
+        fmt="%Y%m",
+        archive_format=ArchiveFormat.COMPACT,
+    )
+    ts, _ = local_calendar.date_bounds(20250115)
+    async with db.session(time_ctx=ts) as session:
+        await session.execute(
+            text("CREATE TABLE t (id INTEGER PRIMARY KEY, created_at INTEGER)")
+        )
+        await session.execute(text("INSERT INTO t VALUES (1, :v)"), {"v": ts})
+
+    assert await db.run_archiver_task() == 1
+    db_path, archive_path = db._get_file_paths("202501")
+    assert archive_path.name == "log_202501.cdb"
+    assert not db_path.exists()
+
+    assert await db.map_reduce(ts, ts, _sum_created_at) == [ts]
+    assert cache.stats().files == 0
+
+    async with db.session(time_ctx=ts) as session:
+        await session.execute(text("INSERT INTO t (created_at) VALUES (1)"))
+    assert db_path.exists()
+    assert await db.map_reduce(ts, ts, _sum_created_at) == [ts + 1]
+    await db_manager.dispose(str(db_path))
+    await db_manager.dispose(str(archive_path))
+
+
+async def _sum_created_at(session: AsyncSession) -> int:
+    return (await session.execute(text("SELECT SUM(created_at) FROM t"))).scalar_one()
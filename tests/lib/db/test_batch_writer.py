@@ -0,0 +1,442 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from operator import itemgetter
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from src.lib.db.batch import (
+    AdaptiveConfig,
+    BatchWriteJob,
+    BatchWriter,
+    FlushScheduler,
+    OverflowPolicy,
+    WriterGroup,
+    execute_batch_write_jobs,
+)
+from src.lib.utils.calendar import local_calendar
+
+
+class _NullScheduler(FlushScheduler):
+    """只登记不调度，用于直接观察缓冲区行为。"""
+
+    def schedule(self, writer: BatchWriter, deadline: float) -> None:
+        _ = (writer, deadline)
+
+    def wake(self, writer: BatchWriter) -> None:
+        _ = writer
+
+
+class _Sink:
+    def __init__(self) -> None:
+        self.batches: list[list[dict]] = []
+
+    async def __call__(self, batch: list[dict]) -> None:
+        self.batches.append(list(batch))
+
+
+def _writer(sink: _Sink, tmp_path: Path, **kwargs: object) -> BatchWriter[dict]:
+    kwargs.setdefault("name", "test_writer")
+    writer = BatchWriter[dict](
+        flush_callback=sink,
+        batch_size=100,
+        flush_interval=3600,
+        spill_dir=tmp_path,
+        scheduler=_NullScheduler(),
+        **kwargs,  # type: ignore[arg-type]
+    )
+    writer._spill_recovered = True
+    return writer
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_keeps_newest_items(tmp_path: Path) -> None:
+    writer = _writer(_Sink(), tmp_path, max_size=3, overflow=OverflowPolicy.DROP_OLDEST)
+
+    for i in range(5):
+        await writer._put({"id": i})
+
+    assert [item["id"] for item in writer._drain(10)] == [2, 3, 4]
+    assert writer.stats.dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_coalesce_replaces_items_with_same_key(tmp_path: Path) -> None:
+    writer = _writer(
+        _Sink(),
+        tmp_path,
+        max_size=2,
+        overflow=OverflowPolicy.COALESCE,
+        key_func=itemgetter("user_id"),
+    )
+
+    await writer._put({"user_id": "1", "name": "a"})
+    await writer._put({"user_id": "2", "name": "b"})
+    await writer._put({"user_id": "1", "name": "c"})
+
+    assert writer._drain(10) == [
+        {"user_id": "1", "name": "c"},
+        {"user_id": "2", "name": "b"},
+    ]
+    assert writer.stats.coalesced == 1
+
+
+def test_coalesce_requires_key_func(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="key_func"):
+        _writer(_Sink(), tmp_path, overflow=OverflowPolicy.COALESCE)
+
+
+@pytest.mark.asyncio
+async def test_spill_preserves_fifo_order(tmp_path: Path) -> None:
+    writer = _writer(_Sink(), tmp_path, max_size=2, overflow=OverflowPolicy.SPILL)
+
+    for i in range(5):
+        await writer._put({"id": i})
+
+    assert writer.stats.spilled == 3
+    assert writer.size == 5
+    assert writer._spill_task is not None
+    await writer._spill_task
+    assert (tmp_path / "test_writer.jsonl").exists()
+
+    drained = writer._drain(2) + writer._drain(2) + writer._drain(2)
+    assert [item["id"] for item in drained] == [0, 1, 2, 3, 4]
+    assert writer.size == 0
+    assert not (tmp_path / "test_writer.jsonl").exists()
+
+
+@pytest.mark.asyncio
+async def test_spill_drains_in_order_around_background_writes(tmp_path: Path) -> None:
+    writer = _writer(_Sink(), tmp_path, max_size=2, overflow=OverflowPolicy.SPILL)
+
+    for i in range(5):
+        await writer._put({"id": i})
+    await asyncio.sleep(0)
+    assert len(writer._spill_inflight) == 3
+    await writer._put({"id": 5})
+
+    drained = writer._drain(2) + writer._drain(1)
+    assert writer.size == 3
+    assert writer._spill_task is not None
+    await writer._spill_task
+    assert writer._spill_readable == 1
+    while batch := writer._drain(2):
+        drained += batch
+
+    assert [item["id"] for item in drained] == [0, 1, 2, 3, 4, 5]
+    assert not (tmp_path / "test_writer.jsonl").exists()
+
+    for i in range(6, 9):
+        await writer._put({"id": i})
+    drained = writer._drain(2) + writer._drain(2)
+    assert [item["id"] for item in drained] == [6, 7, 8]
+    assert not (tmp_path / "test_writer.jsonl").exists()
+
+
+@pytest.mark.asyncio
+async def test_spill_resumes_from_saved_offset_after_restart(tmp_path: Path) -> None:
+    writer = _writer(_Sink(), tmp_path, max_size=2, overflow=OverflowPolicy.SPILL)
+    for i in range(6):
+        await writer._put({"id": i})
+    assert writer._spill_task is not None
+    await writer._spill_task
+    assert [item["id"] for item in writer._drain(2)] == [0, 1]
+    assert (tmp_path / "test_writer.offset").exists()
+
+    restarted = _writer(_Sink(), tmp_path, max_size=2, overflow=OverflowPolicy.SPILL)
+    restarted._spill_recovered = False
+    restarted.recover()
+
+    assert restarted.size == 2
+    assert [item["id"] for item in restarted._drain(2)] == [4, 5]
+    assert restarted.size == 0
+    assert not (tmp_path / "test_writer.jsonl").exists()
+    assert not (tmp_path / "test_writer.offset").exists()
+
+
+@pytest.mark.asyncio
+async def test_spill_recovery_skips_corrupt_lines(tmp_path: Path) -> None:
+    (tmp_path / "test_writer.jsonl").write_text(
+        '{"id":0}\n\n{"id":1}\n{"id":', encoding="utf-8"
+    )
+    writer = _writer(_Sink(), tmp_path, max_size=5, overflow=OverflowPolicy.SPILL)
+    writer._spill_recovered = False
+    writer.recover()
+
+    assert writer.size == 2
+    assert [item["id"] for item in writer._drain(5)] == [0, 1]
+    assert not (tmp_path / "test_writer.jsonl").exists()
+
+
+@pytest.mark.asyncio
+async def test_block_waits_for_space(tmp_path: Path) -> None:
+    writer = _writer(_Sink(), tmp_path, max_size=1, overflow=OverflowPolicy.BLOCK)
+    await writer._put({"id": 0})
+
+    producer = asyncio.create_task(writer._put({"id": 1}))
+    await asyncio.sleep(0)
+    assert not producer.done()
+
+    assert writer._drain(1) == [{"id": 0}]
+    await asyncio.wait_for(producer, timeout=1)
+    assert writer._drain(1) == [{"id": 1}]
+
+
+@pytest.mark.asyncio
+async def test_adaptive_grows_batch_under_backlog(tmp_path: Path) -> None:
+    writer = _writer(
+        _Sink(),
+        tmp_path,
+        adaptive=AdaptiveConfig(
+            min_batch_size=10,
+            max_batch_size=40,
+            min_interval=1.0,
+            max_interval=8.0,
+        ),
+    )
+    writer.batch_size = 10
+    writer.flush_interval = 4.0
+    for i in range(30):
+        await writer._put({"id": i})
+
+    await writer._flush(writer._drain(writer.batch_size))
+    assert (writer.batch_size, writer.flush_interval) == (20, 2.0)
+
+    await writer._flush(writer._drain(writer.batch_size))
+    assert (writer.batch_size, writer.flush_interval) == (20, 2.0)
+
+    for i in range(30, 36):
+        await writer._put({"id": i})
+    await writer._flush(writer._drain(writer.batch_size))
+    assert (writer.batch_size, writer.flush_interval) == (20, 3.0)
+
+    await writer._put({"id": 36})
+    await writer._flush(writer._drain(writer.batch_size))
+    assert (writer.batch_size, writer.flush_interval) == (15, 1.0)
+
+
+@pytest.mark.asyncio
+async def test_adaptive_shrinks_batch_on_slow_flush(tmp_path: Path) -> None:
+    async def slow_flush(batch: list[dict]) -> None:
+        _ = batch
+        await asyncio.sleep(0.05)
+
+    writer = BatchWriter[dict](
+        flush_callback=slow_flush,
+        batch_size=400,
+        name="slow_writer",
+        spill_dir=tmp_path,
+        scheduler=_NullScheduler(),
+        adaptive=AdaptiveConfig(min_batch_size=100, target_latency=0.01),
+    )
+
+    await writer._flush([{"id": 0}])
+
+    assert writer.batch_size == 200
+    assert writer.stats.last_latency >= 0.01
+
+
+def test_adaptive_clamps_initial_settings(tmp_path: Path) -> None:
+    writer = _writer(
+        _Sink(),
+        tmp_path,
+        adaptive=AdaptiveConfig(min_batch_size=200, max_interval=2.0),
+    )
+
+    assert writer.batch_size == 200
+    assert writer.flush_interval == 2.0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_flushes_on_deadline(tmp_path: Path) -> None:
+    sink = _Sink()
+    writer = BatchWriter[dict](
+        flush_callback=sink,
+        batch_size=100,
+        flush_interval=0.05,
+        spill_dir=tmp_path,
+        scheduler=FlushScheduler(),
+    )
+
+    await writer.add_all([{"id": 0}, {"id": 1}])
+    assert sink.batches == []
+
+    await asyncio.sleep(0.15)
+    assert sink.batches == [[{"id": 0}, {"id": 1}]]
+    assert writer.deadline is None
+
+
+@pytest.mark.asyncio
+async def test_scheduler_flushes_full_batches_immediately(tmp_path: Path) -> None:
+    sink = _Sink()
+    scheduler = FlushScheduler()
+    writer = BatchWriter[dict](
+        flush_callback=sink,
+        batch_size=2,
+        flush_interval=3600,
+        spill_dir=tmp_path,
+        scheduler=scheduler,
+    )
+
+    await writer.add_all([{"id": i} for i in range(5)])
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+    assert sink.batches == [[{"id": 0}, {"id": 1}], [{"id": 2}, {"id": 3}]]
+    assert writer.size == 1
+
+    await scheduler.flush_all()
+    assert sink.batches[-1] == [{"id": 4}]
+
+
+@pytest.mark.asyncio
+async def test_writer_group_drains_all_writers_in_one_callback(tmp_path: Path) -> None:
+    calls: list[list[tuple[str, list[dict]]]] = []
+
+    async def flush_group(batches: list[tuple[BatchWriter[Any], list[Any]]]) -> None:
+        calls.append([(writer.name, batch) for writer, batch in batches])
+
+    group = WriterGroup(flush_callback=flush_group)
+    users = _writer(_Sink(), tmp_path, group=group, name="users")
+    members = _writer(_Sink(), tmp_path, group=group, name="members")
+    idle = _writer(_Sink(), tmp_path, group=group, name="idle")
+
+    await users._put({"id": 1})
+    await members._put({"id": 2})
+    await members.flush_due()
+
+    assert calls == [[("users", [{"id": 1}]), ("members", [{"id": 2}])]]
+    assert users.stats.flushed == members.stats.flushed == 1
+    assert idle.stats.flushes == 0
+    assert not users.flushing
+    assert not group.flushing
+
+
+class _FakeOps:
+    def __init__(self, session: list[str]) -> None:
+        self.session = session
+
+    async def write_a(self, items: list[dict]) -> None:
+        self.session.extend(f"a{item['id']}" for item in items)
+
+    async def write_b(self, items: list[dict]) -> None:
+        self.session.extend(f"b{item['id']}" for item in items)
+
+
+class _FakeShardedDB:
+    def __init__(self) -> None:
+        self.sessions: dict[str, list[str]] = {}
+
+    @asynccontextmanager
+    async def session(
+        self,
+        commit: bool = True,
+        time_ctx: int | None = None,
+    ) -> AsyncGenerator[list[str], None]:
+        _ = commit
+        assert time_ctx is not None
+        key = local_calendar.shard_key(time_ctx, "%Y%m")
+        assert key not in self.sessions
+        self.sessions[key] = []
+        yield self.sessions[key]
+
+
+@pytest.mark.asyncio
+async def test_execute_batch_write_jobs_one_session_per_shard() -> None:
+    db = _FakeShardedDB()
+    jan, feb = 1_735_660_800, 1_738_339_200  # 2025-01-01 / 2025-02-01 (UTC+8)
+
+    await execute_batch_write_jobs(
+        db,  # type: ignore[arg-type]
+        [
+            BatchWriteJob(
+                [{"id": 1, "created_at": jan}, {"id": 2, "created_at": feb}],
+                _FakeOps,  # type: ignore[arg-type]
+                _FakeOps.write_a,
+            ),
+            BatchWriteJob(
+                [{"id": 3, "created_at": jan}],
+                _FakeOps,  # type: ignore[arg-type]
+                _FakeOps.write_b,
+            ),
+        ],
+    )
+
+    assert db.sessions == {"202501": ["a1", "b3"], "202502": ["a2"]}
+
+
+class _SlowShardedDB:
+    def __init__(self) -> None:
+        self.active = 0
+        self.peak = 0
+        self.keys: list[str] = []
+
+    @asynccontextmanager
+    async def session(
+        self,
+        commit: bool = True,
+        time_ctx: int | None = None,
+    ) -> AsyncGenerator[list[str], None]:
+        _ = commit
+        assert time_ctx is not None
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self.keys.append(local_calendar.shard_key(time_ctx, "%Y%m"))
+        await asyncio.sleep(0.01)
+        yield []
+        self.active -= 1
+
+
+@pytest.mark.asyncio
+async def test_execute_batch_write_jobs_writes_shards_concurrently() -> None:
+    db = _SlowShardedDB()
+    # 2024-01 ~ 2024-06 每月 15 日 (UTC+8)
+    stamps = [1_705_248_000 + month * 30 * 86_400 for month in range(6)]
+
+    await execute_batch_write_jobs(
+        db,  # type: ignore[arg-type]
+        [
+            BatchWriteJob(
+                [{"id": i, "created_at": ts} for i, ts in enumerate(stamps)],
+                _FakeOps,  # type: ignore[arg-type]
+                _FakeOps.write_a,
+            ),
+        ],
+        max_concurrency=2,
+    )
+
+    assert sorted(db.keys) == [
+        "202401",
+        "202402",
+        "202403",
+        "202404",
+        "202405",
+        "202406",
+    ]
+    assert db.peak == 2
+
+
+@pytest.mark.asyncio
+async def test_execute_batch_write_jobs_routes_by_shanghai_month() -> None:
+    db = _FakeShardedDB()
+    # 2025-01-31 23:59:59 / 2025-02-01 00:00:00 (UTC+8)
+    last_jan, first_feb = 1_738_339_199, 1_738_339_200
+
+    await execute_batch_write_jobs(
+        db,  # type: ignore[arg-type]
+        [
+            BatchWriteJob(
+                [
+                    {"id": 1, "created_at": first_feb},
+                    {"id": 2, "created_at": last_jan},
+                    {"id": 3, "created_at": first_feb},
+                ],
+                _FakeOps,  # type: ignore[arg-type]
+                _FakeOps.write_a,
+            ),
+        ],
+    )
+
+    assert db.sessions == {"202501": ["a2"], "202502": ["a1", "a3"]}
@@ -0,0 +1,105 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.lib.db.catalog import BloomFilter, ShardCatalog, ShardEntry, bloom_token
+from src.lib.db.connectors import ShardedDB
+from src.lib.db.manager import db_manager
+from src.lib.utils.calendar import local_calendar
+
+
+def test_bloom_filter_has_no_false_negatives() -> None:
+    bloom = BloomFilter.for_capacity(1000)
+    for i in range(1000):
+        bloom.add(str(i))
+
+    assert all(str(i) in bloom for i in range(1000))
+    false_hits = sum(str(i) in bloom for i in range(1000, 11000))
+    assert false_hits < 300
+
+
+def test_entry_prunes_only_when_clean() -> None:
+    bloom = BloomFilter.for_capacity(1)
+    bloom.add(bloom_token("user_id", "42"))
+    entry = ShardEntry(
+        "202501",
+        min_ts=100,
+        max_ts=200,
+        rows=3,
+        columns=("user_id",),
+        dirty=False,
+        bloom=bloom,
+    )
+
+    assert entry.may_contain(150, 300)
+    assert not entry.may_contain(201, 300)
+    assert entry.may_contain(0, 300, {"user_id": "42"})
+    assert not entry.may_contain(0, 300, {"user_id": "43"})
+    assert entry.may_contain(0, 300, {"group_id": "1"})
+
+    entry.dirty = True
+    assert entry.may_contain(201, 300, {"user_id": "43"})
+
+
+def test_catalog_round_trip(tmp_path: Path) -> None:
+    catalog = ShardCatalog(tmp_path / "log.catalog.json")
+    bloom = BloomFilter.for_capacity(1)
+    bloom.add(bloom_token("user_id", "1"))
+    catalog.put(ShardEntry("202501", 1, 2, 1, ("user_id",), dirty=False, bloom=bloom))
+    catalog.mark_archived("202501", archived=True)
+
+    (entry,) = ShardCatalog(tmp_path / "log.catalog.json").entries()
+    assert entry.archived
+    assert not entry.dirty
+    assert entry.may_contain(0, 10, {"user_id": "1"})
+    assert not entry.may_contain(0, 10, {"user_id": "2"})
+
+
+@pytest.mark.asyncio
+async def test_refreshed_catalog_skips_shards_without_target(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    db = ShardedDB(namespace="catalog_test", prefix="snap", fmt="%Y%m")
+    start, _ = local_calendar.date_bounds(20250101)
+    end = local_calendar.date_bounds(20250331)[1]
+    for month, user_id in zip(
+        local_calendar.month_starts(start, end), ("1", "2", "1"), strict=True
+    ):
+        async with db.session(time_ctx=month) as session:
+            await session.execute(
+                text("CREATE TABLE s (user_id TEXT, created_at INTEGER)")
+            )
+            await session.execute(
+                text("INSERT INTO s VALUES (:u, :t)"), {"u": user_id, "t": month + 60}
+            )
+
+    assert await db.refresh_catalog() == 3
+    visited: list[str] = []
+
+    async def _count(session: AsyncSession) -> int:
+        visited.append("x")
+        return (
+            await session.execute(
+                text("SELECT COUNT(*) FROM s WHERE user_id = '1'"),
+            )
+        ).scalar_one()
+
+    assert await db.map_reduce(start, end, _count, probe={"user_id": "1"}) == [1, 1]
+    assert len(visited) == 2
+
+    async with db.session(time_ctx=start) as session:
+        await session.execute(text("INSERT INTO s VALUES ('9', :t)"), {"t": start})
+    assert db.catalog.get("202501").dirty  # type: ignore[union-attr]
+
+    async with db.session(time_ctx=start) as session:
+        await session.execute(text("INSERT INTO s VALUES ('7', :t)"), {"t": start})
+        assert await db.refresh_catalog(["202501"]) == 1
+        assert not db.catalog.get("202501").dirty  # type: ignore[union-attr]
+    assert db.catalog.get("202501").dirty  # type: ignore[union-attr]
+
+    for path in db.base_dir.glob("*.db"):
+        await db_manager.dispose(str(path))
@@ -0,0 +1,156 @@
+from operator import itemgetter
+from pathlib import Path
+
+import pytest
+
+from src.lib.db.batch import BatchWriter, FlushScheduler, OverflowPolicy
+from src.lib.db.journal import WriteJournal
+
+
+class _NullScheduler(FlushScheduler):
+    def schedule(self, writer: BatchWriter, deadline: float) -> None:
+        _ = (writer, deadline)
+
+    def wake(self, writer: BatchWriter) -> None:
+        _ = writer
+
+
+def test_journal_replays_records_after_reopen(tmp_path: Path) -> None:
+    journal = WriteJournal(tmp_path, "j")
+    assert journal.open() == []
+    journal.append({"id": 1})
+    journal.append({"id": 2, "text": "水"})
+    journal.close()
+
+    assert WriteJournal(tmp_path, "j").open() == [{"id": 1}, {"id": 2, "text": "水"}]
+
+
+def test_journal_reset_keeps_only_live_items(tmp_path: Path) -> None:
+    journal = WriteJournal(tmp_path, "j")
+    journal.open()
+    journal.append_all([{"id": i} for i in range(10)])
+    journal.reset([{"id": 9}])
+    journal.append({"id": 10})
+    journal.reset([])
+    journal.append({"id": 11})
+    journal.close()
+
+    assert WriteJournal(tmp_path, "j").open() == [{"id": 11}]
+
+
+def test_journal_checkpoint_and_truncate_stay_in_segment(tmp_path: Path) -> None:
+    journal = WriteJournal(tmp_path, "j")
+    journal.open()
+    offsets = journal.append_all([{"id": i} for i in range(3)])
+    journal.checkpoint(offsets[2])
+    journal.append({"id": 3})
+    journal.close()
+
+    assert WriteJournal(tmp_path, "j").open() == [{"id": 2}, {"id": 3}]
+    assert not (tmp_path / "j.b.wal").exists()
+
+    journal = WriteJournal(tmp_path, "j")
+    journal.open()
+    journal.truncate()
+    journal.append({"id": 4})
+    journal.close()
+    assert WriteJournal(tmp_path, "j").open() == [{"id": 4}]
+    assert not (tmp_path / "j.b.wal").exists()
+
+
+def test_journal_grows_beyond_initial_size(tmp_path: Path) -> None:
+    journal = WriteJournal(tmp_path, "j", initial_size=64)
+    journal.open()
+    journal.append_all([{"id": i, "pad": "x" * 20} for i in range(100)])
+    journal.close()
+
+    records = WriteJournal(tmp_path, "j").open()
+    assert [r["id"] for r in records] == list(range(100))
+
+
+def test_journal_stops_at_torn_record(tmp_path: Path) -> None:
+    journal = WriteJournal(tmp_path, "j")
+    journal.open()
+    journal.append({"id": 1})
+    tail = journal.used
+    journal.append({"id": 2})
+    journal.close()
+
+    path = tmp_path / "j.a.wal"
+    data = bytearray(path.read_bytes())
+    data[tail + 8] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    assert WriteJournal(tmp_path, "j").open() == [{"id": 1}]
+
+
+@pytest.mark.asyncio
+async def test_writer_replays_journal_and_truncates_after_flush(
+    tmp_path: Path,
+) -> None:
+    flushed: list[list[dict]] = []
+
+    async def sink(batch: list[dict]) -> None:
+        flushed.append(batch)
+
+    def make() -> BatchWriter[dict]:
+        return BatchWriter[dict](
+            flush_callback=sink,
+            batch_size=100,
+            flush_interval=3600,
+            overflow=OverflowPolicy.COALESCE,
+            key_func=itemgetter("user_id"),
+            name="journaled",
+            spill_dir=tmp_path,
+            scheduler=_NullScheduler(),
+            journal=True,
+            journal_dir=tmp_path,
+        )
+
+    crashed = make()
+    await crashed.add({"user_id": "1", "name": "a"})
+    await crashed.add({"user_id": "2", "name": "b"})
+    await crashed.add({"user_id": "1", "name": "c"})
+    crashed._journal.close()  # type: ignore[union-attr]
+
+    restarted = make()
+    restarted.recover()
+    assert list(restarted._pending.values()) == [
+        {"user_id": "1", "name": "c"},
+        {"user_id": "2", "name": "b"},
+    ]
+
+    await restarted.flush_due()
+    restarted._journal.close()  # type: ignore[union-attr]
+    assert flushed == [[{"user_id": "1", "name": "c"}, {"user_id": "2", "name": "b"}]]
+
+    again = make()
+    again.recover()
+    assert again.size == 0
+
+
+@pytest.mark.asyncio
+async def test_writer_checkpoints_journal_when_items_remain(tmp_path: Path) -> None:
+    async def sink(batch: list[dict]) -> None:
+        _ = batch
+
+    def make() -> BatchWriter[dict]:
+        return BatchWriter[dict](
+            flush_callback=sink,
+            batch_size=2,
+            flush_interval=3600,
+            name="partial",
+            scheduler=_NullScheduler(),
+            journal=True,
+            journal_dir=tmp_path,
+        )
+
+    writer = make()
+    await writer.add_all([{"id": i} for i in range(5)])
+    await writer._flush(writer._drain(2))
+    writer._journal.close()  # type: ignore[union-attr]
+
+    assert not (tmp_path / "partial.b.wal").exists()
+    restarted = make()
+    restarted.recover()
+    assert list(restarted._pending.values()) == [{"id": i} for i in range(2, 5)]
@@ -0,0 +1,183 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from src.lib.db.manager import DatabaseManager
+
+
+async def _prepare(tmp_path: Path) -> tuple[DatabaseManager, str]:
+    manager = DatabaseManager()
+    path = str(tmp_path / "test.db")
+    async with manager.open(path) as session:
+        await session.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+    return manager, path
+
+
+async def _ids(manager: DatabaseManager, path: str) -> list[int]:
+    async with manager.open(path, commit=False) as session:
+        result = await session.execute(text("SELECT id FROM t ORDER BY id"))
+        return list(result.scalars())
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_are_grouped_into_fewer_transactions(
+    tmp_path: Path,
+) -> None:
+    manager, path = await _prepare(tmp_path)
+
+    async def _insert(i: int) -> None:
+        async with manager.open(path) as session:
+            await session.execute(text("INSERT INTO t (id) VALUES (:id)"), {"id": i})
+
+    await asyncio.gather(*(_insert(i) for i in range(20)))
+
+    writer = manager._writers[f"sqlite+aiosqlite:///{path}"]
+    assert await _ids(manager, path) == list(range(20))
+    assert writer.stats.jobs == 21
+    assert writer.stats.transactions < 21
+    await manager.dispose(path)
+
+
+@pytest.mark.asyncio
+async def test_failed_job_only_rolls_back_itself(tmp_path: Path) -> None:
+    manager, path = await _prepare(tmp_path)
+
+    async def _insert(i: int, fail: bool = False) -> None:
+        async with manager.open(path) as session:
+            await session.execute(text("INSERT INTO t (id) VALUES (:id)"), {"id": i})
+            if fail:
+                raise RuntimeError("boom")
+
+    results = await asyncio.gather(
+        _insert(1),
+        _insert(2, fail=True),
+        _insert(3),
+        return_exceptions=True,
+    )
+
+    assert isinstance(results[1], RuntimeError)
+    assert await _ids(manager, path) == [1, 3]
+    await manager.dispose(path)
+
+
+@pytest.mark.asyncio
+async def test_nested_write_on_same_file_reuses_session(tmp_path: Path) -> None:
+    manager, path = await _prepare(tmp_path)
+
+    async with manager.open(path) as outer:
+        await outer.execute(text("INSERT INTO t (id) VALUES (1)"))
+        async with manager.open(path) as inner:
+            assert inner is outer
+            await inner.execute(text("INSERT INTO t (id) VALUES (2)"))
+
+    assert await _ids(manager, path) == [1, 2]
+    await manager.dispose(path)
+
+
+@pytest.mark.asyncio
+async def test_reads_do_not_wait_for_open_write_transaction(tmp_path: Path) -> None:
+    manager, path = await _prepare(tmp_path)
+    write_started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def _slow_write() -> None:
+        async with manager.open(path) as session:
+            await session.execute(text("INSERT INTO t (id) VALUES (1)"))
+            write_started.set()
+            await release.wait()
+
+    task = asyncio.create_task(_slow_write())
+    await write_started.wait()
+
+    assert await asyncio.wait_for(_ids(manager, path), timeout=1) == []
+    release.set()
+    await task
+    assert await _ids(manager, path) == [1]
+    await manager.dispose(path)
+
+
+@pytest.mark.asyncio
+async def test_read_sessions_are_read_only(tmp_path: Path) -> None:
+    manager, path = await _prepare(tmp_path)
+
+    async with manager.open(path, commit=False) as session:
+        with pytest.raises(OperationalError, match="readonly"):
+            await session.execute(text("INSERT INTO t (id) VALUES (1)"))
+
+    await manager.dispose(path)
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_idle_files_beyond_cap(tmp_path: Path) -> None:
+    manager = DatabaseManager(max_files=2)
+    paths = [str(tmp_path / f"{i}.db") for i in range(4)]
+    for path in paths:
+        async with manager.open(path, commit=False) as session:
+            await session.execute(text("SELECT 1"))
+
+    assert manager.stats().files <= 2
+    assert manager.stats().evictions == 2
+    assert set(manager._paths.values()) == set(paths[2:])
+
+    async with manager.open(paths[0]) as session:
+        await session.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+    assert await _ids(manager, paths[0]) == []
+
+
+@pytest.mark.asyncio
+async def test_idle_ttl_skips_files_in_use(tmp_path: Path) -> None:
+    manager = DatabaseManager(idle_ttl=0)
+    busy, idle = str(tmp_path / "busy.db"), str(tmp_path / "idle.db")
+    async with manager.open(idle) as session:
+        await session.execute(text("SELECT 1"))
+
+    async with manager.open(busy, commit=False) as session:
+        assert await manager.evict_idle() == 1
+        await session.execute(text("SELECT 1"))
+        assert manager.stats().files == 1
+
+    assert manager.stats().connections > 0
+    assert await manager.evict_idle() == 1
+    assert manager.stats().engines == 0
+
+
+@pytest.mark.asyncio
+async def test_resident_files_skip_ttl_and_cap(tmp_path: Path) -> None:
+    manager = DatabaseManager(max_files=1, idle_ttl=0)
+    core = str(tmp_path / "core.db")
+    shards = [str(tmp_path / f"shard_{i}.db") for i in range(3)]
+    async with manager.open(core, resident=True) as session:
+        await session.execute(text("SELECT 1"))
+    for path in shards:
+        async with manager.open(path, commit=False) as session:
+            await session.execute(text("SELECT 1"))
+
+    assert set(manager._paths.values()) == {core, shards[-1]}
+    assert await manager.evict_idle() == 1
+    assert set(manager._paths.values()) == {core}
+    stats = manager.stats()
+    assert (stats.files, stats.resident) == (1, 1)
+
+    async with manager.open(core, commit=False) as session:
+        await session.execute(text("SELECT 1"))
+    assert await manager.evict_idle() == 1
+    assert manager.stats().files == 0
+
+
+@pytest.mark.asyncio
+async def test_release_refreshes_lru_order(tmp_path: Path) -> None:
+    manager = DatabaseManager(idle_ttl=60)
+    long_lived, idle = str(tmp_path / "long.db"), str(tmp_path / "idle.db")
+    async with manager.open(long_lived, commit=False) as session:
+        async with manager.open(idle, commit=False) as inner:
+            await inner.execute(text("SELECT 1"))
+        await asyncio.sleep(0.01)
+        await session.execute(text("SELECT 1"))
+
+    idle_url = f"sqlite+aiosqlite:///{idle}"
+    assert next(iter(manager._last_used)) == idle_url
+    assert await manager.evict_idle(now=manager._last_used[idle_url] + 60) == 1
+    assert list(manager._paths.values()) == [long_lived]
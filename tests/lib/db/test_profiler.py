@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import Integer, String, text
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from src.lib.db.manager import DatabaseManager
+from src.lib.db.ops import BaseOps
+from src.lib.db.profiler import SortKey, SqlProfiler, fingerprint, param_shape
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class _Item(_Base):
+    __tablename__ = "item"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String)
+
+
+class _ItemOps(BaseOps[_Item]):
+    async def count_named(self, name: str) -> int:
+        result = await self.session.execute(
+            text("SELECT COUNT(*) FROM item WHERE name = :name"), {"name": name}
+        )
+        return result.scalar_one()
+
+
+def test_fingerprint_folds_literals_and_placeholder_lists() -> None:
+    assert fingerprint("SELECT * FROM t WHERE a = 'x' AND b = 12") == (
+        "SELECT * FROM t WHERE a = ? AND b = ?"
+    )
+    assert fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?)") == fingerprint(
+        "SELECT * FROM t WHERE id IN (?, ?)"
+    )
+    assert fingerprint("INSERT INTO t (a, b) VALUES (?, ?), (?, ?)") == fingerprint(
+        "INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)"
+    )
+    assert fingerprint("SELECT col_2 FROM t2 -- trailing") == "SELECT col_2 FROM t2"
+
+
+def test_param_shape_hides_values() -> None:
+    assert param_shape({"a": 1, "b": "secret"}) == "{a: int, b: str}"
+    assert param_shape([(1, "x"), (2, "y")], executemany=True) == "[(int, str)] x 2"
+
+
+def test_percentile_and_report() -> None:
+    profiler = SqlProfiler(slow_query_ms=100)
+    for _ in range(19):
+        profiler.record("SELECT 1", 0.3)
+    profiler.record("SELECT 1", 150.0, {"id": 1})
+
+    (stats,) = profiler.top(1, SortKey.P95)
+    assert stats.count == 20
+    assert stats.percentile(0.5) == 0.5
+    assert stats.max_ms == 150.0
+    assert "SELECT" in profiler.report()
+
+
+@pytest.mark.asyncio
+async def test_statements_are_attributed_to_ops_methods(tmp_path: Path) -> None:
+    profiler = SqlProfiler()
+    manager = DatabaseManager(instruments=[profiler.attach])
+    path = str(tmp_path / "p.db")
+    async with manager.open(path) as session:
+        conn = await session.connection()
+        await conn.run_sync(_Base.metadata.create_all)
+        await _ItemOps(session).bulk_create([{"name": "a"}, {"name": "b"}])
+
+    async with manager.open(path, commit=False) as session:
+        assert await _ItemOps(session).count_named("a") == 1
+
+    callers = {stats.caller for stats in profiler.top(50)}
+    assert {"_ItemOps.bulk_create", "_ItemOps.count_named"} <= callers
+    await manager.dispose(path)
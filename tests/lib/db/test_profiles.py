@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+
+from src.lib.db.connectors import ShardedDB
+from src.lib.db.manager import DatabaseManager
+from src.lib.db.profiles import COLD_SHARD_PROFILE, HOT_SHARD_PROFILE, TempStore
+
+
+async def _pragma(manager: DatabaseManager, path: str, name: str, commit: bool) -> int:
+    async with manager.open(path, commit) as session:
+        return (await session.execute(text(f"PRAGMA {name}"))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_profile_is_applied_to_writer_and_reader(tmp_path: Path) -> None:
+    manager = DatabaseManager()
+    path = str(tmp_path / "hot.db")
+    async with manager.open(path, profile=HOT_SHARD_PROFILE) as session:
+        await session.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY)"))
+
+    for commit in (True, False):
+        assert await _pragma(manager, path, "cache_size", commit) == (
+            HOT_SHARD_PROFILE.cache_size
+        )
+        assert await _pragma(manager, path, "temp_store", commit) == 2
+    assert await _pragma(manager, path, "wal_autocheckpoint", True) == (
+        HOT_SHARD_PROFILE.wal_autocheckpoint
+    )
+    assert await _pragma(manager, path, "query_only", False) == 1
+    assert HOT_SHARD_PROFILE.temp_store is TempStore.MEMORY
+    await manager.dispose(path)
+
+
+@pytest.mark.asyncio
+async def test_profile_binds_on_first_open(tmp_path: Path) -> None:
+    manager = DatabaseManager()
+    path = str(tmp_path / "cold.db")
+    async with manager.open(path, profile=COLD_SHARD_PROFILE):
+        pass
+    async with manager.open(path, profile=HOT_SHARD_PROFILE):
+        pass
+
+    assert await _pragma(manager, path, "mmap_size", True) == 0
+    await manager.dispose(path)
+
+
+def test_sharded_db_uses_cold_profile_outside_active_window() -> None:
+    db = ShardedDB(
+        namespace="bench",
+        prefix="log",
+        fmt="%Y%m",
+        active_window_months=2,
+        profile=HOT_SHARD_PROFILE,
+    )
+    current, previous = db._active_keys()
+
+    assert db._profile_for(current) is HOT_SHARD_PROFILE
+    assert db._profile_for(previous) is HOT_SHARD_PROFILE
+    assert db._profile_for("190001") is COLD_SHARD_PROFILE
+    assert db._profile_for("999912") is HOT_SHARD_PROFILE
@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+
+from src.lib.db import connectors
+from src.lib.db.connectors import ShardedDB
+from src.lib.db.manager import db_manager
+from src.lib.db.scratch import ScratchCache
+from src.lib.utils.calendar import local_calendar
+
+_JAN, _ = local_calendar.date_bounds(20250115)
+_FEB, _ = local_calendar.date_bounds(20250215)
+
+
+async def _archived_db(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    cache: ScratchCache,
+) -> ShardedDB:
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(connectors, "scratch_cache", cache)
+    db = ShardedDB(namespace="scratch_test", prefix="log", fmt="%Y%m")
+    extracted: list[str] = []
+    extract = db._extract
+
+    async def _recording_extract(archive_path: Path, target: Path) -> bool:
+        extracted.append(archive_path.name)
+        return await extract(archive_path, target)
+
+    monkeypatch.setattr(db, "_extract", _recording_extract)
+    db.extracted = extracted  # type: ignore[attr-defined]
+
+    for ts in (_JAN, _FEB):
+        async with db.session(time_ctx=ts) as session:
+            await session.execute(text("CREATE TABLE t (v INTEGER)"))
+            await session.execute(text("INSERT INTO t VALUES (:v)"), {"v": ts})
+    assert await db.run_archiver_task() == 2
+    return db
+
+
+async def _read(db: ShardedDB, ts: int) -> int:
+    async with db.session(commit=False, time_ctx=ts) as session:
+        return (await session.execute(text("SELECT v FROM t"))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_cold_reads_use_scratch_and_leave_archive_untouched(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    cache = ScratchCache(root=Path("data/scratch"))
+    db = await _archived_db(tmp_path, monkeypatch, cache)
+    db_path, zip_path = db._get_file_paths("202501")
+    archive = zip_path.read_bytes()
+
+    assert await _read(db, _JAN) == _JAN
+    assert await _read(db, _JAN) == _JAN
+    assert db.extracted == [zip_path.name]  # type: ignore[attr-defined]
+    assert not db_path.exists()
+    assert zip_path.read_bytes() == archive
+    assert cache.stats().files == 1
+    assert cache.stats().hits == 1
+
+    async with db.session(time_ctx=_JAN) as session:
+        await session.execute(text("INSERT INTO t VALUES (1)"))
+    assert db_path.exists()
+    assert cache.stats().files == 0
+    await db_manager.dispose(str(db_path))
+
+
+@pytest.mark.asyncio
+async def test_scratch_evicts_least_recently_used_copy(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    cache = ScratchCache(root=Path("data/scratch"), max_bytes=1)
+    db = await _archived_db(tmp_path, monkeypatch, cache)
+
+    assert await _read(db, _JAN) == _JAN
+    assert await _read(db, _FEB) == _FEB
+
+    remaining = sorted(
+        p.name for p in (tmp_path / "data/scratch/scratch_test").glob("*.db")
+    )
+    assert remaining == ["log_202502.db"]
+    assert cache.stats().evictions == 1
+
+    assert await cache.evict_expired(now=float("inf")) == 1
+    assert cache.stats().files == 0
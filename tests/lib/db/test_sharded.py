@@ -0,0 +1,212 @@
+import asyncio
+import operator
+from pathlib import Path
+
+import pytest
+from sqlalchemy import Integer, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from src.lib.db import connectors
+from src.lib.db.connectors import ShardedDB
+from src.lib.db.manager import db_manager
+from src.lib.utils.calendar import local_calendar
+
+_YEAR_START, _ = local_calendar.date_bounds(20250101)
+_YEAR_END = local_calendar.date_bounds(20251231)[1]
+
+
+async def _prepare(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> ShardedDB:
+    monkeypatch.chdir(tmp_path)
+    db = ShardedDB(namespace="sharded_test", prefix="log", fmt="%Y%m")
+    for month in local_calendar.month_starts(_YEAR_START, _YEAR_END):
+        async with db.session(time_ctx=month) as session:
+            await session.execute(text("CREATE TABLE t (v INTEGER)"))
+            await session.execute(
+                text("INSERT INTO t (v) VALUES (:v)"),
+                {"v": int(db._get_shard_key(month)[-2:])},
+            )
+    return db
+
+
+async def _dispose(db: ShardedDB) -> None:
+    for path in db.base_dir.glob("*.db"):
+        await db_manager.dispose(str(path))
+
+
+async def _sum(session: AsyncSession) -> int:
+    return (await session.execute(text("SELECT SUM(v) FROM t"))).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_map_fold_covers_a_full_year(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    db = await _prepare(tmp_path, monkeypatch)
+
+    total = await db.map_fold(_YEAR_START, _YEAR_END, _sum, operator.add, 0)
+    ordered = await db.map_reduce(_YEAR_START, _YEAR_END, _sum)
+
+    assert total == sum(range(1, 13))
+    assert ordered == list(range(1, 13))
+    await _dispose(db)
+
+
+@pytest.mark.asyncio
+async def test_map_fold_bounds_shard_parallelism(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    db = await _prepare(tmp_path, monkeypatch)
+    in_flight = peak = 0
+
+    async def _slow(session: AsyncSession) -> int:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return await _sum(session)
+
+    total = await db.map_fold(
+        _YEAR_START, _YEAR_END, _slow, operator.add, 0, max_concurrency=3
+    )
+
+    assert total == sum(range(1, 13))
+    assert 1 < peak <= 3
+    await _dispose(db)
+
+
+@pytest.mark.asyncio
+async def test_map_fold_propagates_shard_errors(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    db = await _prepare(tmp_path, monkeypatch)
+
+    async def _broken(session: AsyncSession) -> int:
+        await session.execute(text("SELECT missing FROM t"))
+        return 0
+
+    with pytest.raises(Exception, match="missing"):
+        await db.map_fold(_YEAR_START, _YEAR_END, _broken, operator.add, 0)
+    await _dispose(db)
+
+
+class _SchemaBase(DeclarativeBase):
+    pass
+
+
+class _Row(_SchemaBase):
+    __tablename__ = "row"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+
+@pytest.mark.asyncio
+async def test_schema_is_created_lazily_once_per_shard(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    db = ShardedDB(namespace="schema_test", prefix="log", fmt="%Y%m")
+    await db.init(_SchemaBase)
+    calls: list[str] = []
+    original = _SchemaBase.metadata.create_all
+
+    def _spy(*args: object, **kwargs: object) -> None:
+        calls.append("create_all")
+        original(*args, **kwargs)  # type: ignore[arg-type]
+
+    monkeypatch.setattr(_SchemaBase.metadata, "create_all", _spy)
+
+    async def _insert(i: int) -> None:
+        async with db.session(time_ctx=_YEAR_START) as session:
+            await session.execute(text("INSERT INTO row (id) VALUES (:i)"), {"i": i})
+
+    await asyncio.gather(*(_insert(i) for i in range(5)))
+    await _insert(5)
+
+    assert calls == ["create_all"]
+    await _dispose(db)
+
+
+@pytest.mark.asyncio
+async def test_provision_upcoming_only_near_month_end(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    db = ShardedDB(namespace="provision_test", prefix="log", fmt="%Y%m")
+    await db.init(_SchemaBase)
+    month_end = local_calendar.date_bounds(20250131)[1]
+
+    monkeypatch.setattr(connectors, "get_current_time", lambda: month_end - 86400)
+    assert not await db.provision_upcoming()
+
+    monkeypatch.setattr(connectors, "get_current_time", lambda: month_end - 600)
+    assert await db.provision_upcoming()
+    assert not await db.provision_upcoming()
+    assert (db.base_dir / "log_202502.db").exists()
+
+    async with db.session(commit=False, time_ctx=month_end + 1) as session:
+        assert (
+            await session.execute(text("SELECT COUNT(*) FROM row"))
+        ).scalar_one() == 0
+    await _dispose(db)
+
+
+@pytest.mark.asyncio
+async def test_reads_of_missing_shards_do_not_create_files(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    month_end = local_calendar.date_bounds(20250131)[1]
+    monkeypatch.setattr(connectors, "get_current_time", lambda: month_end - 600)
+    db = ShardedDB(namespace="missing_test", prefix="log", fmt="%Y%m")
+    await db.init(_SchemaBase)
+    assert {p.name for p in db.base_dir.glob("*.db")} == {
+        "log_202501.db",
+        "log_202502.db",
+    }
+
+    async with db.session(commit=False, time_ctx=_YEAR_END) as session:
+        assert (
+            await session.execute(text("SELECT COUNT(*) FROM row"))
+        ).scalar_one() == 0
+
+    assert not (db.base_dir / "log_202512.db").exists()
+    await _dispose(db)
+
+
+@pytest.mark.asyncio
+async def test_attached_session_unions_shards_into_views(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    db = await _prepare(tmp_path, monkeypatch)
+    feb, _ = local_calendar.date_bounds(20250215)
+    mar_end = local_calendar.date_bounds(20250331)[1]
+    async with db.session(time_ctx=feb) as session:
+        await session.execute(text("CREATE TABLE only_feb (k INTEGER)"))
+        await session.execute(text("INSERT INTO only_feb VALUES (7)"))
+        await session.execute(text("ALTER TABLE t ADD COLUMN extra INTEGER"))
+
+    async with db.attached_session(_YEAR_START, mar_end) as session:
+        total = (await session.execute(text("SELECT SUM(v) FROM t"))).scalar_one()
+        columns = list((await session.execute(text("SELECT * FROM t"))).keys())
+        only_feb = (await session.execute(text("SELECT k FROM only_feb"))).scalar_one()
+        db_path, _ = db._get_file_paths("202501")
+        assert not db_manager.is_idle(str(db_path))
+
+    assert total == 1 + 2 + 3
+    assert columns == ["v"]
+    assert only_feb == 7
+    assert db_manager.is_idle(str(db_path))
+
+    with pytest.raises(ValueError, match="最多"):
+        async with db.attached_session(_YEAR_START, _YEAR_END):
+            pass
+    await _dispose(db)
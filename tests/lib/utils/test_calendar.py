@@ -0,0 +1,57 @@
+import random
+
+import arrow
+import pytest
+
+from src.lib.utils.calendar import Calendar, TimeSlot
+
+
+def test_locate_matches_arrow_in_local_timezone() -> None:
+    calendar = Calendar("Asia/Shanghai")
+    rng = random.Random(42)
+    for _ in range(2000):
+        ts = rng.randint(1_000_000_000, 2_000_000_000)
+        local = arrow.get(ts).to("Asia/Shanghai")
+
+        assert calendar.locate(ts) == TimeSlot(
+            local.strftime("%Y_%m"),
+            int(local.format("YYYYMMDD")),
+            local.hour,
+        )
+        assert calendar.day_bounds(ts) == (
+            local.floor("day").int_timestamp,
+            local.ceil("day").int_timestamp,
+        )
+        assert calendar.month_start(ts) == local.floor("month").int_timestamp
+
+
+def test_day_boundary_uses_local_midnight() -> None:
+    calendar = Calendar("Asia/Shanghai")
+    # 2026-03-01 23:59:59 / 2026-03-02 00:00:00 (UTC+8)
+    assert calendar.record_date(1_772_380_799) == 20260301
+    assert calendar.record_date(1_772_380_800) == 20260302
+    assert calendar.hour(1_772_380_800 + 3 * 3600) == 3
+
+
+def test_date_arithmetic_crosses_month_and_year() -> None:
+    calendar = Calendar("Asia/Shanghai")
+    assert calendar.shift_date(20260301, -1) == 20260228
+    assert calendar.shift_date(20251231, 1) == 20260101
+    assert calendar.shift_date(20260101, -800) == 20231024
+    assert calendar.date_range(20260302, 3) == [20260228, 20260301, 20260302]
+    with pytest.raises(ValueError, match="无效日期"):
+        calendar.date_bounds(20260230)
+
+
+def test_month_starts_and_custom_shard_format() -> None:
+    calendar = Calendar("Asia/Shanghai")
+    dec_31 = 1_767_196_799  # 2025-12-31 23:59:59 (UTC+8)
+    feb_01 = 1_769_875_200  # 2026-02-01 00:00:00 (UTC+8)
+
+    starts = calendar.month_starts(dec_31, feb_01)
+
+    assert [calendar.shard_key(ts, "%Y%m") for ts in starts] == [
+        "202512",
+        "202601",
+        "202602",
+    ]
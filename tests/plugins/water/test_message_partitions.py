@@ -0,0 +1,131 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import Table, insert, text
+from sqlalchemy.schema import CreateTable
+
+from src.lib.db.connectors import ShardedDB
+from src.lib.db.manager import db_manager
+from src.lib.utils.calendar import local_calendar
+from src.plugins.water.database.ops import WaterMessageOps
+from src.plugins.water.database.tables import WaterMessage, WaterMessageBase
+
+_DAY1, _ = local_calendar.date_bounds(20260301)
+_DAY2, _DAY2_END = local_calendar.date_bounds(20260302)
+
+
+async def _tables(db: ShardedDB) -> list[str]:
+    async with db.session(commit=False, time_ctx=_DAY1) as session:
+        result = await session.execute(
+            text(
+                "SELECT name FROM sqlite_master "
+                "WHERE type = 'table' AND name LIKE 'water_message%' ORDER BY name"
+            )
+        )
+        return list(result.scalars())
+
+
+@pytest.mark.asyncio
+async def test_messages_are_partitioned_by_day_and_pruned_by_drop(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    db = ShardedDB(namespace="water_partition_test", prefix="logs", fmt="%Y_%m")
+    await db.init(WaterMessageBase)
+
+    async with db.session(time_ctx=_DAY1) as session:
+        ops = WaterMessageOps(session)
+        assert await _tables(db) == []
+        assert await ops._source(_DAY1, _DAY1 + 60) is None
+        inserted = await ops.bulk_insert_water_message(
+            [
+                {"group_id": "g", "user_id": "u", "created_at": _DAY1 + 5},
+                {"group_id": "g", "user_id": "v", "created_at": _DAY2 + 5},
+                {"group_id": "g", "user_id": "u", "created_at": _DAY2 + 3605},
+            ]
+        )
+        # 模拟旧分片中遗留的未分区表
+        await session.execute(CreateTable(WaterMessage.__table__))
+        await session.execute(
+            insert(WaterMessage).values(group_id="h", user_id="u", created_at=_DAY2)
+        )
+    assert inserted == 3
+    assert await _tables(db) == [
+        "water_message",
+        "water_message_20260301",
+        "water_message_20260302",
+    ]
+
+    async with db.session(commit=False, time_ctx=_DAY1) as session:
+        ops = WaterMessageOps(session)
+        today = await ops.get_top_users("g", _DAY2, _DAY2_END)
+        both_days = await ops.get_top_users("g", _DAY1, _DAY2_END)
+        assert sorted(tuple(r) for r in today) == [("u", 1), ("v", 1)]
+        assert [tuple(r) for r in both_days] == [("u", 2), ("v", 1)]
+        assert sorted(await ops.aggregate_daily_hourly_stats(_DAY2, _DAY2_END)) == [
+            ("g", "u", 1, 1),
+            ("g", "v", 0, 1),
+            ("h", "u", 0, 1),
+        ]
+        assert await ops.get_today_group_rank("h", _DAY2, _DAY2_END) == 2
+
+    async with db.attached_session(_DAY1, _DAY2_END) as session:
+        both_days = await WaterMessageOps(session).get_top_users("g", _DAY1, _DAY2_END)
+        assert [tuple(r) for r in both_days] == [("u", 2), ("v", 1)]
+
+    async with db.session(time_ctx=_DAY1) as session:
+        ops = WaterMessageOps(session)
+        assert await ops.drop_partitions_before(20260302) == ["water_message_20260301"]
+        assert await ops.prune_before(_DAY2) == 0
+    assert await _tables(db) == ["water_message", "water_message_20260302"]
+
+    async with db.session(time_ctx=_DAY1) as session:
+        ops = WaterMessageOps(session)
+        assert await ops.prune_before(_DAY2 + 1) == 1
+        assert await ops.prune_before(_DAY2 + 1) == 0
+        assert isinstance(await ops._source(_DAY2, _DAY2_END), Table)
+    assert await _tables(db) == ["water_message_20260302"]
+
+    async with db.session(commit=False, time_ctx=_DAY1) as session:
+        ops = WaterMessageOps(session)
+        assert await ops.get_top_users("g", _DAY1, _DAY1 + 86399) == []
+    db_path, _ = db._get_file_paths(db._get_shard_key(_DAY1))
+    await db_manager.dispose(str(db_path))
+
+
+@pytest.mark.asyncio
+async def test_partition_ddl_runs_once_and_recovers_from_rollback(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    db = ShardedDB(namespace="water_partition_ddl_test", prefix="logs", fmt="%Y_%m")
+    await db.init(WaterMessageBase)
+    created: list[str] = []
+    original = WaterMessageOps._create_partition
+
+    async def _spy(self: WaterMessageOps, table: Table) -> None:
+        created.append(table.name)
+        await original(self, table)
+
+    monkeypatch.setattr(WaterMessageOps, "_create_partition", _spy)
+    row = {"group_id": "g", "user_id": "u", "created_at": _DAY1 + 5}
+
+    async def _insert_then_fail() -> None:
+        async with db.session(time_ctx=_DAY1) as session:
+            await WaterMessageOps(session).bulk_insert_water_message([row])
+            raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        await _insert_then_fail()
+    assert await _tables(db) == []
+
+    for _ in range(3):
+        async with db.session(time_ctx=_DAY1) as session:
+            assert await WaterMessageOps(session).bulk_insert_water_message([row]) == 1
+
+    assert created == ["water_message_20260301"] * 2
+    assert await _tables(db) == ["water_message_20260301"]
+    for path in db.base_dir.glob("*.db"):
+        await db_manager.dispose(str(path))
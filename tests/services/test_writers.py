@@ -0,0 +1,18 @@
+from src.services.writers import _latest_per_member
+
+
+def test_latest_per_member_keeps_every_member_of_a_group() -> None:
+    batch = [
+        {"group_id": 1, "user_id": 10, "card": "a"},
+        {"group_id": 1, "user_id": 11, "card": "b"},
+        {"group_id": 1, "user_id": 10, "card": "c"},
+        {"group_id": 2, "user_id": 10, "card": "d"},
+    ]
+
+    result = _latest_per_member(batch)
+
+    assert [(item["group_id"], item["user_id"], item["card"]) for item in result] == [
+        (1, 10, "c"),
+        (1, 11, "b"),
+        (2, 10, "d"),
+    ]